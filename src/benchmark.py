@@ -0,0 +1,508 @@
+"""処理の高速化手法について、精度と処理時間を比較する."""
+
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from logging import Formatter, StreamHandler
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+import numpy as np
+import torch
+from internal import (
+    AudioSource,
+    ConvertToWavFile,
+    OnnxDiarizationBackend,
+    PipelineSnapshot,
+    SeekableAudioSource,
+)
+from pyannote.audio import Audio, Pipeline
+from pydantic import BaseModel
+
+_logger = logging.getLogger(__name__)
+
+
+class _RunConfig(BaseModel):
+    """スクリプト実行のためのオプション."""
+
+    command: str  # 実行するベンチマーク
+    filepath: Path  # ベンチマークに利用する音源
+    config_path: Path = Path("data/raw/config.yaml")  # pyannoteのモデル設定ファイル
+    repeat: int = 1  # 計測の繰り返し回数
+
+    # onnx
+    onnx_dir: Path = Path("data/raw/onnx")  # ONNXモデルのディレクトリ
+    onnx_quantized: bool = False  # int8に量子化したONNXモデルを利用するかどうか
+    onnx_threads: int = 0  # ONNX Runtimeの演算内の並列数
+    num_chunks: int = 8  # 数値比較に利用するチャンク数
+    atol: float = 1e-3  # segmentationの出力の許容誤差
+    min_cosine: float = 0.99  # embeddingの出力の許容コサイン類似度
+
+    # audio-store
+    segment_duration: float = 30.0  # 読み込む区間の長さ(秒)
+    num_segments: int = 100  # 読み込む区間の数
+    num_readers: int = 4  # 同時に読み込むスレッド数
+    seed: int = 0  # 読み込む区間を決める乱数のシード
+
+    # convert
+    workers: list[int] = []  # 比較するffmpegの並列数. 空の場合はCPUコア数まで倍増
+    min_slice_duration: float = 300.0  # 分割した区間の最小の長さ(秒)
+
+    # cold-start
+    snapshot_dir: Path = Path("data/raw/pipeline_snapshot")  # スナップショット
+
+    verbose: int  # ログレベル
+
+
+def _main() -> None:
+    """スクリプトのエントリポイント."""
+    # 実行時引数の読み込み
+    config = _parse_args()
+
+    # ログ設定
+    loglevel = {
+        0: logging.ERROR,
+        1: logging.WARNING,
+        2: logging.INFO,
+        3: logging.DEBUG,
+    }.get(config.verbose, logging.DEBUG)
+    script_filepath = Path(__file__)
+    log_filepath = Path("data/interim") / f"{script_filepath.stem}.log"
+    log_filepath.parent.mkdir(exist_ok=True)
+    _setup_logger(log_filepath, loglevel=loglevel)
+    _logger.info(config)
+
+    commands = {
+        "onnx": _benchmark_onnx,
+        "audio-store": _benchmark_audio_store,
+        "cold-start": _benchmark_cold_start,
+        "convert": _benchmark_convert,
+    }
+    if not commands[config.command](config):
+        sys.exit(1)
+
+
+def _benchmark_onnx(config: _RunConfig) -> bool:
+    """PyTorchとONNX Runtimeの話者分離について、数値誤差と処理時間を比較する.
+
+    Returns
+    -------
+    bool
+        数値誤差が許容範囲内の場合はTrue.
+
+    """
+    torch_pipeline = Pipeline.from_pretrained(config.config_path)
+    torch_pipeline.to(torch.device("cpu"))
+    backend = OnnxDiarizationBackend(
+        model_dir=config.onnx_dir,
+        quantized=config.onnx_quantized,
+        intra_op_num_threads=config.onnx_threads,
+    )
+    onnx_pipeline = backend.attach(Pipeline.from_pretrained(config.config_path))
+
+    # 数値比較用のチャンクを作成
+    segmentation_model = torch_pipeline._segmentation.model  # noqa: SLF001
+    sample_rate = segmentation_model.hparams.sample_rate
+    num_samples = int(segmentation_model.specifications.duration * sample_rate)
+    waveform, _ = Audio(sample_rate=sample_rate, mono="downmix")(config.filepath)
+    num_chunks = max(1, min(config.num_chunks, waveform.shape[1] // num_samples))
+    chunks = torch.zeros(num_chunks, 1, num_samples)
+    for index in range(num_chunks):
+        chunk = waveform[:, index * num_samples : (index + 1) * num_samples]
+        chunks[index, :, : chunk.shape[1]] = chunk
+
+    # segmentationの比較
+    with torch.inference_mode():
+        torch_scores = segmentation_model(chunks)
+        onnx_scores = onnx_pipeline._segmentation.model(chunks)  # noqa: SLF001
+    segmentation_diff = float(torch.max(torch.abs(torch_scores - onnx_scores)))
+
+    # embeddingの比較. 重みにはsegmentationの各話者のスコアを利用する
+    torch_embedding = torch_pipeline._embedding  # noqa: SLF001
+    onnx_embedding = onnx_pipeline._embedding  # noqa: SLF001
+    masks = torch_scores[:, :, 0]
+    torch_vectors = torch_embedding(chunks, masks=masks)
+    onnx_vectors = onnx_embedding(chunks, masks=masks)
+    cosine = np.sum(torch_vectors * onnx_vectors, axis=1) / (
+        np.linalg.norm(torch_vectors, axis=1) * np.linalg.norm(onnx_vectors, axis=1)
+    )
+    min_cosine = float(np.nanmin(cosine))
+
+    # 話者分離全体の処理時間
+    duration = waveform.shape[1] / sample_rate
+    timings: dict[str, float] = {}
+    for name, pipeline in [("torch", torch_pipeline), ("onnx", onnx_pipeline)]:
+        elapsed: list[float] = []
+        for _ in range(config.repeat):
+            start = time.perf_counter()
+            pipeline(config.filepath)
+            elapsed.append(time.perf_counter() - start)
+        timings[name] = min(elapsed)
+
+    is_equivalent = segmentation_diff <= config.atol and min_cosine >= config.min_cosine
+    sys.stdout.write(
+        "\n".join(
+            [
+                f"audio duration       : {duration:.1f} s",
+                f"segmentation max diff: {segmentation_diff:.2e} (atol={config.atol})",
+                f"embedding min cosine : {min_cosine:.5f} (min={config.min_cosine})",
+                *[
+                    f"{name:<6} diarization   : {value:.2f} s "
+                    f"(rtf={value / duration:.3f})"
+                    for name, value in timings.items()
+                ],
+                f"speedup              : {timings['torch'] / timings['onnx']:.2f}x",
+                f"equivalent           : {is_equivalent}",
+                "",
+            ]
+        )
+    )
+
+    return is_equivalent
+
+
+def _benchmark_audio_store(config: _RunConfig) -> bool:
+    """中間ファイルの音声形式ごとに、ファイルサイズと区間の読み込み性能を比較する.
+
+    Notes
+    -----
+    読み込んだバイト数はLinuxの/proc/self/ioのrcharの差分で計測する。
+
+    """
+    rng = np.random.default_rng(config.seed)
+    rows: list[str] = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sources: dict[str, Path] = {
+            audio_format: ConvertToWavFile(
+                output_dir=Path(temp_dir), audio_format=audio_format
+            ).convert(config.filepath)
+            for audio_format in ConvertToWavFile.CODECS
+        }
+        duration = SeekableAudioSource(sources["wav"]).duration
+        max_start = max(0.0, duration - config.segment_duration)
+        starts = rng.uniform(0.0, max_start, size=config.num_segments)
+
+        for audio_format, filepath in sources.items():
+            for name, open_source in [
+                ("full", AudioSource.from_file),
+                ("seek", SeekableAudioSource),
+            ]:
+                read_bytes = _read_bytes()
+                start = time.perf_counter()
+                source = open_source(filepath)
+                with ThreadPoolExecutor(max_workers=config.num_readers) as pool:
+                    list(
+                        pool.map(
+                            lambda t, s=source: s.slice(t, t + config.segment_duration),
+                            starts,
+                        )
+                    )
+                elapsed = time.perf_counter() - start
+                rows.append(
+                    f"{audio_format:<5} {name:<5} "
+                    f"{filepath.stat().st_size / 1024**2:>10.1f} "
+                    f"{(_read_bytes() - read_bytes) / 1024**2:>10.1f} "
+                    f"{elapsed:>8.2f}"
+                )
+
+    sys.stdout.write(
+        "\n".join(
+            [
+                f"audio duration: {duration:.1f} s, segments: {config.num_segments} x "
+                f"{config.segment_duration:.1f} s, readers: {config.num_readers}",
+                "fmt   mode   size [MB]  read [MB] time [s]",
+                *rows,
+                "",
+            ]
+        )
+    )
+
+    return True
+
+
+def _benchmark_cold_start(config: _RunConfig) -> bool:
+    """設定ファイルとスナップショットについて、新しいプロセスでの起動時間を比較する.
+
+    Returns
+    -------
+    bool
+        スナップショットを読み込めた場合はTrue.
+
+    Notes
+    -----
+    計測ごとにプロセスを起動し、importを含むプロセス全体の時間、パイプラインの読み込み時間、
+    最初の話者分離の時間を計測する。OSのページキャッシュは破棄しない。
+
+    """
+    if not PipelineSnapshot(config.snapshot_dir).is_valid(config.config_path):
+        _logger.error("pipeline snapshot is not available: %s", config.snapshot_dir)
+        return False
+
+    context = multiprocessing.get_context("spawn")
+    rows: list[str] = []
+    for mode in ["pretrained", "snapshot"]:
+        timings: list[tuple[float, float, float]] = []
+        for _ in range(config.repeat):
+            queue = context.Queue()
+            start = time.perf_counter()
+            process = context.Process(
+                target=_cold_start_worker,
+                args=(mode, config.config_path, config.snapshot_dir, config.filepath),
+                kwargs={"queue": queue},
+            )
+            process.start()
+            load_time, first_time = queue.get()
+            process.join()
+            timings.append((time.perf_counter() - start, load_time, first_time))
+        total_time, load_time, first_time = min(timings)
+        rows.append(
+            f"{mode:<10} {total_time:>9.2f} {load_time:>8.2f} {first_time:>9.2f}"
+        )
+
+    sys.stdout.write(
+        "\n".join(
+            [
+                f"repeat: {config.repeat} (min)",
+                "mode       total [s] load [s] first [s]",
+                *rows,
+                "",
+            ]
+        )
+    )
+
+    return True
+
+
+def _benchmark_convert(config: _RunConfig) -> bool:
+    """分割して並列にデコードする音声の変換について、並列数ごとの処理時間を比較する.
+
+    Returns
+    -------
+    bool
+        全ての並列数で、分割しない変換と同じ音声が得られた場合はTrue.
+        分割できる長さの音声で、2以上の並列数で分割せずに変換した場合はFalse.
+
+    """
+    workers = config.workers or [
+        2**i for i in range((os.cpu_count() or 1).bit_length())
+    ]
+    workers = sorted({1, *workers})
+    rows: list[str] = []
+    is_passed = True
+    with tempfile.TemporaryDirectory() as temp_dir:
+        baseline: np.ndarray | None = None
+        baseline_time = float("nan")
+        for num_workers in workers:
+            output_dir = Path(temp_dir) / str(num_workers)
+            output_dir.mkdir()
+            converter = ConvertToWavFile(
+                output_dir=output_dir,
+                num_workers=num_workers,
+                min_slice_duration=config.min_slice_duration,
+            )
+            elapsed: list[float] = []
+            for _ in range(config.repeat):
+                start = time.perf_counter()
+                output_filepath = converter.convert(config.filepath)
+                elapsed.append(time.perf_counter() - start)
+            samples = AudioSource.from_file(output_filepath).samples
+            if baseline is None:
+                baseline = samples
+                baseline_time = min(elapsed)
+            identical = np.array_equal(baseline, samples)
+            duration = len(samples) / ConvertToWavFile.SAMPLE_RATE
+            # 分割できない場合と分割後の結合に失敗した場合は、いずれも分割しない変換と
+            # 同じ音声となるため、分割したかどうかを別に確認する
+            expects_slicing = (
+                num_workers > 1 and duration >= 2 * config.min_slice_duration
+            )
+            is_passed = (
+                is_passed and identical and (converter.sliced or not expects_slicing)
+            )
+            rows.append(
+                f"{num_workers:>7} {min(elapsed):>8.2f} "
+                f"{baseline_time / min(elapsed):>7.2f}x "
+                f"{min(elapsed) / duration:>7.4f} "
+                f"{len(samples) - len(baseline):>+9d} {identical!s:>9} "
+                f"{converter.sliced!s:>6}"
+            )
+
+    sys.stdout.write(
+        "\n".join(
+            [
+                f"cpu count: {os.cpu_count()}, repeat: {config.repeat} (min)",
+                "workers time [s] speedup     rtf  samples identical sliced",
+                *rows,
+                "",
+            ]
+        )
+    )
+
+    return is_passed
+
+
+def _cold_start_worker(
+    mode: str,
+    config_path: Path,
+    snapshot_dir: Path,
+    filepath: Path,
+    *,
+    queue: multiprocessing.Queue,
+) -> None:
+    """パイプラインを読み込み、最初の話者分離を行うまでの時間を計測する."""
+    start = time.perf_counter()
+    if mode == "snapshot":
+        pipeline = PipelineSnapshot(snapshot_dir).load(config_path)
+    else:
+        pipeline = Pipeline.from_pretrained(config_path)
+    if pipeline is None:
+        queue.put((float("nan"), float("nan")))
+        return
+    pipeline.to(torch.device("cpu"))
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pipeline(filepath)
+    first_time = time.perf_counter() - start
+
+    queue.put((load_time, first_time))
+
+
+def _read_bytes() -> int:
+    """プロセスが読み込んだバイト数を取得する. 取得できない場合は0を返す."""
+    io_filepath = Path("/proc/self/io")
+    if not io_filepath.exists():
+        return 0
+    for line in io_filepath.read_text().splitlines():
+        key, _, value = line.partition(":")
+        if key == "rchar":
+            return int(value)
+
+    return 0
+
+
+def _parse_args() -> _RunConfig:
+    """スクリプト実行のための引数を読み込む."""
+    parser = ArgumentParser(
+        description="処理の高速化手法について精度と処理時間を比較する."
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="詳細メッセージのレベルを設定.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    onnx_parser = subparsers.add_parser(
+        "onnx", help="PyTorchとONNX Runtimeの話者分離を比較する."
+    )
+    onnx_parser.add_argument(
+        "filepath", help="ベンチマークに利用するwavファイルのパス."
+    )
+    onnx_parser.add_argument(
+        "--config-path", type=Path, default=Path("data/raw/config.yaml")
+    )
+    onnx_parser.add_argument("--onnx-dir", type=Path, default=Path("data/raw/onnx"))
+    onnx_parser.add_argument("--onnx-quantized", action="store_true")
+    onnx_parser.add_argument("--onnx-threads", type=int, default=0)
+    onnx_parser.add_argument("--num-chunks", type=int, default=8)
+    onnx_parser.add_argument("--atol", type=float, default=1e-3)
+    onnx_parser.add_argument("--min-cosine", type=float, default=0.99)
+    onnx_parser.add_argument("--repeat", type=int, default=1)
+
+    audio_store_parser = subparsers.add_parser(
+        "audio-store", help="中間ファイルの音声形式ごとの読み込み性能を比較する."
+    )
+    audio_store_parser.add_argument(
+        "filepath", help="ベンチマークに利用する音源のファイルパス."
+    )
+    audio_store_parser.add_argument("--segment-duration", type=float, default=30.0)
+    audio_store_parser.add_argument("--num-segments", type=int, default=100)
+    audio_store_parser.add_argument("--num-readers", type=int, default=4)
+    audio_store_parser.add_argument("--seed", type=int, default=0)
+
+    cold_start_parser = subparsers.add_parser(
+        "cold-start", help="設定ファイルとスナップショットの起動時間を比較する."
+    )
+    cold_start_parser.add_argument(
+        "filepath", help="最初の話者分離に利用するwavファイルのパス."
+    )
+    cold_start_parser.add_argument(
+        "--config-path", type=Path, default=Path("data/raw/config.yaml")
+    )
+    cold_start_parser.add_argument(
+        "--snapshot-dir", type=Path, default=Path("data/raw/pipeline_snapshot")
+    )
+    cold_start_parser.add_argument("--repeat", type=int, default=3)
+
+    convert_parser = subparsers.add_parser(
+        "convert", help="音声の変換のffmpegの並列数ごとの処理時間を比較する."
+    )
+    convert_parser.add_argument(
+        "filepath", help="ベンチマークに利用する長い音源のファイルパス."
+    )
+    convert_parser.add_argument("--workers", type=int, nargs="+", default=[])
+    convert_parser.add_argument("--min-slice-duration", type=float, default=300.0)
+    convert_parser.add_argument("--repeat", type=int, default=1)
+
+    args = parser.parse_args()
+
+    return _RunConfig(**vars(args))
+
+
+def _setup_logger(
+    filepath: Path | None,  # ログ出力するファイルパス. Noneの場合はファイル出力しない.
+    loglevel: int,  # 出力するログレベル
+) -> None:
+    """ログ出力設定.
+
+    Notes
+    -----
+    ファイル出力とコンソール出力を行うように設定する。
+
+    """
+    lib_logger = logging.getLogger("internal")
+
+    _logger.setLevel(loglevel)
+    lib_logger.setLevel(loglevel)
+
+    # consoleログ
+    console_handler = StreamHandler()
+    console_handler.setLevel(loglevel)
+    console_handler.setFormatter(
+        Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+    )
+    _logger.addHandler(console_handler)
+    lib_logger.addHandler(console_handler)
+
+    # ファイル出力するログ
+    # 基本的に大量に利用することを想定していないので、ログファイルは多くは残さない。
+    if filepath is not None:
+        file_handler = RotatingFileHandler(
+            filepath,
+            encoding="utf-8",
+            mode="a",
+            maxBytes=10 * 1024 * 1024,  # 10 MB
+            backupCount=1,
+        )
+        file_handler.setLevel(loglevel)
+        file_handler.setFormatter(
+            Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+        )
+        _logger.addHandler(file_handler)
+        lib_logger.addHandler(file_handler)
+
+
+if __name__ == "__main__":
+    try:
+        _main()
+    except Exception:
+        _logger.exception("Exception")
+        sys.exit(1)
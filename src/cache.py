@@ -0,0 +1,183 @@
+"""中間ファイルの容量を集計し、上限を超えた分を削除する."""
+
+import logging
+import sys
+from argparse import ArgumentParser
+from logging import Formatter, StreamHandler
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from internal import InterimCache, parse_size
+from pydantic import BaseModel
+
+_logger = logging.getLogger(__name__)
+
+
+class _RunConfig(BaseModel):
+    """スクリプト実行のためのオプション."""
+
+    command: str  # 実行するコマンド
+    interim_dir: Path  # 中間ファイルのディレクトリ
+
+    # prune
+    budget: int | None = None  # 中間ファイルの合計容量の上限(バイト)
+    max_age: float | None = None  # この日数を超えて利用されていないファイルを削除
+    dry_run: bool = False  # 削除せずに削除対象を表示する
+
+    verbose: int  # ログレベル
+
+
+def _main() -> None:
+    """スクリプトのエントリポイント."""
+    # 実行時引数の読み込み
+    config = _parse_args()
+
+    # ログ設定
+    loglevel = {
+        0: logging.ERROR,
+        1: logging.WARNING,
+        2: logging.INFO,
+        3: logging.DEBUG,
+    }.get(config.verbose, logging.DEBUG)
+    script_filepath = Path(__file__)
+    log_filepath = Path("data/interim") / f"{script_filepath.stem}.log"
+    log_filepath.parent.mkdir(exist_ok=True)
+    _setup_logger(log_filepath, loglevel=loglevel)
+    _logger.info(config)
+
+    cache = InterimCache(config.interim_dir)
+    match config.command:
+        case "stats":
+            for key, value in cache.stats().items():
+                sys.stdout.write(
+                    f"{_format_size(value['size']):>10s} {value['count']:6d} {key}\n"
+                )
+        case "prune":
+            removed = cache.prune(
+                config.budget,
+                max_age=None if config.max_age is None else config.max_age * 86400,
+                dry_run=config.dry_run,
+            )
+            for entry in removed:
+                size = _format_size(entry.size)
+                sys.stdout.write(f"{size:>10s} {entry.category:8s} {entry.path}\n")
+            total_size = sum(v.size for v in removed)
+            sys.stdout.write(
+                f"{'would free' if config.dry_run else 'freed'}: "
+                f"{_format_size(total_size)} ({len(removed)} files)\n"
+            )
+
+
+def _format_size(size: int) -> str:
+    """バイト数を読みやすい単位の文字列にする."""
+    value = float(size)
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:  # noqa: PLR2004
+            return f"{value:.1f} {unit}"
+        value /= 1024
+
+    return f"{value:.1f} TB"
+
+
+def _parse_args() -> _RunConfig:
+    """スクリプト実行のための引数を読み込む."""
+    parser = ArgumentParser(
+        description="中間ファイルの容量を集計し、上限を超えた分を削除する."
+    )
+    parser.add_argument(
+        "--interim-dir",
+        type=Path,
+        default=Path("data/interim"),
+        help="中間ファイルのディレクトリ.",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="詳細メッセージのレベルを設定.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("stats", help="種類ごと、音源ごとの容量を表示する.")
+
+    prune_parser = subparsers.add_parser(
+        "prune",
+        help=(
+            "再作成しやすい種類(音声など)から、利用されていない期間が長い順に"
+            "中間ファイルを削除する. 処理中の音源は削除しない."
+        ),
+    )
+    prune_parser.add_argument(
+        "--budget",
+        type=parse_size,
+        default=None,
+        help="中間ファイルの合計容量の上限(例: 20G).",
+    )
+    prune_parser.add_argument(
+        "--max-age",
+        type=float,
+        default=None,
+        help="この日数を超えて利用されていない中間ファイルを容量に関わらず削除する.",
+    )
+    prune_parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="削除せずに削除対象を表示する.",
+    )
+
+    args = parser.parse_args()
+
+    return _RunConfig(**vars(args))
+
+
+def _setup_logger(
+    filepath: Path | None,  # ログ出力するファイルパス. Noneの場合はファイル出力しない.
+    loglevel: int,  # 出力するログレベル
+) -> None:
+    """ログ出力設定.
+
+    Notes
+    -----
+    ファイル出力とコンソール出力を行うように設定する。
+
+    """
+    lib_logger = logging.getLogger("internal")
+
+    _logger.setLevel(loglevel)
+    lib_logger.setLevel(loglevel)
+
+    # consoleログ
+    console_handler = StreamHandler()
+    console_handler.setLevel(loglevel)
+    console_handler.setFormatter(
+        Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+    )
+    _logger.addHandler(console_handler)
+    lib_logger.addHandler(console_handler)
+
+    # ファイル出力するログ
+    # 基本的に大量に利用することを想定していないので、ログファイルは多くは残さない。
+    if filepath is not None:
+        file_handler = RotatingFileHandler(
+            filepath,
+            encoding="utf-8",
+            mode="a",
+            maxBytes=10 * 1024 * 1024,  # 10 MB
+            backupCount=1,
+        )
+        file_handler.setLevel(loglevel)
+        file_handler.setFormatter(
+            Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+        )
+        _logger.addHandler(file_handler)
+        lib_logger.addHandler(file_handler)
+
+
+if __name__ == "__main__":
+    try:
+        _main()
+    except Exception:
+        _logger.exception("Exception")
+        sys.exit(1)
@@ -0,0 +1,371 @@
+"""参照コーパスを利用して、設定ごとに話者分離と文字起こしの精度と処理速度を評価する."""
+
+import json
+import logging
+import multiprocessing
+import queue
+import resource
+import sys
+import time
+from argparse import ArgumentParser
+from logging import Formatter, StreamHandler
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from internal import (
+    PROFILES,
+    AudioSource,
+    ErrorCount,
+    Transcriber,
+    count_errors,
+    pareto_front,
+    to_characters,
+    to_words,
+)
+from pyannote.core import Annotation, Segment
+from pyannote.database.util import load_rttm
+from pyannote.metrics.diarization import DiarizationErrorRate
+from pydantic import BaseModel
+
+_logger = logging.getLogger(__name__)
+
+# 評価対象とする音源の拡張子
+_AUDIO_SUFFIXES = {".wav", ".flac", ".mp3", ".m4a", ".mp4"}
+
+# 比較する評価指標. いずれも小さいほど良い
+# whisper.cppは子プロセスで実行するため、子プロセスのピークメモリも比較する
+_METRICS = ["der", "cer", "wer", "rtf", "peak_rss_mb", "children_peak_rss_mb"]
+
+
+class _RunConfig(BaseModel):
+    """スクリプト実行のためのオプション."""
+
+    corpus_dir: Path  # 参照コーパスのディレクトリ
+    profiles: list[str]  # 比較する設定
+    device: str  # 話者分離に利用するデバイス
+    config_path: Path  # pyannoteのモデル設定ファイル
+    output: Path  # 評価結果の出力先
+
+    verbose: int  # ログレベル
+
+
+def _main() -> None:
+    """スクリプトのエントリポイント."""
+    # 実行時引数の読み込み
+    config = _parse_args()
+
+    # ログ設定
+    loglevel = {
+        0: logging.ERROR,
+        1: logging.WARNING,
+        2: logging.INFO,
+        3: logging.DEBUG,
+    }.get(config.verbose, logging.DEBUG)
+    script_filepath = Path(__file__)
+    log_filepath = Path("data/interim") / f"{script_filepath.stem}.log"
+    log_filepath.parent.mkdir(exist_ok=True)
+    _setup_logger(log_filepath, loglevel=loglevel)
+    _logger.info(config)
+
+    # 参照コーパスの探索
+    items = _find_corpus(config.corpus_dir)
+    if len(items) < 1:
+        message = f"audio file not found: {config.corpus_dir!s}"
+        raise FileNotFoundError(message)
+    _logger.info("corpus: %d files", len(items))
+
+    # 設定ごとに別プロセスで評価し、ピークメモリを分離して計測する
+    context = multiprocessing.get_context("spawn")
+    results: list[dict] = []
+    for profile in config.profiles:
+        _logger.info("evaluate profile: %s", profile)
+        result_queue = context.Queue()
+        process = context.Process(
+            target=_evaluate_profile,
+            args=(profile, config.device, config.config_path, items),
+            kwargs={"result_queue": result_queue},
+        )
+        process.start()
+        result = _wait_result(profile, process, result_queue)
+        process.join()
+        if "error" in result:
+            _logger.error("evaluation failed: %s", result["error"])
+        results.append(result)
+
+    # 評価に失敗した設定はパレート最適の判定から除く
+    succeeded = [v for v in results if "error" not in v]
+    is_optimal = pareto_front([[v[key] for key in _METRICS] for v in succeeded])
+    for result in results:
+        result["pareto_optimal"] = False
+    for result, optimal in zip(succeeded, is_optimal, strict=True):
+        result["pareto_optimal"] = optimal
+
+    config.output.parent.mkdir(parents=True, exist_ok=True)
+    config.output.write_text(json.dumps(results, ensure_ascii=False, indent=2))
+    sys.stdout.write(_format_table(results))
+
+
+def _find_corpus(corpus_dir: Path) -> list[tuple[Path, Path | None, Path | None]]:
+    """音源と同じ名前の正解ファイル(.rttm, .txt)を探索する."""
+    items: list[tuple[Path, Path | None, Path | None]] = []
+    for audio_filepath in sorted(corpus_dir.iterdir()):
+        if audio_filepath.suffix.lower() not in _AUDIO_SUFFIXES:
+            continue
+        rttm_filepath = audio_filepath.with_suffix(".rttm")
+        text_filepath = audio_filepath.with_suffix(".txt")
+        items.append(
+            (
+                audio_filepath,
+                rttm_filepath if rttm_filepath.exists() else None,
+                text_filepath if text_filepath.exists() else None,
+            )
+        )
+
+    return items
+
+
+def _wait_result(
+    profile: str,
+    process: multiprocessing.Process,
+    result_queue: multiprocessing.Queue,
+) -> dict:
+    """評価用のプロセスから結果を受け取る.
+
+    Notes
+    -----
+    評価に失敗した場合や結果を返さずに終了した場合は、他の設定の評価を続けられるよう
+    例外とせず、`error`に内容を記録した結果を返す。
+
+    """
+    while True:
+        try:
+            result = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            if not process.is_alive():
+                message = f"evaluation process exited: {process.exitcode}"
+                return {"profile": profile, "error": message}
+            continue
+
+        return result
+
+
+def _evaluate_profile(
+    profile: str,
+    device: str,
+    config_path: Path,
+    items: list[tuple[Path, Path | None, Path | None]],
+    *,
+    result_queue: multiprocessing.Queue,
+) -> None:
+    """一つの設定で参照コーパスを処理し、評価指標を算出する.
+
+    Notes
+    -----
+    処理時間にはモデルの読み込みを含む。
+
+    """
+    try:
+        result_queue.put(_evaluate(profile, device, config_path, items))
+    except Exception as e:
+        result_queue.put({"profile": profile, "error": repr(e)})
+        raise
+
+
+def _evaluate(
+    profile: str,
+    device: str,
+    config_path: Path,
+    items: list[tuple[Path, Path | None, Path | None]],
+) -> dict:
+    """一つの設定で参照コーパスを処理し、評価指標を算出する."""
+    transcriber = Transcriber(config_path=config_path, device=device, profile=profile)
+    diarization_metric = DiarizationErrorRate()
+    character_errors = ErrorCount()
+    word_errors = ErrorCount()
+    total_duration = 0.0
+    total_elapsed = 0.0
+    files: list[dict] = []
+    for audio_filepath, rttm_filepath, text_filepath in items:
+        sound = AudioSource.from_file(audio_filepath)
+        start = time.perf_counter()
+        speaker_text = transcriber.transcribe(sound)
+        elapsed = time.perf_counter() - start
+        total_duration += sound.duration
+        total_elapsed += elapsed
+        file_result: dict = {
+            "file": audio_filepath.name,
+            "duration": sound.duration,
+            "rtf": elapsed / sound.duration,
+        }
+
+        if rttm_filepath is not None:
+            reference = next(iter(load_rttm(rttm_filepath).values()))
+            hypothesis = Annotation(uri=reference.uri)
+            for index, segment in enumerate(transcriber.speaker_segments):
+                hypothesis[Segment(segment.start_time, segment.end_time), index] = (
+                    segment.speaker_name
+                )
+            file_result["der"] = diarization_metric(reference, hypothesis)
+
+        if text_filepath is not None:
+            reference_text = text_filepath.read_text(encoding="utf-8")
+            hypothesis_text = "\n".join(v.text for v in speaker_text)
+            cer = count_errors(
+                to_characters(reference_text), to_characters(hypothesis_text)
+            )
+            wer = count_errors(to_words(reference_text), to_words(hypothesis_text))
+            character_errors += cer
+            word_errors += wer
+            file_result["cer"] = cer.rate
+            file_result["wer"] = wer.rate
+        _logger.info("%s: %s", profile, file_result)
+        files.append(file_result)
+
+    # Linuxのru_maxrssはKB単位
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    has_rttm = any(v[1] is not None for v in items)
+
+    return {
+        "profile": profile,
+        "der": abs(diarization_metric) if has_rttm else float("nan"),
+        "cer": character_errors.rate,
+        "wer": word_errors.rate,
+        "rtf": total_elapsed / total_duration,
+        "peak_rss_mb": self_usage.ru_maxrss / 1024,
+        "children_peak_rss_mb": children_usage.ru_maxrss / 1024,
+        "duration": total_duration,
+        "elapsed": total_elapsed,
+        "files": files,
+    }
+
+
+def _format_table(results: list[dict]) -> str:
+    """設定ごとの評価結果を表形式の文字列にする.
+
+    Notes
+    -----
+    パレート最適な設定に*を付ける。評価に失敗した設定は最後の列にエラー内容を表示する。
+
+    """
+    header = (
+        "| profile | DER | CER | WER | RTF "
+        "| peak RSS [MB] | whisper RSS [MB] | pareto |"
+    )
+    rows = [
+        f"| {v['profile']} | {v['der']:.3f} | {v['cer']:.3f} | {v['wer']:.3f} "
+        f"| {v['rtf']:.3f} | {v['peak_rss_mb']:.0f} | {v['children_peak_rss_mb']:.0f} "
+        f"| {'*' if v['pareto_optimal'] else ''} |"
+        if "error" not in v
+        else f"| {v['profile']} |" + " - |" * 6 + f" error: {v['error']} |"
+        for v in results
+    ]
+
+    return "\n".join([header, "|" + " --- |" * 8, *rows, ""])
+
+
+def _parse_args() -> _RunConfig:
+    """スクリプト実行のための引数を読み込む."""
+    parser = ArgumentParser(
+        description=(
+            "参照コーパスを利用して、設定ごとに話者分離と文字起こしの精度と"
+            "処理速度を評価する."
+        )
+    )
+
+    parser.add_argument(
+        "corpus_dir",
+        type=Path,
+        help=(
+            "参照コーパスのディレクトリ. 音源と同じ名前の.rttm(話者分離の正解)と"
+            ".txt(文字起こしの正解)を配置する."
+        ),
+    )
+    parser.add_argument(
+        "-p",
+        "--profiles",
+        nargs="+",
+        default=list(PROFILES.keys()),
+        choices=list(PROFILES.keys()),
+        help="比較する設定.",
+    )
+    parser.add_argument(
+        "-d",
+        "--device",
+        default="cpu",
+        choices=["cpu", "cuda", "mps"],
+        help="話者分離に利用するデバイス.",
+    )
+    parser.add_argument(
+        "--config-path", type=Path, default=Path("data/raw/config.yaml")
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=Path("data/processed/evaluation.json"),
+        help="評価結果をjsonで保存するファイルパス.",
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="詳細メッセージのレベルを設定.",
+    )
+
+    args = parser.parse_args()
+
+    return _RunConfig(**vars(args))
+
+
+def _setup_logger(
+    filepath: Path | None,  # ログ出力するファイルパス. Noneの場合はファイル出力しない.
+    loglevel: int,  # 出力するログレベル
+) -> None:
+    """ログ出力設定.
+
+    Notes
+    -----
+    ファイル出力とコンソール出力を行うように設定する。
+
+    """
+    lib_logger = logging.getLogger("internal")
+
+    _logger.setLevel(loglevel)
+    lib_logger.setLevel(loglevel)
+
+    # consoleログ
+    console_handler = StreamHandler()
+    console_handler.setLevel(loglevel)
+    console_handler.setFormatter(
+        Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+    )
+    _logger.addHandler(console_handler)
+    lib_logger.addHandler(console_handler)
+
+    # ファイル出力するログ
+    # 基本的に大量に利用することを想定していないので、ログファイルは多くは残さない。
+    if filepath is not None:
+        file_handler = RotatingFileHandler(
+            filepath,
+            encoding="utf-8",
+            mode="a",
+            maxBytes=10 * 1024 * 1024,  # 10 MB
+            backupCount=1,
+        )
+        file_handler.setLevel(loglevel)
+        file_handler.setFormatter(
+            Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+        )
+        _logger.addHandler(file_handler)
+        lib_logger.addHandler(file_handler)
+
+
+if __name__ == "__main__":
+    try:
+        _main()
+    except Exception:
+        _logger.exception("Exception")
+        sys.exit(1)
@@ -1,8 +1,52 @@
 """Internal package for speech and speaker processing."""
 
+from .audio_source import AudioSource
+from .batch_autotuner import (
+    BatchAutotuner,
+    BatchMeasurement,
+    BatchSetting,
+    BatchSettingFile,
+    batch_setting_key,
+    select_batch_setting,
+)
 from .convert2mp4file import ConvertToMp4File
 from .convert2wavfile import ConvertToWavFile
+from .decode_monitor import DecodeMonitor, trim_silence
+from .diarization_cache_file import DiarizationCache, DiarizationCacheFile
+from .evaluation_metrics import (
+    ErrorCount,
+    count_errors,
+    edit_distance,
+    pareto_front,
+    to_characters,
+    to_words,
+)
+from .interim_cache import (
+    CacheEntry,
+    InterimCache,
+    atomic_write,
+    lock_recording,
+    parse_size,
+)
+from .job_queue import Job, JobLease, JobQueue
+from .media_probe import MediaInfo, MediaProbe
+from .onnx_diarization_backend import OnnxDiarizationBackend
+from .onnx_model_exporter import OnnxModelExporter
+from .overlap_planner import OverlapPlanner, join_speaker_names, split_speaker_names
+from .pipeline_snapshot import PipelineSnapshot
+from .progress import (
+    JsonLinesSink,
+    ProgressEvent,
+    ProgressReporter,
+    SocketSink,
+    StageProgress,
+)
+from .run_metrics import DecodeIncident, RunMetrics
+from .seekable_audio_source import SeekableAudioSource
+from .segment_table import SegmentTable
+from .speaker_embedding_file import SpeakerEmbeddingFile
 from .speaker_integrator import SpeakerIntegrator
+from .speaker_registry import SpeakerRegistry
 from .speaker_segment import SpeakerSegment
 from .speaker_segment_file import SpeakerSegmentFile
 from .speaker_separator import SpeakerSeparator
@@ -11,11 +55,44 @@ from .speech_integrator import SpeechIntegrator
 from .speech_text_file import SpeechTextFile
 from .speech_text_writer import SpeechTextWriter
 from .speech_to_text import SpeechToText
+from .thread_governor import ThreadGovernor, ThreadLease
+from .transcriber import PROFILES, TranscribeProfile, Transcriber, transcribe
+from .whisper_executor import WhisperExecutor, WhisperResult, WhisperTask
 
 __all__ = [
+    "AudioSource",
+    "BatchAutotuner",
+    "BatchMeasurement",
+    "BatchSetting",
+    "BatchSettingFile",
+    "CacheEntry",
     "ConvertToWavFile",
     "ConvertToMp4File",
+    "DecodeIncident",
+    "DecodeMonitor",
+    "DiarizationCache",
+    "DiarizationCacheFile",
+    "ErrorCount",
+    "InterimCache",
+    "Job",
+    "JobLease",
+    "JobQueue",
+    "JsonLinesSink",
+    "MediaInfo",
+    "MediaProbe",
+    "OnnxDiarizationBackend",
+    "OnnxModelExporter",
+    "OverlapPlanner",
+    "PipelineSnapshot",
+    "ProgressEvent",
+    "ProgressReporter",
+    "RunMetrics",
+    "SeekableAudioSource",
+    "SegmentTable",
+    "SocketSink",
+    "SpeakerEmbeddingFile",
     "SpeakerIntegrator",
+    "SpeakerRegistry",
     "SpeakerSegment",
     "SpeakerSegmentFile",
     "SpeakerSeparator",
@@ -24,4 +101,27 @@ __all__ = [
     "SpeechTextFile",
     "SpeechTextWriter",
     "SpeechToText",
+    "StageProgress",
+    "PROFILES",
+    "ThreadGovernor",
+    "ThreadLease",
+    "TranscribeProfile",
+    "Transcriber",
+    "WhisperExecutor",
+    "WhisperResult",
+    "WhisperTask",
+    "atomic_write",
+    "batch_setting_key",
+    "join_speaker_names",
+    "lock_recording",
+    "parse_size",
+    "select_batch_setting",
+    "split_speaker_names",
+    "count_errors",
+    "edit_distance",
+    "pareto_front",
+    "to_characters",
+    "to_words",
+    "transcribe",
+    "trim_silence",
 ]
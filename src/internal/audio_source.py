@@ -0,0 +1,157 @@
+"""文字起こし対象の音声データを表すモジュール."""
+
+import io
+import wave
+from math import gcd
+from pathlib import Path
+
+import numpy as np
+import torch
+from pydub import AudioSegment
+from scipy.signal import resample_poly
+
+SAMPLE_RATE = 16000  # 話者分離と文字起こしで利用するサンプリングレート
+
+
+class AudioSource:
+    """16 kHz、1チャンネル、16 bitの音声データ.
+
+    Notes
+    -----
+    ファイル、バイト列、NumPy配列のいずれからでも作成でき、
+    話者分離や文字起こしには中間ファイルを介さずに渡すことができる。
+
+    """
+
+    def __init__(self: "AudioSource", samples: np.ndarray) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        samples : np.ndarray
+            16 kHz、1チャンネルのint16の音声データ
+
+        """
+        if samples.dtype != np.int16 or samples.ndim != 1:
+            message = f"samples must be 1-D int16: {samples.dtype}, {samples.shape}"
+            raise ValueError(message)
+        self._samples = samples
+
+    @classmethod
+    def from_file(cls: type["AudioSource"], filepath: Path) -> "AudioSource":
+        """音声ファイルから作成する. wav以外の形式はffmpegで読み込む."""
+        if not filepath.is_file():
+            message = f"file not found: {filepath!s}"
+            raise FileNotFoundError(message)
+
+        return cls._from_audio_segment(AudioSegment.from_file(filepath))
+
+    @classmethod
+    def from_bytes(cls: type["AudioSource"], data: bytes) -> "AudioSource":
+        """音声ファイルのバイト列から作成する. 形式はffmpegで判定する."""
+        return cls._from_audio_segment(AudioSegment.from_file(io.BytesIO(data)))
+
+    @classmethod
+    def from_array(
+        cls: type["AudioSource"], array: np.ndarray, sample_rate: int = SAMPLE_RATE
+    ) -> "AudioSource":
+        """NumPy配列から作成する.
+
+        Parameters
+        ----------
+        array : np.ndarray
+            音声データ. (samples,)もしくは(channels, samples).
+            浮動小数点数の場合は[-1, 1]の範囲とする.
+
+        sample_rate : int, optional
+            arrayのサンプリングレート, by default 16000
+
+        """
+        values = np.asarray(array)
+        if values.ndim == 2:  # noqa: PLR2004
+            values = values.mean(axis=0)
+        if values.ndim != 1:
+            message = f"array must be 1-D or 2-D: {values.shape}"
+            raise ValueError(message)
+        if values.dtype == np.int16:
+            values = values.astype(np.float32) / np.iinfo(np.int16).max
+        values = values.astype(np.float32)
+
+        if sample_rate != SAMPLE_RATE:
+            divisor = gcd(sample_rate, SAMPLE_RATE)
+            values = resample_poly(
+                values, SAMPLE_RATE // divisor, sample_rate // divisor
+            ).astype(np.float32)
+
+        samples = np.clip(values, -1.0, 1.0) * np.iinfo(np.int16).max
+        return cls(samples.astype(np.int16))
+
+    @classmethod
+    def load(
+        cls: type["AudioSource"], audio: "Path | str | bytes | np.ndarray | AudioSource"
+    ) -> "AudioSource":
+        """パス、バイト列、NumPy配列のいずれかから作成する."""
+        if isinstance(audio, AudioSource):
+            return audio
+        if isinstance(audio, bytes):
+            return cls.from_bytes(audio)
+        if isinstance(audio, np.ndarray):
+            return cls.from_array(audio)
+
+        return cls.from_file(Path(audio))
+
+    @property
+    def sample_rate(self: "AudioSource") -> int:
+        """サンプリングレート."""
+        return SAMPLE_RATE
+
+    @property
+    def duration(self: "AudioSource") -> float:
+        """音声の長さ(秒)."""
+        return len(self._samples) / SAMPLE_RATE
+
+    @property
+    def samples(self: "AudioSource") -> np.ndarray:
+        """int16の音声データ."""
+        return self._samples
+
+    def slice(self: "AudioSource", start_time: float, end_time: float) -> np.ndarray:
+        """指定した区間の音声データを取得する."""
+        start = max(0, int(start_time * SAMPLE_RATE))
+        end = min(len(self._samples), int(end_time * SAMPLE_RATE))
+        if end <= start:
+            st = start_time
+            et = end_time
+            message = f"empty audio segment. [{st:03.1f}s - {et:03.1f}s]"
+            raise ValueError(message)
+
+        return self._samples[start:end]
+
+    def wav_bytes(self: "AudioSource", start_time: float, end_time: float) -> bytes:
+        """指定した区間をwav形式のバイト列として取得する."""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(SAMPLE_RATE)
+            f.writeframes(self.slice(start_time, end_time).tobytes())
+
+        return buffer.getvalue()
+
+    def to_pyannote(self: "AudioSource") -> dict[str, torch.Tensor | int | Path]:
+        """pyannoteのパイプラインに渡せる形式に変換する."""
+        waveform = self._samples.astype(np.float32) / np.iinfo(np.int16).max
+
+        return {
+            "waveform": torch.from_numpy(waveform[np.newaxis, :]),
+            "sample_rate": SAMPLE_RATE,
+        }
+
+    @classmethod
+    def _from_audio_segment(
+        cls: type["AudioSource"], sound: AudioSegment
+    ) -> "AudioSource":
+        """pydubのAudioSegmentから作成する."""
+        sound = sound.set_frame_rate(SAMPLE_RATE).set_channels(1).set_sample_width(2)
+
+        return cls(np.frombuffer(sound.raw_data, dtype=np.int16))
@@ -0,0 +1,387 @@
+"""話者分離パイプラインのバッチサイズを実行環境に合わせて調整するモジュール."""
+
+import json
+import logging
+import os
+import resource
+import socket
+import threading
+import time
+from collections.abc import Callable, Generator, Sequence
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from internal.interim_cache import atomic_write
+from pyannote.audio import Pipeline
+from pyannote.audio.utils.signal import binarize
+from pyannote.core import SlidingWindowFeature
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BatchSetting:
+    """話者分離パイプラインのバッチサイズ."""
+
+    segmentation_batch_size: int  # segmentationモデルのバッチサイズ
+    embedding_batch_size: int  # embeddingモデルのバッチサイズ
+
+    def apply(self: "BatchSetting", pipeline: Pipeline) -> None:
+        """パイプラインにバッチサイズを設定する."""
+        pipeline.segmentation_batch_size = self.segmentation_batch_size
+        pipeline.embedding_batch_size = self.embedding_batch_size
+
+
+@dataclass(frozen=True)
+class BatchMeasurement:
+    """1つのバッチサイズでの計測結果."""
+
+    step: str  # 処理名(segmentation, embedding)
+    batch_size: int  # バッチサイズ
+    elapsed: float  # 処理時間(秒)
+    throughput: float  # 1秒あたりに処理した音声の長さ(秒)
+    peak_rss: int  # 処理中のプロセスの最大のメモリ使用量(バイト)
+
+
+class BatchAutotuner:
+    """話者分離パイプラインのバッチサイズごとの処理速度とメモリ使用量を計測する.
+
+    Notes
+    -----
+    segmentationとembeddingのそれぞれについて、`candidates`のバッチサイズで
+    パイプラインの該当する処理のみを実行し、処理速度と処理中のRSSの最大値を計測する。
+    解放済みのメモリがプロセスに残ってもRSSの計測に影響しにくいよう、バッチサイズは
+    小さい順に計測し、`rss_limit`を超えた時点でそれより大きいバッチサイズは計測しない。
+
+    """
+
+    STEPS = ("segmentation", "embedding")  # 計測する処理
+
+    def __init__(
+        self: "BatchAutotuner",
+        pipeline: Pipeline,
+        *,
+        candidates: Sequence[int] = (1, 2, 4, 8, 16, 32),
+        rss_limit: int | None = None,
+        repeat: int = 1,
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        pipeline : Pipeline
+            計測する話者分離パイプライン
+
+        candidates : Sequence[int], optional
+            計測するバッチサイズ, by default (1, 2, 4, 8, 16, 32)
+
+        rss_limit : int | None, optional
+            プロセスのメモリ使用量の上限(バイト). 超えた場合は以降のバッチサイズを
+            計測しない. Noneの場合は上限なし, by default None
+
+        repeat : int, optional
+            バッチサイズごとの計測回数. 最も速い結果を利用する, by default 1
+
+        """
+        self._pipeline = pipeline
+        self._candidates = sorted(set(candidates))
+        self._rss_limit = rss_limit
+        self._repeat = repeat
+
+    def measure(
+        self: "BatchAutotuner", file: dict[str, Any], duration: float
+    ) -> list[BatchMeasurement]:
+        """バッチサイズごとに処理速度とメモリ使用量を計測する.
+
+        Parameters
+        ----------
+        file : dict[str, Any]
+            計測に利用する音声. pyannoteの入力形式
+
+        duration : float
+            音声の長さ(秒)
+
+        Returns
+        -------
+        list[BatchMeasurement]
+            計測結果
+
+        """
+        pipeline = self._pipeline
+        original = BatchSetting(
+            segmentation_batch_size=pipeline.segmentation_batch_size,
+            embedding_batch_size=pipeline.embedding_batch_size,
+        )
+        try:
+            # 初回の実行にかかる初期化の時間を計測から除く
+            segmentations = pipeline.get_segmentations(file)
+            binarized = self._binarize(segmentations)
+
+            def run_segmentation() -> None:
+                pipeline.get_segmentations(file)
+
+            def run_embedding() -> None:
+                pipeline.get_embeddings(
+                    file,
+                    binarized,
+                    exclude_overlap=pipeline.embedding_exclude_overlap,
+                )
+
+            measurements = [
+                *self._measure_step(
+                    "segmentation", run_segmentation, duration, original
+                ),
+                *self._measure_step("embedding", run_embedding, duration, original),
+            ]
+        finally:
+            original.apply(pipeline)
+
+        return measurements
+
+    def _measure_step(
+        self: "BatchAutotuner",
+        step: str,
+        run: Callable[[], None],
+        duration: float,
+        original: BatchSetting,
+    ) -> list[BatchMeasurement]:
+        """1つの処理についてバッチサイズごとに計測する."""
+        measurements: list[BatchMeasurement] = []
+        for batch_size in self._candidates:
+            setting = (
+                BatchSetting(batch_size, original.embedding_batch_size)
+                if step == "segmentation"
+                else BatchSetting(original.segmentation_batch_size, batch_size)
+            )
+            setting.apply(self._pipeline)
+            elapsed = float("inf")
+            peak_rss = 0
+            for _ in range(self._repeat):
+                with _sample_rss() as sampler:
+                    start = time.perf_counter()
+                    run()
+                    elapsed = min(elapsed, time.perf_counter() - start)
+                peak_rss = max(peak_rss, sampler.peak)
+            measurement = BatchMeasurement(
+                step=step,
+                batch_size=batch_size,
+                elapsed=elapsed,
+                throughput=duration / elapsed,
+                peak_rss=peak_rss,
+            )
+            _logger.info(measurement)
+            measurements.append(measurement)
+            if self._rss_limit is not None and peak_rss > self._rss_limit:
+                _logger.info("stop %s at batch size %d: rss limit", step, batch_size)
+                break
+
+        return measurements
+
+    def _binarize(
+        self: "BatchAutotuner", segmentations: SlidingWindowFeature
+    ) -> SlidingWindowFeature:
+        """embeddingの入力とするため、パイプラインと同様にsegmentationを2値化する."""
+        pipeline = self._pipeline
+        if pipeline._segmentation.model.specifications.powerset:  # noqa: SLF001
+            return segmentations
+
+        return binarize(
+            segmentations, onset=pipeline.segmentation.threshold, initial_state=False
+        )
+
+
+def select_batch_setting(
+    measurements: Sequence[BatchMeasurement], *, rss_limit: int | None = None
+) -> BatchSetting | None:
+    """計測結果から、メモリ使用量の上限内で最も速いバッチサイズを選ぶ.
+
+    Parameters
+    ----------
+    measurements : Sequence[BatchMeasurement]
+        `BatchAutotuner.measure`の計測結果
+
+    rss_limit : int | None, optional
+        プロセスのメモリ使用量の上限(バイト). 上限内の結果がない処理は最小の
+        バッチサイズを選ぶ. Noneの場合は上限なし, by default None
+
+    Returns
+    -------
+    BatchSetting | None
+        いずれかの処理の計測結果がない場合はNone.
+
+    """
+    batch_sizes: dict[str, int] = {}
+    for step in BatchAutotuner.STEPS:
+        step_measurements = [v for v in measurements if v.step == step]
+        if len(step_measurements) == 0:
+            return None
+        within_limit = [
+            v for v in step_measurements if rss_limit is None or v.peak_rss <= rss_limit
+        ]
+        if len(within_limit) == 0:
+            batch_sizes[step] = min(v.batch_size for v in step_measurements)
+            continue
+        batch_sizes[step] = max(within_limit, key=lambda v: v.throughput).batch_size
+
+    return BatchSetting(
+        segmentation_batch_size=batch_sizes["segmentation"],
+        embedding_batch_size=batch_sizes["embedding"],
+    )
+
+
+class BatchSettingFile:
+    """ホストごとのバッチサイズの計測結果をjsonで保存し、読み込む.
+
+    Notes
+    -----
+    計測結果はホスト名とバックエンド(torch、onnxなど)ごとに保存する。
+    読み込み時に計測結果からバッチサイズを選ぶため、保存後にメモリ使用量の上限を
+    変更しても再計測は不要。
+
+    """
+
+    def __init__(
+        self: "BatchSettingFile", dirpath: Path, *, host: str | None = None
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        dirpath : Path
+            計測結果の保存先ディレクトリ
+
+        host : str | None, optional
+            ホスト名. Noneの場合は実行中のホスト名, by default None
+
+        """
+        self._filepath = dirpath / f"{host or socket.gethostname()}.json"
+
+    @property
+    def filepath(self: "BatchSettingFile") -> Path:
+        """計測結果のファイルパス."""
+        return self._filepath
+
+    def save(
+        self: "BatchSettingFile",
+        backend: str,
+        measurements: Sequence[BatchMeasurement],
+        **extra: Any,  # noqa: ANN401
+    ) -> None:
+        """計測結果を保存する. 他のバックエンドの計測結果は維持する.
+
+        Parameters
+        ----------
+        backend : str
+            計測したバックエンド名
+
+        measurements : Sequence[BatchMeasurement]
+            計測結果
+
+        **extra : Any
+            計測条件(スレッド数など)として保存する追加情報
+
+        """
+        data = self._read()
+        data[backend] = {
+            **extra,
+            "measured_at": time.time(),
+            "measurements": [asdict(v) for v in measurements],
+        }
+        self._filepath.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(self._filepath) as temp_filepath:
+            temp_filepath.write_text(json.dumps(data, ensure_ascii=False, indent=2))
+
+    def load(
+        self: "BatchSettingFile", backend: str, *, rss_limit: int | None = None
+    ) -> BatchSetting | None:
+        """計測結果から、メモリ使用量の上限内で最も速いバッチサイズを読み込む.
+
+        Parameters
+        ----------
+        backend : str
+            利用するバックエンド名
+
+        rss_limit : int | None, optional
+            プロセスのメモリ使用量の上限(バイト), by default None
+
+        Returns
+        -------
+        BatchSetting | None
+            計測結果がない場合はNone.
+
+        """
+        entry = self._read().get(backend)
+        if entry is None:
+            return None
+        measurements = [BatchMeasurement(**v) for v in entry["measurements"]]
+        setting = select_batch_setting(measurements, rss_limit=rss_limit)
+        _logger.info("batch setting for %s: %s", backend, setting)
+
+        return setting
+
+    def _read(self: "BatchSettingFile") -> dict[str, Any]:
+        """保存済みの計測結果を読み込む. ない場合は空の辞書を返す."""
+        if not self._filepath.exists():
+            return {}
+
+        return json.loads(self._filepath.read_text())
+
+
+class _RssSampler:
+    """別スレッドでプロセスのRSSを定期的に取得し、最大値を記録する."""
+
+    def __init__(self: "_RssSampler", interval: float) -> None:
+        """初期化処理."""
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.peak = _current_rss()
+
+    def start(self: "_RssSampler") -> None:
+        """計測を開始する."""
+        self._thread.start()
+
+    def stop(self: "_RssSampler") -> None:
+        """計測を終了する."""
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
+
+    def _run(self: "_RssSampler") -> None:
+        """RSSを定期的に取得する."""
+        while not self._stop.wait(self._interval):
+            self.peak = max(self.peak, _current_rss())
+
+
+@contextmanager
+def _sample_rss(interval: float = 0.01) -> Generator[_RssSampler, None, None]:
+    """処理中のプロセスのRSSの最大値を計測する."""
+    sampler = _RssSampler(interval)
+    sampler.start()
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
+
+
+def _current_rss() -> int:
+    """プロセスの現在のRSS(バイト)を取得する.
+
+    Notes
+    -----
+    /proc/self/statmを読めない環境では、プロセス開始からのRSSの最大値で代用する。
+
+    """
+    try:
+        resident_pages = int(Path("/proc/self/statm").read_text().split()[1])
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def batch_setting_key(backend: str, device: str) -> str:
+    """計測結果を保存するバックエンド名. onnxはCPUのみのためデバイスを含めない."""
+    return backend if backend == "onnx" else f"{backend}:{device}"
@@ -2,15 +2,37 @@
 
 import logging
 import subprocess
+from contextlib import nullcontext
 from pathlib import Path
+from typing import ClassVar
+
+from internal.interim_cache import atomic_write
+from internal.media_probe import MediaInfo, MediaProbe
+from internal.thread_governor import ThreadGovernor
 
 _logger = logging.getLogger(__name__)
 
 
 class ConvertToMp4File:
-    """指定したファイルをmp4に変換する."""
+    """指定したファイルをmp4に変換する.
+
+    Notes
+    -----
+    ffprobeで入力のcodecを確認し、mp4に格納できるストリームは再エンコードせずにコピーする。
+
+    """
 
-    def __init__(self: "ConvertToMp4File", output_dir: Path) -> None:
+    # mp4にそのまま格納できるcodec
+    VIDEO_CODECS: ClassVar[set[str]] = {"h264", "hevc", "mpeg4", "av1"}
+    AUDIO_CODECS: ClassVar[set[str]] = {"aac", "mp3", "alac", "ac3"}
+
+    def __init__(
+        self: "ConvertToMp4File",
+        output_dir: Path,
+        *,
+        governor: ThreadGovernor | None = None,
+        max_threads: int = 1,
+    ) -> None:
         """初期化処理.
 
         Parameters
@@ -18,8 +40,19 @@ class ConvertToMp4File:
         output_dir : Path
             変換後のファイルを保存するディレクトリ.
 
+        governor : ThreadGovernor | None, optional
+            指定した場合はffmpegのスレッド数の割り当てを受ける, by default None
+
+        max_threads : int, optional
+            `governor`から割り当てを受けるffmpegの最大スレッド数.
+            バックグラウンドで変換する間も音声の変換や話者分離を先に進められるよう、
+            小さい値とする, by default 1
+
         """
         self._output_dir = output_dir
+        self._governor = governor
+        self._max_threads = max_threads
+        self._probe = MediaProbe()
 
     def convert(self: "ConvertToMp4File", filepath: Path) -> Path:
         """指定したファイルをmp4に変換する.
@@ -29,6 +62,11 @@ class ConvertToMp4File:
         filepath : Path
             変換対象のファイルパス.
 
+        Returns
+        -------
+        Path
+            変換後のファイルパス. mp4の場合は`filepath`をそのまま返す.
+
         """
         if not filepath.is_file():
             message = f"file not found: {filepath!s}"
@@ -37,12 +75,58 @@ class ConvertToMp4File:
             message = f"invalid character in filepath: {filepath!s}"
             raise ValueError(message)
 
+        info = self._probe.probe(filepath)
+        if info is not None and info.has_container("mp4") and filepath.suffix == ".mp4":
+            _logger.info("skip conversion: %s", filepath)
+            return filepath
+        codec_args = [] if info is None else self._codec_args(info)
+
         output_filepath = self._output_dir / f"{filepath.stem}.mp4"
+        lease_context = (
+            nullcontext()
+            if self._governor is None
+            else self._governor.lease("ffmpeg", max_threads=self._max_threads)
+        )
+        with lease_context as lease, atomic_write(output_filepath) as temp_filepath:
+            thread_args = [] if lease is None else ["-threads", str(lease.num_threads)]
+            prefix = [] if lease is None else self._governor.command_prefix(lease)
+            options = ["-i", str(filepath.resolve()), *thread_args, *codec_args]
+            self._run(filepath, temp_filepath, options, prefix)
+
+        return output_filepath
+
+    def _codec_args(self: "ConvertToMp4File", info: MediaInfo) -> list[str]:
+        """ストリームごとにコピーできるかどうかを判定し、codecの引数を作成する."""
+        args = ["-movflags", "+faststart"]
+        if info.video_codec in self.VIDEO_CODECS:
+            args += ["-c:v", "copy"]
+        if info.audio_codec in self.AUDIO_CODECS:
+            args += ["-c:a", "copy"]
+        elif info.audio_codec is not None:
+            args += ["-c:a", "aac"]
+        _logger.info(
+            "mp4 streams: video=%s (%s), audio=%s (%s)",
+            info.video_codec,
+            "copy" if info.video_codec in self.VIDEO_CODECS else "encode",
+            info.audio_codec,
+            "copy" if info.audio_codec in self.AUDIO_CODECS else "encode",
+        )
+
+        return args
+
+    def _run(
+        self: "ConvertToMp4File",
+        filepath: Path,
+        output_filepath: Path,
+        options: list[str],
+        prefix: list[str],
+    ) -> None:
+        """ffmpegで変換する."""
         command_args = [
+            *prefix,
             "ffmpeg",
             "-y",  # 既存ファイルが存在する場合などで入力が必要となる部分を全てYesとする
-            "-i",
-            f"{filepath.resolve()!s}",
+            *options,
             str(output_filepath.resolve()),
         ]
         proc = subprocess.Popen(
@@ -60,10 +144,8 @@ class ConvertToMp4File:
             _logger.error("command failed with exit status %d", proc.returncode)
             _logger.error(error)
 
-            message = "error converting to mp4 file."
+            message = f"error converting to mp4 file: {filepath!s}"
             raise ValueError(message)
 
         _logger.info("stdout: %s", result)
         _logger.warning("stderr: %s", result)
-
-        return output_filepath
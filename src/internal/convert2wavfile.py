@@ -1,16 +1,57 @@
-"""指定したファイルをwav 16bitに変換する."""
+"""指定したファイルを16bitの音声ファイル(wav, flac)に変換する."""
 
 import logging
 import subprocess
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
+from typing import ClassVar
+
+import numpy as np
+from internal.interim_cache import atomic_write
+from internal.media_probe import MediaInfo, MediaProbe
+from internal.thread_governor import ThreadGovernor
 
 _logger = logging.getLogger(__name__)
 
 
 class ConvertToWavFile:
-    """指定したファイルをwav 16bitに変換する."""
+    """指定したファイルを16bitの音声ファイル(wav, flac)に変換する.
+
+    Notes
+    -----
+    ffprobeで入力の形式を確認し、既に出力形式と一致する場合は変換しない。
+    音声の形式が一致してコンテナのみ異なる場合は、再エンコードせずにコピーする。
+    `num_workers`に2以上を指定した場合、長い入力は時間で分割した区間ごとにffmpegを
+    並列に実行してデコードし、区間の境界で波形が連続していることを確認して結合する。
+    連続していない場合は分割せずに変換し直す。
+    分割してデコードしたかどうかは変換後に`sliced`で確認できる。
+
+    """
+
+    # 出力形式ごとのffmpegのcodec
+    CODECS: ClassVar[dict[str, str]] = {"wav": "pcm_s16le", "flac": "flac"}
+    SAMPLE_RATE: ClassVar[int] = 16000  # 出力のサンプリングレート
+    CHANNELS: ClassVar[int] = (
+        1  # 出力のチャンネル数. 複数チャンネルの入力はモノラルにする
+    )
+    # 分割の境界とシーク位置の時刻の単位(1/25秒=40ミリ秒)
+    # 8kHzから96kHzまでの一般的なサンプリングレートで、入力と出力のいずれでも
+    # 整数のサンプル位置となる
+    SLICE_GRID_RATE: ClassVar[int] = 25
 
-    def __init__(self: "ConvertToWavFile", output_dir: Path) -> None:
+    def __init__(  # noqa: PLR0913
+        self: "ConvertToWavFile",
+        output_dir: Path,
+        audio_format: str = "wav",
+        *,
+        governor: ThreadGovernor | None = None,
+        num_workers: int = 1,
+        min_slice_duration: float = 300.0,
+        overlap: float = 1.0,
+        timeout: float = 1800.0,
+    ) -> None:
         """初期化処理.
 
         Parameters
@@ -18,17 +59,59 @@ class ConvertToWavFile:
         output_dir : Path
             変換後のファイルを保存するディレクトリ.
 
+        audio_format : str, optional
+            出力形式. "wav"もしくは可逆圧縮の"flac", by default "wav"
+
+        governor : ThreadGovernor | None, optional
+            指定した場合はffmpegのスレッド数の割り当てを受ける, by default None
+
+        num_workers : int, optional
+            分割してデコードする場合に同時に実行するffmpegのプロセス数.
+            1の場合は分割しない, by default 1
+
+        min_slice_duration : float, optional
+            分割した区間の最小の長さ(秒). これより短い入力は分割しない,
+            by default 300.0
+
+        overlap : float, optional
+            境界の確認のため、分割した区間の前後に重ねてデコードする長さ(秒).
+            `SLICE_GRID_RATE`の単位に丸める, by default 1.0
+
+        timeout : float, optional
+            ffmpegの1プロセスあたりのタイムアウト時間(秒), by default 1800.0
+
         """
+        if audio_format not in self.CODECS:
+            message = f"unsupported audio format: {audio_format}"
+            raise ValueError(message)
         self._output_dir = output_dir
+        self._audio_format = audio_format
+        self._governor = governor
+        self._num_workers = num_workers
+        self._min_slice_duration = max(min_slice_duration, 4 * overlap)
+        self._overlap = max(1, round(overlap * self.SLICE_GRID_RATE))
+        self._timeout = timeout
+        self._probe = MediaProbe()
+        self._sliced = False
+
+    @property
+    def sliced(self: "ConvertToWavFile") -> bool:
+        """最後の変換で、分割して並列にデコードしたかどうか."""
+        return self._sliced
 
     def convert(self: "ConvertToWavFile", filepath: Path) -> Path:
-        """指定したファイルをwav 16bitに変換する.
+        """指定したファイルを16bitの音声ファイルに変換する.
 
         Parameters
         ----------
         filepath : Path
             変換対象のファイルパス.
 
+        Returns
+        -------
+        Path
+            変換後のファイルパス. 変換不要の場合は`filepath`をそのまま返す.
+
         """
         if not filepath.is_file():
             message = f"file not found: {filepath!s}"
@@ -36,17 +119,210 @@ class ConvertToWavFile:
         if any(char in str(filepath) for char in ["'", '"', "&", "|", ";"]):
             message = f"invalid character in filepath: {filepath!s}"
             raise ValueError(message)
+        self._sliced = False
+
+        codec = self.CODECS[self._audio_format]
+        codec_args = [
+            *["-ar", str(self.SAMPLE_RATE), "-ac", str(self.CHANNELS)],
+            *["-c:a", codec, "-sample_fmt", "s16"],
+        ]
+        info = self._probe.probe(filepath)
+        can_split = info is not None and info.duration is not None
+        if info is not None and info.has_audio_format(
+            codec, self.SAMPLE_RATE, self.CHANNELS
+        ):
+            if info.has_container(self._audio_format) and info.video_codec is None:
+                _logger.info("skip conversion: %s", filepath)
+                return filepath
+            _logger.info("copy audio stream: %s", filepath)
+            codec_args = ["-c:a", "copy"]
+            can_split = False  # コピーはデコードしないため分割しない
+
+        output_filepath = self._output_dir / f"{filepath.stem}.{self._audio_format}"
+        lease_context = (
+            nullcontext() if self._governor is None else self._governor.lease("ffmpeg")
+        )
+        with lease_context as lease, atomic_write(output_filepath) as temp_filepath:
+            thread_args = [] if lease is None else ["-threads", str(lease.num_threads)]
+            prefix = [] if lease is None else self._governor.command_prefix(lease)
+            num_workers = (
+                self._num_workers
+                if lease is None
+                else min(self._num_workers, lease.num_threads)
+            )
+            if (
+                can_split
+                and num_workers > 1
+                and self._convert_parallel(
+                    filepath, temp_filepath, info, num_workers, prefix
+                )
+            ):
+                self._sliced = True
+                return output_filepath
+            options = [*thread_args, "-i", str(filepath.resolve()), "-vn", *codec_args]
+            self._run(filepath, temp_filepath, options, prefix)
+
+        return output_filepath
+
+    def _convert_parallel(  # noqa: PLR0913
+        self: "ConvertToWavFile",
+        filepath: Path,
+        output_filepath: Path,
+        info: MediaInfo,
+        num_workers: int,
+        prefix: list[str],
+    ) -> bool:
+        """時間で分割した区間ごとに並列にデコードし、結合して保存する.
+
+        Returns
+        -------
+        bool
+            保存した場合はTrue. 入力が短い、もしくは境界で波形が連続していない場合は
+            Falseを返し、分割せずに変換する.
+
+        Notes
+        -----
+        各区間は前後に`overlap`秒を重ねて、ffmpegの入力側のシーク(-ss)でデコードする。
+        重ねた部分で前後の区間の波形を比較し、サンプル単位のずれを補正して境界で結合する。
+        境界とシーク位置は`SLICE_GRID_RATE`の単位の整数で扱い、入力と出力の
+        サンプリングレートのいずれでも整数のサンプル位置とする。
+        サンプルの途中の位置でシークすると、リサンプリングの位相が区間ごとに異なり、
+        重ねた部分の波形が一致しないため。
+
+        """
+        duration = float(info.duration or 0.0)
+        num_slices = min(num_workers, int(duration // self._min_slice_duration))
+        if num_slices < 2:  # noqa: PLR2004
+            return False
+        channels = self.CHANNELS
+        grid_rate = self.SLICE_GRID_RATE
+        boundaries = [
+            round(i * duration * grid_rate / num_slices) for i in range(num_slices)
+        ]
+        starts = [max(0, v - self._overlap) for v in boundaries]
+        ends = [
+            *[v + self._overlap for v in boundaries[1:]],
+            None,  # 最後の区間は長さの誤差で末尾が欠けないように終端までデコードする
+        ]
+        samples_per_grid = self.SAMPLE_RATE // grid_rate
+        _logger.info("decode %d slices in parallel: %s", num_slices, filepath)
+
+        pcm_filepath = output_filepath.with_suffix(".wav")
+        try:
+            with (
+                ThreadPoolExecutor(
+                    max_workers=num_workers, thread_name_prefix="ffmpeg"
+                ) as pool,
+                wave.open(str(pcm_filepath), "wb") as writer,
+            ):
+                futures = [
+                    pool.submit(
+                        self._decode_slice,
+                        filepath,
+                        start / grid_rate,
+                        None if end is None else end / grid_rate,
+                        channels,
+                        prefix,
+                    )
+                    for start, end in zip(starts, ends, strict=True)
+                ]
+                writer.setnchannels(channels)
+                writer.setsampwidth(2)
+                writer.setframerate(self.SAMPLE_RATE)
+
+                # 区間の境界ごとに、前の区間の境界までと次の区間の境界以降を結合する
+                previous = futures[0].result()
+                head = 0
+                for index in range(1, num_slices):
+                    current = futures[index].result()
+                    boundary = boundaries[index]
+                    previous_index = (boundary - starts[index - 1]) * samples_per_grid
+                    current_index = (boundary - starts[index]) * samples_per_grid
+                    shift = _align(previous, previous_index, current, current_index)
+                    if shift is None:
+                        _logger.warning(
+                            "discontinuity at %.3f s. convert without slicing: %s",
+                            boundary / grid_rate,
+                            filepath,
+                        )
+                        for future in futures:
+                            future.cancel()
+                        return False
+                    writer.writeframes(previous[head:previous_index].tobytes())
+                    head = current_index + shift
+                    previous = current
+                writer.writeframes(previous[head:].tobytes())
 
-        output_filepath = self._output_dir / f"{filepath.stem}.wav"
+            if pcm_filepath != output_filepath:
+                codec_args = ["-c:a", self.CODECS[self._audio_format]]
+                options = ["-i", str(pcm_filepath.resolve()), *codec_args]
+                self._run(filepath, output_filepath, options, prefix)
+        finally:
+            if pcm_filepath != output_filepath:
+                pcm_filepath.unlink(missing_ok=True)
+
+        return True
+
+    def _decode_slice(  # noqa: PLR0913
+        self: "ConvertToWavFile",
+        filepath: Path,
+        start: float,
+        end: float | None,
+        channels: int,
+        prefix: list[str],
+    ) -> np.ndarray:
+        """指定した区間をデコードし、(サンプル数, チャンネル数)のint16の配列で返す."""
+        duration_args = [] if end is None else ["-t", f"{end - start:.6f}"]
         command_args = [
+            *prefix,
             "ffmpeg",
-            "-y",  # 既存ファイルが存在する場合などで入力が必要となる部分を全てYesとする
+            "-nostdin",
+            "-v",
+            "error",
+            "-threads",
+            "1",
+            "-ss",
+            f"{start:.6f}",
             "-i",
-            f"{filepath.resolve()!s}",
+            str(filepath.resolve()),
+            *duration_args,
+            "-vn",
             "-ar",
-            "16000",
-            "-c:a",
-            "pcm_s16le",
+            str(self.SAMPLE_RATE),
+            "-ac",
+            str(channels),
+            "-f",
+            "s16le",
+            "-",
+        ]
+        proc = subprocess.run(
+            command_args,  # noqa: S603
+            capture_output=True,
+            timeout=self._timeout,
+            check=False,
+        )
+        if proc.returncode != 0:
+            _logger.error("command failed with exit status %d", proc.returncode)
+            _logger.error(proc.stderr.decode("utf-8", errors="replace"))
+
+            message = f"error decoding slice at {start:.1f} s: {filepath!s}"
+            raise ValueError(message)
+
+        return np.frombuffer(proc.stdout, dtype=np.int16).reshape(-1, channels)
+
+    def _run(
+        self: "ConvertToWavFile",
+        filepath: Path,
+        output_filepath: Path,
+        options: list[str],
+        prefix: list[str],
+    ) -> None:
+        """ffmpegで変換する."""
+        command_args = [
+            *prefix,
+            "ffmpeg",
+            "-y",  # 既存ファイルが存在する場合などで入力が必要となる部分を全てYesとする
+            *options,
             str(output_filepath.resolve()),
         ]
         proc = subprocess.Popen(
@@ -56,7 +332,7 @@ class ConvertToWavFile:
             stderr=subprocess.PIPE,
         )
         try:
-            result, error = proc.communicate(timeout=1800)
+            result, error = proc.communicate(timeout=self._timeout)
         except Exception:
             proc.kill()
             raise
@@ -70,4 +346,74 @@ class ConvertToWavFile:
         _logger.info("stdout: %s", result)
         _logger.warning("stderr: %s", result)
 
-        return output_filepath
+
+def _align(  # noqa: PLR0913
+    previous: np.ndarray,
+    previous_index: int,
+    current: np.ndarray,
+    current_index: int,
+    *,
+    window: int = 1600,
+    max_shift: int = 320,
+    tolerance: float = 0.05,
+) -> int | None:
+    """前後の区間で重ねてデコードした部分を比較し、境界のサンプルのずれを求める.
+
+    Parameters
+    ----------
+    previous : np.ndarray
+        前の区間の音声. (サンプル数, チャンネル数)
+
+    previous_index : int
+        前の区間での境界のサンプル位置
+
+    current : np.ndarray
+        次の区間の音声. (サンプル数, チャンネル数)
+
+    current_index : int
+        次の区間での境界のサンプル位置(シーク位置から算出した値)
+
+    window : int, optional
+        境界の前後で比較するサンプル数, by default 1600
+
+    max_shift : int, optional
+        探索するずれの最大サンプル数, by default 320
+
+    tolerance : float, optional
+        連続とみなす差の上限. 比較範囲の平均振幅に対する平均絶対誤差の比,
+        by default 0.05
+
+    Returns
+    -------
+    int | None
+        次の区間の境界のサンプル位置に加えるずれ. 波形が一致しない場合はNone.
+
+    """
+    if (
+        previous_index - window < 0
+        or previous_index + window > len(previous)
+        or current_index - window - max_shift < 0
+        or current_index + window + max_shift > len(current)
+    ):
+        return None
+
+    # 逆位相のチャンネルが打ち消し合わないよう、チャンネルごとに比較する
+    reference = previous[previous_index - window : previous_index + window]
+    reference = reference.astype(np.float32)
+    # 無音に近い区間でも判定できるよう、許容誤差には最小値(1 LSB)を設ける
+    limit = max(1.0, tolerance * float(np.mean(np.abs(reference))))
+    candidates = current[
+        current_index - window - max_shift : current_index + window + max_shift
+    ].astype(np.float32)
+
+    # 多くの場合はシーク位置どおりにデコードされるため、ずれなしを先に確認する
+    unshifted = candidates[max_shift : max_shift + 2 * window]
+    if float(np.mean(np.abs(unshifted - reference))) <= limit:
+        return 0
+    windows = np.lib.stride_tricks.sliding_window_view(candidates, 2 * window, axis=0)
+    errors = np.mean(np.abs(windows - reference.T), axis=(1, 2))
+    best = int(np.argmin(errors))
+    if errors[best] > limit:
+        return None
+
+    return best - max_shift
@@ -0,0 +1,186 @@
+"""whisper.cppの出力を逐次監視し、繰り返しなどの暴走を検出するモジュール."""
+
+import io
+import wave
+
+import numpy as np
+
+
+class DecodeMonitor:
+    """whisper.cppの出力を逐次監視し、暴走した場合に中断理由を返す.
+
+    Notes
+    -----
+    音楽や雑音、長い無音では、whisperが同じ文を繰り返し出力し続けることがある。
+    以下のいずれかに該当した場合を暴走とみなす。
+
+    - 1区間の出力の末尾で、同じ文字列が`min_repeats`回以上連続している
+    - 同じ内容の区間が`max_repeated_lines`回以上連続している
+    - 区間の時刻が音声の長さを`time_margin`秒以上超えている
+    - 出力文字数が音声の長さから想定される文字数を大きく超えている
+
+    繰り返しは区間ごとに判定し、短い相槌などの繰り返しは暴走とみなさない。
+
+    - 文字列の繰り返しは区間をまたいで判定せず、1区間の中で繰り返した部分の合計が
+      `min_loop_chars`文字以上の場合のみとする。
+    - 同じ内容の区間の連続は、区間の内容を`max_repeated_lines`回繰り返した長さが
+      `min_loop_chars`文字以上の場合のみとする。
+
+    区間の境界を無視して判定すると、短い相槌の区間が続いた場合に全体として長い
+    繰り返しとみなしてしまうため。短い区間が際限なく続く場合は、出力文字数や
+    区間の時刻の上限で判定する。
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: "DecodeMonitor",
+        duration: float,
+        *,
+        min_repeats: int = 5,
+        max_period: int = 50,
+        min_loop_chars: int = 30,
+        max_repeated_lines: int = 4,
+        max_chars_per_second: float = 25.0,
+        char_margin: int = 50,
+        time_margin: float = 10.0,
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        duration : float
+            音声の長さ(秒)
+
+        min_repeats : int, optional
+            繰り返しとみなす連続回数, by default 5
+
+        max_period : int, optional
+            検出する繰り返しの単位の最大文字数, by default 50
+
+        min_loop_chars : int, optional
+            繰り返しとみなす最小の文字数. 短い相槌などの繰り返しを除く, by default 30
+
+        max_repeated_lines : int, optional
+            同じ内容の区間の連続回数の上限, by default 4
+
+        max_chars_per_second : float, optional
+            音声1秒あたりの出力文字数の上限, by default 25.0
+
+        char_margin : int, optional
+            出力文字数の上限に加える文字数, by default 50
+
+        time_margin : float, optional
+            区間の時刻が音声の長さを超えることを許容する時間(秒), by default 10.0
+
+        """
+        self._duration = duration
+        self._min_repeats = min_repeats
+        self._max_period = max_period
+        self._min_loop_chars = min_loop_chars
+        self._max_repeated_lines = max_repeated_lines
+        self._max_chars_per_second = max_chars_per_second
+        self._char_margin = char_margin
+        self._time_margin = time_margin
+
+        self._num_chars = 0
+        self._last_line = ""
+        self._repeated_lines = 0
+
+    def feed(self: "DecodeMonitor", end_time: float, text: str) -> str | None:
+        """whisper.cppが出力した1区間分の結果を受け取る.
+
+        Parameters
+        ----------
+        end_time : float
+            区間の終了時刻(秒)
+
+        text : str
+            区間のテキスト
+
+        Returns
+        -------
+        str | None
+            暴走と判定した場合は中断理由. それ以外はNone
+
+        """
+        line = "".join(text.split())
+        self._num_chars += len(line)
+        self._repeated_lines = (
+            self._repeated_lines + 1 if line == self._last_line else 1
+        )
+        self._last_line = line
+
+        if (
+            self._repeated_lines >= self._max_repeated_lines
+            and len(line) * self._max_repeated_lines >= self._min_loop_chars
+        ):
+            return f"line repeated {self._repeated_lines} times: {line[:20]}"
+        period = self._repeated_period(line)
+        if period is not None:
+            return f"loop of {period} chars: {line[-period:][:20]}"
+        if end_time > self._duration + self._time_margin:
+            return f"timestamp {end_time:.1f} s exceeds audio {self._duration:.1f} s"
+        limit = self._max_chars_per_second * self._duration + self._char_margin
+        if self._num_chars > limit:
+            return f"{self._num_chars} chars exceeds {limit:.0f} chars for the audio"
+
+        return None
+
+    def _repeated_period(self: "DecodeMonitor", line: str) -> int | None:
+        """1区間の出力の末尾で繰り返している文字列の長さを取得する. ない場合はNone."""
+        tail = line[-self._max_period * (self._min_repeats + 1) :]
+        chars = np.array([ord(v) for v in tail], dtype=np.int32)
+        for period in range(1, min(self._max_period, len(chars) // 2) + 1):
+            # 末尾から何文字が`period`文字前と一致しているか
+            mismatches = np.flatnonzero(chars[period:] != chars[:-period])
+            run = len(chars) - period - (mismatches[-1] + 1 if len(mismatches) else 0)
+            if (
+                run >= period * (self._min_repeats - 1)
+                and run + period >= self._min_loop_chars
+            ):
+                return period
+
+        return None
+
+
+def trim_silence(
+    wav_data: bytes,
+    *,
+    frame_duration: float = 0.03,
+    threshold_db: float = -45.0,
+    keep_silence: float = 0.3,
+) -> bytes:
+    """wav形式の音声から無音部分を除く.
+
+    Notes
+    -----
+    フレームごとの音量がしきい値未満の区間を無音とし、発話の前後`keep_silence`秒
+    より離れた無音を除く。
+    発話がない場合は入力をそのまま返す。
+
+    """
+    with wave.open(io.BytesIO(wav_data), "rb") as f:
+        params = f.getparams()
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    frame_length = max(1, int(params.framerate * frame_duration))
+    num_frames = len(samples) // frame_length
+    if num_frames < 1:
+        return wav_data
+
+    frames = samples[: num_frames * frame_length].reshape(num_frames, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames / np.iinfo(np.int16).max), axis=1))
+    voiced = 20 * np.log10(np.maximum(rms, 1e-10)) >= threshold_db
+    if not np.any(voiced):
+        return wav_data
+
+    # 発話のフレームから`keep_silence`以内の無音フレームは残す
+    keep_frames = int(keep_silence / frame_duration)
+    window = np.ones(2 * keep_frames + 1, dtype=np.int32)
+    keep = np.convolve(voiced.astype(np.int32), window, mode="same") > 0
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setparams(params)
+        f.writeframes(frames[keep].tobytes())
+
+    return buffer.getvalue()
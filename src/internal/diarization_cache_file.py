@@ -0,0 +1,78 @@
+"""話者分離の途中結果(segmentationとembedding)をファイルに保存するモジュール."""
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from internal.interim_cache import atomic_write
+from pyannote.core import SlidingWindow, SlidingWindowFeature
+
+
+@dataclass
+class DiarizationCache:
+    """話者分離のクラスタリング前までの途中結果."""
+
+    segmentations: SlidingWindowFeature  # チャンクごとの話者区間
+    embeddings: np.ndarray  # チャンク・話者ごとの埋め込みベクトル
+
+
+class DiarizationCacheFile:
+    """話者分離の途中結果をファイルに保存する.
+
+    Notes
+    -----
+    segmentationが0/1のみの場合はuint8、それ以外はfloat16で保存する。
+    embeddingはクラスタリングの結果に影響しないようにfloat32のまま保存する。
+
+    """
+
+    def __init__(self: "DiarizationCacheFile", filepath: Path) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        filepath : Path
+            保存先のファイルパス
+
+        """
+        self._filepath = filepath
+
+    def save(self: "DiarizationCacheFile", cache: DiarizationCache) -> None:
+        """話者分離の途中結果を保存する."""
+        data = np.asarray(cache.segmentations.data)
+        is_binary = bool(np.all((data == 0) | (data == 1)))
+        window = cache.segmentations.sliding_window
+        with (
+            atomic_write(self._filepath) as temp_filepath,
+            temp_filepath.open("wb") as f,
+        ):
+            np.savez_compressed(
+                f,
+                segmentations=data.astype(np.uint8 if is_binary else np.float16),
+                sliding_window=np.array(
+                    [window.start, window.duration, window.step], dtype=np.float64
+                ),
+                embeddings=np.asarray(cache.embeddings, dtype=np.float32),
+            )
+
+    def get_cache(self: "DiarizationCacheFile") -> DiarizationCache | None:
+        """話者分離の途中結果を取得する. 保存されていない場合はNoneを返す."""
+        if not self._filepath.exists():
+            return None
+
+        with np.load(self._filepath) as data:
+            start, duration, step = data["sliding_window"].tolist()
+            segmentations = SlidingWindowFeature(
+                data["segmentations"].astype(np.float32),
+                SlidingWindow(start=start, duration=duration, step=step),
+            )
+            return DiarizationCache(
+                segmentations=segmentations, embeddings=data["embeddings"]
+            )
+
+    def clean(self: "DiarizationCacheFile") -> None:
+        """保存されている途中結果を削除する."""
+        if not self._filepath.exists():
+            return
+
+        self._filepath.unlink()
@@ -0,0 +1,108 @@
+"""文字起こし結果の評価指標を算出するモジュール."""
+
+import unicodedata
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class ErrorCount:
+    """編集距離による誤りの数."""
+
+    errors: int = 0  # 置換、削除、挿入の合計
+    reference_length: int = 0  # 正解の長さ
+
+    @property
+    def rate(self: "ErrorCount") -> float:
+        """誤り率. 正解が空の場合はNaN."""
+        if self.reference_length < 1:
+            return float("nan")
+
+        return self.errors / self.reference_length
+
+    def __add__(self: "ErrorCount", other: "ErrorCount") -> "ErrorCount":
+        """誤りの数を合算する."""
+        return ErrorCount(
+            errors=self.errors + other.errors,
+            reference_length=self.reference_length + other.reference_length,
+        )
+
+
+def normalize_text(text: str) -> str:
+    """表記揺れを減らすため、NFKC正規化して小文字にする."""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def to_characters(text: str) -> list[str]:
+    """文字誤り率(CER)用に、句読点、記号と空白を除いた文字の列にする."""
+    return [v for v in normalize_text(text) if not _is_ignored(v)]
+
+
+def to_words(text: str) -> list[str]:
+    """単語誤り率(WER)用に、句読点と記号を除いて空白で区切った単語の列にする."""
+    words = (
+        "".join(v for v in word if not _is_ignored(v))
+        for word in normalize_text(text).split()
+    )
+
+    return [word for word in words if word != ""]
+
+
+def edit_distance(reference: Sequence[str], hypothesis: Sequence[str]) -> int:
+    """編集距離(レーベンシュタイン距離)を算出する.
+
+    Notes
+    -----
+    動的計画法の1行分をNumPyでまとめて計算する。
+    挿入による遷移は`min.accumulate`で行内の累積最小値として求める。
+
+    """
+    if len(reference) < 1 or len(hypothesis) < 1:
+        return max(len(reference), len(hypothesis))
+
+    vocabulary: dict[str, int] = {}
+    hyp_ids = np.array([vocabulary.setdefault(v, len(vocabulary)) for v in hypothesis])
+    positions = np.arange(len(hypothesis) + 1)
+    row = positions.copy()
+    for index, token in enumerate(reference, start=1):
+        token_id = vocabulary.get(token, -1)
+        candidates = np.empty_like(row)
+        candidates[0] = index
+        candidates[1:] = np.minimum(row[1:] + 1, row[:-1] + (hyp_ids != token_id))
+        row = np.minimum.accumulate(candidates - positions) + positions
+
+    return int(row[-1])
+
+
+def count_errors(reference: Sequence[str], hypothesis: Sequence[str]) -> ErrorCount:
+    """正解と認識結果の編集距離と正解の長さを算出する."""
+    return ErrorCount(
+        errors=edit_distance(reference, hypothesis), reference_length=len(reference)
+    )
+
+
+def pareto_front(points: Sequence[Sequence[float]]) -> list[bool]:
+    """各点がパレート最適かどうかを判定する. 全ての軸で小さいほど良いとする.
+
+    Notes
+    -----
+    NaNを含む軸は比較から除く。
+
+    """
+    values = np.asarray(points, dtype=np.float64)
+    if values.size < 1:
+        return []
+    values = values[:, ~np.any(np.isnan(values), axis=0)]
+    is_optimal: list[bool] = []
+    for value in values:
+        dominated = np.all(values <= value, axis=1) & np.any(values < value, axis=1)
+        is_optimal.append(not bool(np.any(dominated)))
+
+    return is_optimal
+
+
+def _is_ignored(char: str) -> bool:
+    """誤り率の算出から除く文字(空白、句読点、記号)かどうか."""
+    return char.isspace() or unicodedata.category(char)[0] in ("P", "S")
@@ -0,0 +1,264 @@
+"""中間ファイルの容量を管理し、上限を超えた分を削除するモジュール."""
+
+import fcntl
+import logging
+import shutil
+import time
+import uuid
+from collections.abc import Generator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from pathlib import Path
+
+_logger = logging.getLogger(__name__)
+
+# 音源ごとのディレクトリで処理中であることを表すロックファイル
+_LOCK_FILENAME = ".lock"
+
+# 中間ファイルの種類と削除の優先度. 先に一致したものを利用する.
+# 優先度が小さいほど再作成が容易で、先に削除する.
+_CATEGORIES: list[tuple[str, str, int]] = [
+    ("*.tmp*", "temp", 0),  # 書き込み途中で残った一時ファイル
+    ("whisper_*", "temp", 0),  # 強制終了で残ったwhisper.cpp用の区間の音声
+    ("*.wav", "audio", 1),  # 変換した音声. ffmpegで再作成できる
+    ("*.flac", "audio", 1),
+    ("speaker_diarization_cache.*", "derived", 2),  # 話者の再クラスタリング用
+    ("speech_integrate_text.*", "derived", 2),  # 文字起こし結果から再計算できる
+    ("speech_text_failed.*", "derived", 2),
+    # 統合した話者区間. worker.pyの文字起こしのジョブが読み込むため削除を遅らせる
+    ("speaker_segment_integrate.*", "result", 3),
+    ("*", "result", 3),  # 話者分離、文字起こしの結果. 再作成に時間がかかる
+]
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """中間ファイル. 音源ごとのディレクトリの直下のファイルもしくはディレクトリ."""
+
+    path: Path  # ファイルパス
+    recording: str  # 音源ごとのディレクトリ名
+    category: str  # 種類
+    priority: int  # 削除の優先度. 小さいほど先に削除する
+    size: int  # 容量(バイト)
+    last_used: float  # 最後に利用された時刻(UNIX時間)
+
+
+class InterimCache:
+    """中間ファイルの容量を管理し、上限を超えた分を削除する.
+
+    Notes
+    -----
+    `data/interim`の音源ごとのディレクトリにある中間ファイルを対象とする。
+    削除は再作成が容易な種類(音声など)から行い、同じ種類の中では最後に利用された
+    時刻が古いものから行う。
+    処理中の音源のディレクトリは`lock_recording`で共有ロックを取得しておき、
+    削除時に排他ロックを取得できないディレクトリは対象外とする。
+    一時ファイルは`temp_max_age`を超えて更新されていない場合のみ削除する。
+
+    """
+
+    def __init__(
+        self: "InterimCache", root_dir: Path, *, temp_max_age: float = 3600.0
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        root_dir : Path
+            中間ファイルのディレクトリ
+
+        temp_max_age : float, optional
+            書き込み途中の一時ファイルとみなす時間(秒). これより古い一時ファイルは
+            容量に関わらず削除する, by default 3600.0
+
+        """
+        self._root_dir = root_dir
+        self._temp_max_age = temp_max_age
+
+    def entries(self: "InterimCache") -> list[CacheEntry]:
+        """中間ファイルの一覧を取得する."""
+        if not self._root_dir.exists():
+            return []
+
+        entries: list[CacheEntry] = []
+        for recording_dir in sorted(self._root_dir.iterdir()):
+            if not recording_dir.is_dir():
+                continue
+            for path in sorted(recording_dir.iterdir()):
+                entry = self._entry(recording_dir, path)
+                if entry is not None:
+                    entries.append(entry)
+
+        return entries
+
+    def stats(self: "InterimCache") -> dict[str, dict[str, int]]:
+        """種類ごと、音源ごとの容量とファイル数を集計する."""
+        stats: dict[str, dict[str, int]] = {
+            "total": {"size": 0, "count": 0},
+        }
+        for entry in self.entries():
+            for key in ("total", f"category:{entry.category}", entry.recording):
+                value = stats.setdefault(key, {"size": 0, "count": 0})
+                value["size"] += entry.size
+                value["count"] += 1
+
+        return stats
+
+    def prune(
+        self: "InterimCache",
+        budget: int | None = None,
+        *,
+        max_age: float | None = None,
+        dry_run: bool = False,
+    ) -> list[CacheEntry]:
+        """中間ファイルを削除して、合計容量を上限以下にする.
+
+        Parameters
+        ----------
+        budget : int | None, optional
+            中間ファイルの合計容量の上限(バイト). Noneの場合は容量では削除しない,
+            by default None
+
+        max_age : float | None, optional
+            この時間(秒)を超えて利用されていない中間ファイルは容量に関わらず削除する.
+            Noneの場合は時間では削除しない, by default None
+
+        dry_run : bool, optional
+            削除せずに削除対象の一覧のみを返す, by default False
+
+        Returns
+        -------
+        list[CacheEntry]
+            削除した(dry_runの場合は削除対象の)中間ファイル
+
+        """
+        now = time.time()
+        entries = sorted(self.entries(), key=lambda v: (v.priority, v.last_used))
+        total_size = sum(v.size for v in entries)
+        targets: list[CacheEntry] = []
+        for entry in entries:
+            age = now - entry.last_used
+            if (
+                (entry.category == "temp" and age > self._temp_max_age)
+                or (max_age is not None and age > max_age)
+                or (budget is not None and total_size > budget)
+            ):
+                targets.append(entry)
+                total_size -= entry.size
+
+        removed: list[CacheEntry] = []
+        for recording in dict.fromkeys(v.recording for v in targets):
+            recording_dir = self._root_dir / recording
+            recording_targets = [v for v in targets if v.recording == recording]
+            with _try_lock_exclusive(recording_dir) as locked:
+                if not locked:
+                    _logger.info("skip recording in use: %s", recording)
+                    continue
+                for entry in recording_targets:
+                    _logger.info(
+                        "evict %s (%s, %d bytes)",
+                        entry.path,
+                        entry.category,
+                        entry.size,
+                    )
+                    if not dry_run:
+                        _remove(entry.path)
+                    removed.append(entry)
+
+        return removed
+
+    def _entry(
+        self: "InterimCache", recording_dir: Path, path: Path
+    ) -> CacheEntry | None:
+        """中間ファイルの情報を取得する. 削除済みの場合はNone."""
+        if path.name == _LOCK_FILENAME:
+            return None
+        category, priority = next(
+            (category, priority)
+            for pattern, category, priority in _CATEGORIES
+            if fnmatch(path.name, pattern)
+        )
+        try:
+            files = [path] if path.is_file() else list(path.rglob("*"))
+            stats = [v.stat() for v in files if v.is_file()]
+            last_used = max(
+                [path.stat().st_mtime, *(max(v.st_atime, v.st_mtime) for v in stats)]
+            )
+        except FileNotFoundError:
+            return None
+
+        return CacheEntry(
+            path=path,
+            recording=recording_dir.name,
+            category=category,
+            priority=priority,
+            size=sum(v.st_size for v in stats),
+            last_used=last_used,
+        )
+
+
+@contextmanager
+def lock_recording(recording_dir: Path) -> Generator[None, None, None]:
+    """処理中の音源のディレクトリの中間ファイルを削除されないようにする."""
+    recording_dir.mkdir(parents=True, exist_ok=True)
+    with (recording_dir / _LOCK_FILENAME).open("a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def atomic_write(filepath: Path) -> Generator[Path, None, None]:
+    """一時ファイルに書き込み、完了後に置き換える.
+
+    Notes
+    -----
+    書き込み途中のファイルを他の処理が読み込まないように、同じディレクトリの
+    一時ファイルのパスを返し、例外なく終了した場合のみ`filepath`に置き換える。
+    一時ファイルは拡張子を維持するため、ffmpegなどの出力先にも利用できる。
+
+    """
+    temp_filepath = filepath.with_name(
+        f".{filepath.stem}.{uuid.uuid4().hex}.tmp{filepath.suffix}"
+    )
+    try:
+        yield temp_filepath
+        temp_filepath.replace(filepath)
+    finally:
+        temp_filepath.unlink(missing_ok=True)
+
+
+def parse_size(value: str) -> int:
+    """20Gのような容量の文字列をバイト数にする. 単位はK, M, G, T(1024の累乗)."""
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    value = value.strip().upper().removesuffix("B")
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+
+    return int(value)
+
+
+@contextmanager
+def _try_lock_exclusive(recording_dir: Path) -> Generator[bool, None, None]:
+    """音源のディレクトリの排他ロックを取得する. 処理中の場合はFalseを返す."""
+    with (recording_dir / _LOCK_FILENAME).open("a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _remove(path: Path) -> None:
+    """ファイルもしくはディレクトリを削除する."""
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    path.unlink(missing_ok=True)
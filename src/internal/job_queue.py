@@ -0,0 +1,470 @@
+"""共有ファイルシステム上のファイルで複数のホストにジョブを分配するモジュール."""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections.abc import Generator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Job:
+    """キューに登録するジョブ."""
+
+    job_id: str  # ジョブの識別子
+    kind: str  # 処理の種類
+    payload: dict[str, Any] = field(default_factory=dict)  # 処理に渡すパラメータ
+    depends_on: tuple[str, ...] = ()  # 完了している必要があるジョブの識別子
+
+
+@dataclass
+class JobLease:
+    """ワーカーが取得したジョブの実行権."""
+
+    job: Job  # 実行するジョブ
+    worker_id: str  # 実行するワーカーの識別子
+    generation: int  # リースの世代. 取得されるたびに増え、再利用されない
+    filepath: Path  # リースファイルのパス
+    token: str  # リースファイルに記録した、このリースに固有の識別子
+    lost: bool = False  # 他のワーカーにリースを取得されたかどうか
+
+
+class JobQueue:
+    """共有ファイルシステム上のファイルでジョブを分配する.
+
+    Notes
+    -----
+    外部のブローカーを利用せず、NFSなどの共有ディレクトリだけで複数のホストの
+    ワーカーがジョブを分け合う。ディレクトリの構成は以下のとおり。
+
+    - jobs/<job>.json: 登録されたジョブ
+    - leases/<job>.<世代>: 実行中のワーカーを表すリースファイル. 解放後も残す
+    - done/<job>.json: 完了したジョブの結果
+    - failed/<job>.<ワーカー>.<時刻>: 失敗した実行の記録
+
+    ファイルの作成は一時ファイルを`os.link`で作成先に結び付けて行う。
+    作成先が既に存在する場合は失敗するため、NFSでも1つのワーカーだけが成功する。
+    リースファイルの更新時刻を`heartbeat`で定期的に更新し、`lease_duration`を
+    超えて更新されないリースは期限切れとして、次の世代のリースで再取得する。
+    解放したリースファイルは削除せず解放済みの内容に置き換えるため、世代は戻らず、
+    同じパスのリースファイルが作り直されることはない。
+    リースファイルにはリースごとの識別子を記録し、`heartbeat`と`release`では
+    最新の世代が自身のリースであることを識別子で確認する。
+    ホスト間の時刻のずれは`lease_duration`より十分小さい必要がある。
+
+    """
+
+    def __init__(
+        self: "JobQueue",
+        root_dir: Path,
+        *,
+        lease_duration: float = 60.0,
+        max_attempts: int = 3,
+        worker_id: str | None = None,
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        root_dir : Path
+            共有ファイルシステム上のキューのディレクトリ
+
+        lease_duration : float, optional
+            リースの有効期間(秒). この時間を超えてheartbeatがない場合は
+            他のワーカーが再取得する, by default 60.0
+
+        max_attempts : int, optional
+            ジョブを失敗とみなすまでの実行回数, by default 3
+
+        worker_id : str | None, optional
+            ワーカーの識別子. Noneの場合はホスト名とプロセスIDから作成する,
+            by default None
+
+        """
+        self._jobs_dir = root_dir / "jobs"
+        self._leases_dir = root_dir / "leases"
+        self._done_dir = root_dir / "done"
+        self._failed_dir = root_dir / "failed"
+        for dirpath in (
+            self._jobs_dir,
+            self._leases_dir,
+            self._done_dir,
+            self._failed_dir,
+        ):
+            dirpath.mkdir(parents=True, exist_ok=True)
+        self._lease_duration = lease_duration
+        self._max_attempts = max_attempts
+        self._worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._jobs: dict[str, Job] = {}
+
+    @property
+    def worker_id(self: "JobQueue") -> str:
+        """ワーカーの識別子."""
+        return self._worker_id
+
+    def submit(self: "JobQueue", job: Job) -> bool:
+        """ジョブを登録する. 同じ識別子のジョブが登録済みの場合は何もしない.
+
+        Returns
+        -------
+        bool
+            新しく登録した場合はTrue
+
+        """
+        data = {
+            "job_id": job.job_id,
+            "kind": job.kind,
+            "payload": job.payload,
+            "depends_on": list(job.depends_on),
+        }
+        filepath = self._jobs_dir / f"{_filename(job.job_id)}.json"
+        created = self._create_exclusive(filepath, json.dumps(data))
+        if created:
+            _logger.info("submit job: %s", job.job_id)
+
+        return created
+
+    def jobs(self: "JobQueue") -> list[Job]:
+        """登録されたジョブを登録順に取得する."""
+        entries = [
+            (submitted_at, filepath.name, filepath)
+            for filepath in self._jobs_dir.glob("*.json")
+            if (submitted_at := _mtime(filepath)) is not None
+        ]
+
+        jobs: list[Job] = []
+        for _, name, filepath in sorted(entries):
+            if name not in self._jobs:
+                data = json.loads(filepath.read_text())
+                self._jobs[name] = Job(
+                    job_id=data["job_id"],
+                    kind=data["kind"],
+                    payload=data["payload"],
+                    depends_on=tuple(data["depends_on"]),
+                )
+            jobs.append(self._jobs[name])
+
+        return jobs
+
+    def claim(self: "JobQueue", kinds: Sequence[str] | None = None) -> JobLease | None:
+        """実行可能なジョブを1つ取得する. ない場合はNoneを返す.
+
+        Parameters
+        ----------
+        kinds : Sequence[str] | None, optional
+            取得する処理の種類. Noneの場合は全て, by default None
+
+        """
+        for job in self.jobs():
+            if kinds is not None and job.kind not in kinds:
+                continue
+            if self.is_done(job.job_id) or self.is_failed(job.job_id):
+                continue
+            if not all(self.is_done(v) for v in job.depends_on):
+                continue
+            lease = self._try_lease(job)
+            if lease is not None:
+                return lease
+
+        return None
+
+    def heartbeat(self: "JobQueue", lease: JobLease) -> bool:
+        """リースの更新時刻を更新する. リースを失っている場合はFalseを返す."""
+        if lease.lost:
+            return False
+
+        lease_filepaths = self._lease_filepaths(lease.job.job_id)
+        if len(lease_filepaths) < 1 or not self._is_owner(lease, lease_filepaths[-1]):
+            lease.lost = True
+        else:
+            try:
+                os.utime(lease.filepath)
+            except FileNotFoundError:
+                lease.lost = True
+        if lease.lost:
+            _logger.warning("lease lost: %s", lease.job.job_id)
+
+        return not lease.lost
+
+    @contextmanager
+    def keep_alive(
+        self: "JobQueue", lease: JobLease
+    ) -> Generator[JobLease, None, None]:
+        """処理の間、バックグラウンドでリースを更新する."""
+        stopped = threading.Event()
+
+        def _run() -> None:
+            while not stopped.wait(self._lease_duration / 3):
+                if not self.heartbeat(lease):
+                    return
+
+        thread = threading.Thread(target=_run, name="heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield lease
+        finally:
+            stopped.set()
+            thread.join()
+
+    def complete(self: "JobQueue", lease: JobLease, result: dict[str, Any]) -> bool:
+        """ジョブを完了として結果を記録し、リースを解放する.
+
+        Returns
+        -------
+        bool
+            リースを失っていて結果を記録しなかった場合はFalse
+
+        """
+        if not self.heartbeat(lease):
+            return False
+
+        filepath = self._done_dir / f"{_filename(lease.job.job_id)}.json"
+        self._create_exclusive(filepath, json.dumps(result))
+        self.release(lease)
+        _logger.info("complete job: %s", lease.job.job_id)
+
+        return True
+
+    def fail(self: "JobQueue", lease: JobLease, message: str) -> None:
+        """ジョブの実行失敗を記録し、リースを解放する. 他のワーカーが再実行する."""
+        name = f"{_filename(lease.job.job_id)}.{_filename(self._worker_id)}"
+        filepath = self._failed_dir / f"{name}.{time.time_ns()}"
+        self._create_exclusive(filepath, message)
+        self.release(lease)
+        _logger.warning("fail job: %s", lease.job.job_id)
+
+    def release(self: "JobQueue", lease: JobLease) -> None:
+        """リースを解放する.
+
+        Notes
+        -----
+        リースファイルは削除せず、識別子を持たない解放済みの内容に置き換える。
+        他のワーカーに再取得されたリースのファイルは変更しない。
+
+        """
+        if lease.lost:
+            return
+        lease.lost = True
+        if not self._is_owner(lease, lease.filepath):
+            return
+        info = {"worker_id": self._worker_id, "released_at": time.time()}
+        temp_filepath = self._leases_dir / f".{lease.filepath.name}.{lease.token}.tmp"
+        temp_filepath.write_text(json.dumps(info))
+        try:
+            temp_filepath.replace(lease.filepath)
+        finally:
+            temp_filepath.unlink(missing_ok=True)
+
+    def result(self: "JobQueue", job_id: str) -> dict[str, Any] | None:
+        """完了したジョブの結果を取得する. 完了していない場合はNone."""
+        filepath = self._done_dir / f"{_filename(job_id)}.json"
+        if not filepath.exists():
+            return None
+
+        return json.loads(filepath.read_text())
+
+    def is_done(self: "JobQueue", job_id: str) -> bool:
+        """ジョブが完了しているかどうか."""
+        return (self._done_dir / f"{_filename(job_id)}.json").exists()
+
+    def is_failed(self: "JobQueue", job_id: str) -> bool:
+        """ジョブの実行失敗が上限回数に達したかどうか."""
+        return self.attempts(job_id) >= self._max_attempts
+
+    def attempts(self: "JobQueue", job_id: str) -> int:
+        """ジョブの実行に失敗した回数."""
+        return len(list(self._failed_dir.glob(f"{_filename(job_id)}.*")))
+
+    def status(self: "JobQueue") -> dict[str, str]:
+        """ジョブごとの状態を取得する.
+
+        Notes
+        -----
+        状態は以下のいずれか。
+
+        - done: 完了
+        - failed: 実行失敗が上限回数に達した
+        - blocked: 依存するジョブが失敗した
+        - running: 有効なリースがある
+        - waiting: 依存するジョブの完了待ち
+        - pending: 実行待ち
+
+        """
+        jobs = self.jobs()
+        status: dict[str, str] = {}
+        for job in jobs:
+            if self.is_done(job.job_id):
+                status[job.job_id] = "done"
+            elif self.is_failed(job.job_id):
+                status[job.job_id] = "failed"
+        # 依存するジョブは先に登録されているため、登録順に判定すればよい
+        for job in jobs:
+            if job.job_id in status:
+                continue
+            depends = [status.get(v, "waiting") for v in job.depends_on]
+            if any(v in ("failed", "blocked") for v in depends):
+                status[job.job_id] = "blocked"
+            elif self._is_running(job):
+                status[job.job_id] = "running"
+            elif any(v != "done" for v in depends):
+                status[job.job_id] = "waiting"
+            else:
+                status[job.job_id] = "pending"
+
+        return status
+
+    def is_idle(self: "JobQueue") -> bool:
+        """実行待ち、実行中のジョブがないかどうか."""
+        return all(v in ("done", "failed", "blocked") for v in self.status().values())
+
+    def _try_lease(self: "JobQueue", job: Job) -> JobLease | None:
+        """ジョブのリースの取得を試みる."""
+        lease_filepaths = self._lease_filepaths(job.job_id)
+        generation = 0
+        if len(lease_filepaths) > 0:
+            current = lease_filepaths[-1]
+            if self._is_active(current):
+                return None
+            generation = _generation(current) + 1
+            if not _is_released(current):
+                _logger.warning("reclaim expired lease: %s", current.name)
+
+        filepath = self._leases_dir / f"{_filename(job.job_id)}.{generation:06d}"
+        token = uuid.uuid4().hex
+        info = {
+            "worker_id": self._worker_id,
+            "token": token,
+            "acquired_at": time.time(),
+        }
+        if not self._create_exclusive(filepath, json.dumps(info)):
+            return None
+        lease = JobLease(
+            job=job,
+            worker_id=self._worker_id,
+            generation=generation,
+            filepath=filepath,
+            token=token,
+        )
+
+        # 古い一覧から作成した世代は、既に新しい世代がある場合がある
+        latest_filepaths = self._lease_filepaths(job.job_id)
+        if len(latest_filepaths) < 1 or latest_filepaths[-1] != filepath:
+            filepath.unlink(missing_ok=True)
+            return None
+        for old_filepath in latest_filepaths[:-1]:
+            old_filepath.unlink(missing_ok=True)
+
+        # 一覧の取得後に他のワーカーが完了させていた場合
+        if self.is_done(job.job_id):
+            self.release(lease)
+            return None
+        _logger.info("claim job: %s (generation %d)", job.job_id, generation)
+
+        return lease
+
+    def _is_running(self: "JobQueue", job: Job) -> bool:
+        """ジョブに有効なリースがあるかどうか."""
+        lease_filepaths = self._lease_filepaths(job.job_id)
+
+        return len(lease_filepaths) > 0 and self._is_active(lease_filepaths[-1])
+
+    def _is_active(self: "JobQueue", filepath: Path) -> bool:
+        """リースファイルが有効なリースかどうか.
+
+        Notes
+        -----
+        解放済み、期限切れのリースは有効としない。
+        一覧の取得後に削除された場合は、新しい世代で取得されているため有効とする。
+
+        """
+        updated_at = _mtime(filepath)
+        if updated_at is None:
+            return True
+        if _is_released(filepath):
+            return False
+
+        return time.time() - updated_at <= self._lease_duration
+
+    def _is_owner(self: "JobQueue", lease: JobLease, filepath: Path) -> bool:
+        """リースファイルが、識別子の一致する自身のリースかどうか."""
+        if filepath != lease.filepath:
+            return False
+        info = _read_lease(filepath)
+
+        return info is not None and info.get("token") == lease.token
+
+    def _lease_filepaths(self: "JobQueue", job_id: str) -> list[Path]:
+        """ジョブのリースファイルを世代順に取得する."""
+        return sorted(self._leases_dir.glob(f"{_filename(job_id)}.*"), key=_generation)
+
+    def _create_exclusive(self: "JobQueue", filepath: Path, text: str) -> bool:
+        """ファイルが存在しない場合のみ作成する.
+
+        Notes
+        -----
+        NFSでは`link`の応答が失われて再送された場合に、成功していても
+        エラーになることがあるため、一時ファイルのリンク数で成否を確認する。
+
+        """
+        temp_filepath = filepath.parent / f".{filepath.name}.{uuid.uuid4().hex}.tmp"
+        temp_filepath.write_text(text)
+        try:
+            os.link(temp_filepath, filepath)
+        except FileExistsError:
+            return False
+        except OSError:
+            if temp_filepath.stat().st_nlink != 2:  # noqa: PLR2004
+                raise
+        finally:
+            temp_filepath.unlink(missing_ok=True)
+
+        return True
+
+
+def _filename(job_id: str) -> str:
+    """識別子をファイル名に利用できる文字列にする.
+
+    Notes
+    -----
+    ファイル名の区切りに"."を利用するため、"."もエスケープする。
+
+    """
+    return quote(job_id, safe="").replace(".", "%2E")
+
+
+def _mtime(filepath: Path) -> float | None:
+    """ファイルの更新時刻を取得する. 削除済みの場合はNone."""
+    try:
+        return filepath.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _generation(filepath: Path) -> int:
+    """リースファイル名から世代を取得する."""
+    return int(filepath.name.rsplit(".", 1)[-1])
+
+
+def _read_lease(filepath: Path) -> dict[str, Any] | None:
+    """リースファイルの内容を読み込む. 削除済みの場合はNone."""
+    try:
+        return json.loads(filepath.read_text())
+    except FileNotFoundError:
+        return None
+
+
+def _is_released(filepath: Path) -> bool:
+    """リースファイルが解放済みかどうか. 削除済みの場合はFalse."""
+    info = _read_lease(filepath)
+
+    return info is not None and "released_at" in info
@@ -0,0 +1,112 @@
+"""ffprobeで音声・動画ファイルの形式を取得するモジュール."""
+
+import json
+import logging
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    """音声・動画ファイルの形式."""
+
+    format_names: tuple[str, ...]  # コンテナ形式. ffprobeのformat_nameを分割したもの
+    duration: float | None  # 長さ(秒)
+    audio_codec: str | None  # 音声のcodec. 音声がない場合はNone
+    sample_rate: int | None  # 音声のサンプリングレート
+    channels: int | None  # 音声のチャンネル数
+    sample_fmt: str | None  # 音声のサンプル形式
+    video_codec: str | None  # 動画のcodec. 動画がない場合はNone
+
+    def has_audio_format(
+        self: "MediaInfo", codec: str, sample_rate: int, channels: int = 1
+    ) -> bool:
+        """音声ストリームが指定したcodec、サンプリングレート、チャンネル数の16 bitか."""
+        return (
+            self.audio_codec == codec
+            and self.sample_rate == sample_rate
+            and self.channels == channels
+            and self.sample_fmt in ("s16", "s16p")
+        )
+
+    def has_container(self: "MediaInfo", name: str) -> bool:
+        """コンテナ形式が指定した形式かどうか."""
+        return name in self.format_names
+
+
+class MediaProbe:
+    """ffprobeで音声・動画ファイルの形式を取得する."""
+
+    def __init__(self: "MediaProbe", timeout: float = 60.0) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            ffprobeのタイムアウト時間(秒), by default 60.0
+
+        """
+        self._timeout = timeout
+
+    def probe(self: "MediaProbe", filepath: Path) -> MediaInfo | None:
+        """ファイルの形式を取得する. 取得できない場合はNoneを返す."""
+        if not filepath.is_file():
+            message = f"file not found: {filepath!s}"
+            raise FileNotFoundError(message)
+
+        command_args = [
+            "ffprobe",
+            "-v",
+            "error",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            str(filepath.resolve()),
+        ]
+        try:
+            proc = subprocess.run(
+                command_args,  # noqa: S603
+                capture_output=True,
+                encoding="utf-8",
+                timeout=self._timeout,
+                check=False,
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            _logger.warning("ffprobe failed: %r", e)
+            return None
+        if proc.returncode != 0:
+            _logger.warning("ffprobe failed with exit status %d", proc.returncode)
+            _logger.warning(proc.stderr)
+            return None
+
+        return self._parse(json.loads(proc.stdout))
+
+    def _parse(self: "MediaProbe", data: dict) -> MediaInfo:
+        """ffprobeのjson出力から形式を取得する."""
+        streams = data.get("streams", [])
+        audio = next((v for v in streams if v.get("codec_type") == "audio"), {})
+        video = next(
+            (
+                v
+                for v in streams
+                if v.get("codec_type") == "video"
+                and v.get("disposition", {}).get("attached_pic", 0) == 0
+            ),
+            {},
+        )
+        media_format = data.get("format", {})
+        duration = media_format.get("duration")
+
+        return MediaInfo(
+            format_names=tuple(media_format.get("format_name", "").split(",")),
+            duration=None if duration is None else float(duration),
+            audio_codec=audio.get("codec_name"),
+            sample_rate=int(audio["sample_rate"]) if "sample_rate" in audio else None,
+            channels=audio.get("channels"),
+            sample_fmt=audio.get("sample_fmt"),
+            video_codec=video.get("codec_name"),
+        )
@@ -0,0 +1,117 @@
+"""話者分離パイプラインの推論をONNX Runtimeで行うモジュール."""
+
+import logging
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+import torch
+from internal.onnx_model_exporter import (
+    EMBEDDING_MODEL_NAME,
+    SEGMENTATION_MODEL_NAME,
+    onnx_model_filepath,
+)
+from pyannote.audio import Pipeline
+
+_logger = logging.getLogger(__name__)
+
+
+class OnnxDiarizationBackend:
+    """話者分離パイプラインのモデル推論をONNX Runtimeで実行する.
+
+    Notes
+    -----
+    パイプラインのクラスタリングなどの処理はそのまま利用し、
+    各モデルのforwardのみをONNX Runtimeの推論に置き換える。
+
+    """
+
+    def __init__(
+        self: "OnnxDiarizationBackend",
+        model_dir: Path,
+        *,
+        quantized: bool = False,
+        intra_op_num_threads: int = 0,
+        inter_op_num_threads: int = 1,
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        model_dir : Path
+            ONNXモデルを保存したディレクトリ
+
+        quantized : bool, optional
+            int8に量子化したモデルを利用するかどうか, by default False
+
+        intra_op_num_threads : int, optional
+            演算内の並列数. 0の場合はONNX Runtimeに任せる, by default 0
+
+        inter_op_num_threads : int, optional
+            演算間の並列数, by default 1
+
+        """
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_num_threads
+        options.inter_op_num_threads = inter_op_num_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        providers = ["CPUExecutionProvider"]
+        self._segmentation = ort.InferenceSession(
+            str(
+                onnx_model_filepath(
+                    model_dir, SEGMENTATION_MODEL_NAME, quantized=quantized
+                )
+            ),
+            sess_options=options,
+            providers=providers,
+        )
+        self._embedding = ort.InferenceSession(
+            str(
+                onnx_model_filepath(
+                    model_dir, EMBEDDING_MODEL_NAME, quantized=quantized
+                )
+            ),
+            sess_options=options,
+            providers=providers,
+        )
+
+    def attach(self: "OnnxDiarizationBackend", pipeline: Pipeline) -> Pipeline:
+        """パイプラインのモデル推論をONNX Runtimeに置き換える."""
+        pipeline.to(torch.device("cpu"))
+
+        segmentation_model = pipeline._segmentation.model  # noqa: SLF001
+        segmentation_model.forward = self._segmentation_forward
+
+        embedding_model = pipeline._embedding.model_  # noqa: SLF001
+        embedding_model.resnet.forward = self._embedding_forward
+        _logger.info("attach onnx runtime backend.")
+
+        return pipeline
+
+    def _segmentation_forward(
+        self: "OnnxDiarizationBackend", waveforms: torch.Tensor
+    ) -> torch.Tensor:
+        """segmentationモデルの推論."""
+        (scores,) = self._segmentation.run(
+            None, {"waveforms": waveforms.detach().cpu().numpy().astype(np.float32)}
+        )
+        return torch.from_numpy(scores)
+
+    def _embedding_forward(
+        self: "OnnxDiarizationBackend",
+        fbank: torch.Tensor,
+        weights: torch.Tensor | None = None,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """embeddingモデル(ResNet部分)の推論."""
+        fbank_array = fbank.detach().cpu().numpy().astype(np.float32)
+        weights_array = (
+            np.ones(fbank_array.shape[:2], dtype=np.float32)
+            if weights is None
+            else weights.detach().cpu().numpy().astype(np.float32)
+        )
+        (embeddings,) = self._embedding.run(
+            None, {"fbank": fbank_array, "weights": weights_array}
+        )
+        return torch.tensor(0.0), torch.from_numpy(embeddings)
@@ -0,0 +1,146 @@
+"""話者分離パイプラインのモデルをONNX形式に変換するモジュール."""
+
+import logging
+from pathlib import Path
+
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from pyannote.audio import Pipeline
+
+_logger = logging.getLogger(__name__)
+
+SEGMENTATION_MODEL_NAME = "segmentation"
+EMBEDDING_MODEL_NAME = "embedding"
+
+
+def onnx_model_filepath(model_dir: Path, name: str, *, quantized: bool) -> Path:
+    """ONNXモデルのファイルパスを取得する."""
+    suffix = ".int8.onnx" if quantized else ".onnx"
+    return model_dir / f"{name}{suffix}"
+
+
+class _EmbeddingResNet(torch.nn.Module):
+    """fbank特徴量から埋め込みベクトルを算出する部分のみを切り出したモデル."""
+
+    def __init__(self: "_EmbeddingResNet", resnet: torch.nn.Module) -> None:
+        super().__init__()
+        self.resnet = resnet
+
+    def forward(
+        self: "_EmbeddingResNet", fbank: torch.Tensor, weights: torch.Tensor
+    ) -> torch.Tensor:
+        return self.resnet(fbank, weights=weights)[1]
+
+
+class OnnxModelExporter:
+    """話者分離パイプラインのsegmentationモデルとembeddingモデルをONNXに変換する.
+
+    Notes
+    -----
+    embeddingモデルのfbank特徴量の算出はPyTorchのまま利用し、
+    ResNet部分のみをONNXに変換する。
+
+    """
+
+    def __init__(
+        self: "OnnxModelExporter", output_dir: Path, opset_version: int = 17
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        output_dir : Path
+            変換したモデルの保存先ディレクトリ
+
+        opset_version : int, optional
+            ONNXのopsetバージョン, by default 17
+
+        """
+        self._output_dir = output_dir
+        self._opset_version = opset_version
+
+    def export(
+        self: "OnnxModelExporter", pipeline: Pipeline, *, quantize: bool = False
+    ) -> list[Path]:
+        """パイプラインのモデルをONNXに変換して保存する.
+
+        Parameters
+        ----------
+        pipeline : Pipeline
+            インスタンス化済みの話者分離パイプライン
+
+        quantize : bool, optional
+            int8に量子化したモデルも保存するかどうか, by default False
+
+        Returns
+        -------
+        list[Path]
+            保存したファイルパス
+
+        """
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        pipeline.to(torch.device("cpu"))
+
+        segmentation_model = pipeline._segmentation.model  # noqa: SLF001
+        segmentation_model.eval()
+        num_samples = int(
+            segmentation_model.specifications.duration
+            * segmentation_model.hparams.sample_rate
+        )
+        waveforms = torch.zeros(2, 1, num_samples)
+        with torch.inference_mode():
+            num_frames = segmentation_model(waveforms).shape[1]
+
+        saved: list[Path] = []
+        segmentation_filepath = onnx_model_filepath(
+            self._output_dir, SEGMENTATION_MODEL_NAME, quantized=False
+        )
+        torch.onnx.export(
+            segmentation_model,
+            (waveforms,),
+            str(segmentation_filepath),
+            input_names=["waveforms"],
+            output_names=["scores"],
+            dynamic_axes={"waveforms": {0: "batch"}, "scores": {0: "batch"}},
+            opset_version=self._opset_version,
+        )
+        saved.append(segmentation_filepath)
+        _logger.info("export segmentation model: %s", segmentation_filepath)
+
+        embedding_model = pipeline._embedding.model_  # noqa: SLF001
+        embedding_model.eval()
+        with torch.inference_mode():
+            fbank = embedding_model.compute_fbank(waveforms)
+        embedding_filepath = onnx_model_filepath(
+            self._output_dir, EMBEDDING_MODEL_NAME, quantized=False
+        )
+        torch.onnx.export(
+            _EmbeddingResNet(embedding_model.resnet),
+            (fbank, torch.ones(2, num_frames)),
+            str(embedding_filepath),
+            input_names=["fbank", "weights"],
+            output_names=["embeddings"],
+            dynamic_axes={
+                "fbank": {0: "batch", 1: "num_fbank_frames"},
+                "weights": {0: "batch", 1: "num_frames"},
+                "embeddings": {0: "batch"},
+            },
+            opset_version=self._opset_version,
+        )
+        saved.append(embedding_filepath)
+        _logger.info("export embedding model: %s", embedding_filepath)
+
+        if quantize:
+            for name in [SEGMENTATION_MODEL_NAME, EMBEDDING_MODEL_NAME]:
+                quantized_filepath = onnx_model_filepath(
+                    self._output_dir, name, quantized=True
+                )
+                quantize_dynamic(
+                    onnx_model_filepath(self._output_dir, name, quantized=False),
+                    quantized_filepath,
+                    weight_type=QuantType.QInt8,
+                )
+                saved.append(quantized_filepath)
+                _logger.info("quantize %s model: %s", name, quantized_filepath)
+
+        return saved
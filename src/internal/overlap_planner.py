@@ -0,0 +1,181 @@
+"""重なりのある話者区間から、同じ音声を二度文字起こししない区間を作るモジュール."""
+
+from collections.abc import Generator
+from dataclasses import dataclass, field
+
+from internal.speaker_segment import SpeakerSegment
+
+JOINT_SPEAKER_SEPARATOR = " & "  # 同時に発話している話者名の区切り
+
+# 時間軸を分割した区間. 開始時刻、終了時刻、発話している話者名
+_Piece = tuple[float, float, list[str]]
+
+
+def join_speaker_names(names: list[str]) -> str:
+    """複数の話者名を一つの話者名にまとめる."""
+    return JOINT_SPEAKER_SEPARATOR.join(names)
+
+
+def split_speaker_names(speaker_name: str) -> list[str]:
+    """まとめた話者名を個々の話者名に分ける."""
+    return speaker_name.split(JOINT_SPEAKER_SEPARATOR)
+
+
+@dataclass
+class _Span:
+    """文字起こしを行う区間と、区間内の話者ごとの発話時間."""
+
+    start_time: float
+    end_time: float
+    durations: dict[str, float] = field(default_factory=dict)
+
+    def add(self: "_Span", speaker_name: str, duration: float) -> None:
+        """話者の発話時間を加算する."""
+        self.durations[speaker_name] = self.durations.get(speaker_name, 0.0) + duration
+
+    def to_segment(self: "_Span") -> SpeakerSegment:
+        """話者区間に変換する. 話者名は発話時間の長い順に並べる."""
+        names = sorted(self.durations, key=lambda v: (-self.durations[v], v))
+        return SpeakerSegment(
+            start_time=self.start_time,
+            end_time=self.end_time,
+            speaker_name=join_speaker_names(names),
+        )
+
+
+class OverlapPlanner:
+    """重なりのある話者区間を、同じ音声を二度文字起こししない区間に分割する.
+
+    Notes
+    -----
+    pyannoteは複数話者が同時に発話している場合に重なった区間を出力するため、
+    そのまま文字起こしすると同じ音声を複数回whisper.cppに渡すことになる。
+    話者区間の境界で時間軸を分割し、複数話者が重なった部分のみを一つの区間として、
+    話者名は重なった話者を発話時間の長い順に連結する。重なっていない部分は
+    それぞれの話者の区間として残す。
+    `min_overlap_duration`より短い重なりは話者の切り替わりの誤差とみなして
+    まとめず、元の話者区間のまま文字起こしする。
+    同じ話者の連続した区間は`max_segment_duration`を超えない範囲で結合する。
+
+    """
+
+    def __init__(
+        self: "OverlapPlanner",
+        max_segment_duration: float = 120.0,
+        min_overlap_duration: float = 1.0,
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        max_segment_duration : float, optional
+            同じ話者の連続した区間を結合する最大時間(秒), by default 120.0
+
+        min_overlap_duration : float, optional
+            一つの区間にまとめる重なりの最小時間(秒), by default 1.0
+
+        """
+        self._max_segment_duration = max_segment_duration
+        self._min_overlap_duration = min_overlap_duration
+        self._saved_duration = 0.0
+
+    @property
+    def saved_duration(self: "OverlapPlanner") -> float:
+        """直前の`plan`で重複を除いたことで文字起こし不要になった時間(秒)."""
+        return self._saved_duration
+
+    def plan(
+        self: "OverlapPlanner", segments: list[SpeakerSegment]
+    ) -> list[SpeakerSegment]:
+        """同じ音声を二度文字起こししない区間を作成する."""
+        valid_segments = [v for v in segments if v.end_time > v.start_time]
+
+        spans: list[_Span] = []
+        open_spans: dict[str, _Span] = {}  # 話者ごとの結合中の区間
+        for group in _group_overlaps(_split_timeline(valid_segments)):
+            start_time, end_time = group[0][0], group[-1][1]
+            if len(group[0][2]) > 1 and (
+                end_time - start_time >= self._min_overlap_duration
+            ):
+                # 重なった部分のみを一つの区間にまとめる
+                span = _Span(start_time=start_time, end_time=end_time)
+                for piece_start, piece_end, names in group:
+                    for name in names:
+                        span.add(name, piece_end - piece_start)
+                spans.append(span)
+                open_spans = {}
+                continue
+            # 短い重なりはまとめず、各話者の区間に含める
+            for piece in group:
+                open_spans = self._extend(spans, open_spans, piece)
+
+        new_segments = [
+            span.to_segment()
+            for span in sorted(spans, key=lambda v: (v.start_time, v.end_time))
+        ]
+        total_duration = sum(v.end_time - v.start_time for v in valid_segments)
+        planned_duration = sum(v.end_time - v.start_time for v in new_segments)
+        self._saved_duration = max(0.0, total_duration - planned_duration)
+
+        return new_segments
+
+    def _extend(
+        self: "OverlapPlanner",
+        spans: list[_Span],
+        open_spans: dict[str, _Span],
+        piece: _Piece,
+    ) -> dict[str, _Span]:
+        """話者ごとの区間を延長する. 連続しない、最大時間を超える場合は新しく作る."""
+        start_time, end_time, names = piece
+        next_spans: dict[str, _Span] = {}
+        for name in names:
+            span = open_spans.get(name)
+            if (
+                span is None
+                or span.end_time != start_time
+                or end_time - span.start_time > self._max_segment_duration
+            ):
+                span = _Span(start_time=start_time, end_time=start_time)
+                spans.append(span)
+            span.end_time = end_time
+            span.add(name, end_time - start_time)
+            next_spans[name] = span
+
+        return next_spans
+
+
+def _split_timeline(segments: list[SpeakerSegment]) -> list[_Piece]:
+    """話者区間の境界で時間軸を分割し、分割した区間ごとに発話している話者を求める."""
+    events = sorted(
+        [
+            *[(v.start_time, 1, v.speaker_name) for v in segments],
+            *[(v.end_time, -1, v.speaker_name) for v in segments],
+        ],
+        key=lambda v: v[0],
+    )
+    active: dict[str, int] = {}
+    pieces: list[_Piece] = []
+    for index, (time, delta, speaker_name) in enumerate(events):
+        active[speaker_name] = active.get(speaker_name, 0) + delta
+        if index + 1 < len(events) and events[index + 1][0] > time:
+            names = sorted(name for name, count in active.items() if count > 0)
+            if len(names) > 0:
+                pieces.append((time, events[index + 1][0], names))
+
+    return pieces
+
+
+def _group_overlaps(pieces: list[_Piece]) -> Generator[list[_Piece], None, None]:
+    """連続した複数話者の区間をまとめる. 1話者の区間はそれぞれ単独で返す."""
+    group: list[_Piece] = []
+    for piece in pieces:
+        if len(group) > 0 and (
+            len(piece[2]) < 2  # noqa: PLR2004
+            or len(group[-1][2]) < 2  # noqa: PLR2004
+            or piece[0] != group[-1][1]
+        ):
+            yield group
+            group = []
+        group.append(piece)
+    if len(group) > 0:
+        yield group
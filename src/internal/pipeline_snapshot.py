@@ -0,0 +1,124 @@
+"""初期化済みの話者分離パイプラインを高速に読み込める形式で保存するモジュール."""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+import pyannote.audio
+import torch
+from pyannote.audio import Pipeline
+
+_logger = logging.getLogger(__name__)
+
+
+class PipelineSnapshot:
+    """初期化済みの話者分離パイプラインを重みごと保存し、読み込む.
+
+    Notes
+    -----
+    `Pipeline.from_pretrained`で行うYAMLの解析、モデルのパス解決、モデルの構築と
+    重みの読み込みを省略するため、初期化済みのパイプラインをそのまま`torch.save`する。
+    読み込み時は重みをメモリマップするため、実際に参照されるまでファイルを読み込まない。
+    設定ファイルの内容、torchとpyannote.audioのバージョンをmanifest.jsonに記録し、
+    いずれかが一致しない場合は利用しない。
+
+    """
+
+    FORMAT_VERSION = 1  # スナップショットの保存形式のバージョン
+
+    def __init__(self: "PipelineSnapshot", dirpath: Path) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        dirpath : Path
+            スナップショットの保存先ディレクトリ
+
+        """
+        self._dirpath = dirpath
+        self._pipeline_filepath = dirpath / "pipeline.pt"
+        self._manifest_filepath = dirpath / "manifest.json"
+
+    def save(self: "PipelineSnapshot", config_path: Path) -> None:
+        """設定ファイルからパイプラインを初期化し、スナップショットを保存する.
+
+        Parameters
+        ----------
+        config_path : Path
+            pyannoteのモデル設定ファイルのパス
+
+        """
+        pipeline = Pipeline.from_pretrained(config_path)
+        pipeline.to(torch.device("cpu"))
+
+        self._dirpath.mkdir(parents=True, exist_ok=True)
+        self._manifest_filepath.unlink(missing_ok=True)
+        temp_filepath = self._pipeline_filepath.with_suffix(".tmp")
+        torch.save(pipeline, temp_filepath)
+        temp_filepath.replace(self._pipeline_filepath)
+
+        # manifestはパイプラインの保存が完了してから書き込む
+        manifest = self._manifest(config_path)
+        temp_filepath = self._manifest_filepath.with_suffix(".tmp")
+        temp_filepath.write_text(json.dumps(manifest, indent=2))
+        temp_filepath.replace(self._manifest_filepath)
+        _logger.info("save pipeline snapshot: %s", self._dirpath)
+
+    def load(self: "PipelineSnapshot", config_path: Path) -> Pipeline | None:
+        """スナップショットを読み込む.
+
+        Parameters
+        ----------
+        config_path : Path
+            スナップショットの作成に利用したpyannoteのモデル設定ファイルのパス
+
+        Returns
+        -------
+        Pipeline | None
+            スナップショットが存在しない、もしくは設定ファイルやバージョンが
+            一致しない場合はNone.
+
+        """
+        if not self.is_valid(config_path):
+            return None
+
+        try:
+            pipeline = torch.load(
+                self._pipeline_filepath,
+                map_location="cpu",
+                mmap=True,
+                weights_only=False,
+            )
+        except (OSError, RuntimeError, AttributeError, ModuleNotFoundError):
+            _logger.warning("failed to load pipeline snapshot: %s", self._dirpath)
+            return None
+        _logger.info("load pipeline snapshot: %s", self._dirpath)
+
+        return pipeline
+
+    def is_valid(self: "PipelineSnapshot", config_path: Path) -> bool:
+        """スナップショットが設定ファイルと実行環境に一致するかどうか."""
+        if not self._manifest_filepath.exists() or not self._pipeline_filepath.exists():
+            return False
+
+        manifest = json.loads(self._manifest_filepath.read_text())
+        if manifest != self._manifest(config_path):
+            _logger.warning("pipeline snapshot is outdated: %s", self._dirpath)
+            return False
+
+        return True
+
+    def clean(self: "PipelineSnapshot") -> None:
+        """保存されているスナップショットを削除する."""
+        self._manifest_filepath.unlink(missing_ok=True)
+        self._pipeline_filepath.unlink(missing_ok=True)
+
+    def _manifest(self: "PipelineSnapshot", config_path: Path) -> dict[str, str | int]:
+        """スナップショットの作成条件を表すmanifestを作成する."""
+        return {
+            "format_version": self.FORMAT_VERSION,
+            "config_sha256": hashlib.sha256(config_path.read_bytes()).hexdigest(),
+            "torch_version": str(torch.__version__),
+            "pyannote_audio_version": str(pyannote.audio.__version__),
+        }
@@ -0,0 +1,468 @@
+"""処理の進捗をイベントとして通知するモジュール."""
+
+import json
+import logging
+import socket
+import threading
+import time
+from collections.abc import Callable, Generator, Mapping, Sequence
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    """進捗のイベント.
+
+    Notes
+    -----
+    `kind`は以下のいずれか。
+
+    - stage_start: 処理の開始
+    - stage_end: 処理の終了
+    - progress: 処理の途中経過. 一定の間隔に間引いて通知する
+    - segment_done: 区間ごとの処理の完了
+
+    """
+
+    kind: str  # イベントの種類
+    stage: str  # 処理名
+    timestamp: float  # 発生時刻(UNIX時間)
+    elapsed: float  # 処理の開始からの経過時間(秒)
+    completed: float | None = None  # 完了した量
+    total: float | None = None  # 全体の量
+    audio_seconds: float | None = None  # 処理済みの音声の長さ(秒)
+    audio_total: float | None = None  # 処理対象の音声の長さ(秒)
+    rtf: float | None = None  # 実時間係数(経過時間 / 処理済みの音声の長さ)
+    eta: float | None = None  # 残り時間の推定値(秒)
+    extra: dict[str, Any] = field(default_factory=dict)  # 処理ごとの追加情報
+
+    def to_dict(self: "ProgressEvent") -> dict[str, Any]:
+        """値のある項目のみを辞書にする."""
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+
+ProgressSink = Callable[[ProgressEvent], None]
+
+
+class StageProgress:
+    """1つの処理の進捗を管理し、イベントを通知する.
+
+    Notes
+    -----
+    `stage_weights`を指定した場合は、処理全体の進捗として扱う。
+    同じ`ProgressReporter`で通知される各処理の進捗を重みで合算し、
+    処理全体の完了した割合と残り時間を通知する。
+    重みの順に処理を実行するものとし、後の処理が開始した時点で前の処理は完了したとみなす。
+    保存済みの結果を利用して処理を省略した場合も、全体の進捗が止まらないようにするため。
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: "StageProgress",
+        reporter: "ProgressReporter",
+        stage: str,
+        *,
+        total: float | None = None,
+        audio_total: float | None = None,
+        stage_weights: Mapping[str, float] | None = None,
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        reporter : ProgressReporter
+            イベントの通知先
+
+        stage : str
+            処理名
+
+        total : float | None, optional
+            全体の量(区間数など), by default None
+
+        audio_total : float | None, optional
+            処理対象の音声の長さ(秒), by default None
+
+        stage_weights : Mapping[str, float] | None, optional
+            処理全体に占める各処理の重み. 実行する順に指定する, by default None
+
+        """
+        self._reporter = reporter
+        self._stage = stage
+        self._stage_weights = dict(stage_weights or {})
+        self._stage_fractions = dict.fromkeys(self._stage_weights, 0.0)
+        self._total = total
+        if len(self._stage_weights) > 0:
+            self._total = sum(self._stage_weights.values())
+        self._audio_total = audio_total
+        self._completed = 0.0
+        self._audio_seconds = 0.0
+        self._started_at = time.monotonic()
+        self._next_emit = 0.0
+        self._lock = threading.Lock()
+
+    def update(
+        self: "StageProgress",
+        completed: float,
+        total: float | None = None,
+        *,
+        audio_seconds: float | None = None,
+        **extra: Any,  # noqa: ANN401
+    ) -> None:
+        """途中経過を更新する. 通知は`min_interval`ごとに間引く.
+
+        Parameters
+        ----------
+        completed : float
+            完了した量
+
+        total : float | None, optional
+            全体の量. Noneの場合は変更しない, by default None
+
+        audio_seconds : float | None, optional
+            処理済みの音声の長さ(秒). Noneの場合は完了した割合から推定する,
+            by default None
+
+        **extra : Any
+            イベントに含める追加情報
+
+        """
+        with self._lock:
+            self._completed = completed
+            if total is not None:
+                self._total = total
+            if audio_seconds is not None:
+                self._audio_seconds = audio_seconds
+            elif self._audio_total is not None and self._total:
+                self._audio_seconds = self._audio_total * completed / self._total
+            now = time.monotonic()
+            if now < self._next_emit:
+                return
+            self._next_emit = now + self._reporter.min_interval
+            event = self._event("progress", extra)
+        self._reporter.emit(event)
+
+    def segment_done(
+        self: "StageProgress",
+        audio_seconds: float = 0.0,
+        **extra: Any,  # noqa: ANN401
+    ) -> None:
+        """区間の処理の完了を通知する.
+
+        Parameters
+        ----------
+        audio_seconds : float, optional
+            完了した区間の音声の長さ(秒), by default 0.0
+
+        **extra : Any
+            イベントに含める追加情報
+
+        """
+        with self._lock:
+            self._completed += 1
+            self._audio_seconds += audio_seconds
+            event = self._event("segment_done", extra)
+        self._reporter.emit(event)
+
+    def observe(self: "StageProgress", event: ProgressEvent) -> None:
+        """他の処理のイベントから処理全体の途中経過を更新する.
+
+        Parameters
+        ----------
+        event : ProgressEvent
+            `stage_weights`に含まれる処理のイベント
+
+        """
+        if event.stage not in self._stage_weights:
+            return
+        with self._lock:
+            for stage in self._stage_weights:
+                if stage == event.stage:
+                    break
+                # 後の処理が開始していれば、前の処理は完了している
+                self._stage_fractions[stage] = 1.0
+            self._stage_fractions[event.stage] = _event_fraction(event)
+            self._completed = sum(
+                weight * self._stage_fractions[stage]
+                for stage, weight in self._stage_weights.items()
+            )
+            if self._audio_total is not None and self._total:
+                self._audio_seconds = self._audio_total * self._completed / self._total
+            now = time.monotonic()
+            if event.kind not in ("stage_start", "stage_end") and now < self._next_emit:
+                return
+            self._next_emit = now + self._reporter.min_interval
+            event = self._event("progress", {"current_stage": event.stage})
+        self._reporter.emit(event)
+
+    def start(self: "StageProgress") -> None:
+        """処理の開始を通知する."""
+        with self._lock:
+            event = self._event("stage_start", {})
+        self._reporter.emit(event)
+
+    def end(self: "StageProgress", **extra: Any) -> None:  # noqa: ANN401
+        """処理の終了を通知する."""
+        with self._lock:
+            if len(self._stage_weights) > 0 and extra.get("status") == "completed":
+                self._completed = self._total or 0.0
+                if self._audio_total is not None:
+                    self._audio_seconds = self._audio_total
+            event = self._event("stage_end", extra)
+        self._reporter.emit(event)
+
+    def _event(
+        self: "StageProgress", kind: str, extra: dict[str, Any]
+    ) -> ProgressEvent:
+        """現在の状態からイベントを作成する."""
+        elapsed = time.monotonic() - self._started_at
+        fraction = None
+        if self._total:
+            fraction = self._completed / self._total
+        elif self._audio_total:
+            fraction = self._audio_seconds / self._audio_total
+        eta = None
+        if fraction is not None and fraction > 0:
+            eta = max(0.0, elapsed / fraction - elapsed)
+
+        return ProgressEvent(
+            kind=kind,
+            stage=self._stage,
+            timestamp=time.time(),
+            elapsed=elapsed,
+            completed=self._completed,
+            total=self._total,
+            audio_seconds=self._audio_seconds,
+            audio_total=self._audio_total,
+            rtf=elapsed / self._audio_seconds if self._audio_seconds > 0 else None,
+            eta=eta,
+            extra=extra,
+        )
+
+
+class ProgressReporter:
+    """進捗のイベントを登録した通知先に送る.
+
+    Notes
+    -----
+    通知先は`ProgressEvent`を受け取る関数で、`JsonLinesSink`、`SocketSink`も利用できる。
+    通知先がない場合はイベントを作成しないため、処理への影響はほとんどない。
+    通知先で発生した例外はログに出力し、処理は継続する。
+    `close`もしくは`with`文の終了時に、`close`を持つ通知先を閉じる。
+
+    """
+
+    def __init__(
+        self: "ProgressReporter",
+        sinks: Sequence[ProgressSink] = (),
+        *,
+        min_interval: float = 1.0,
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        sinks : Sequence[ProgressSink], optional
+            通知先, by default ()
+
+        min_interval : float, optional
+            途中経過のイベントを通知する最小の間隔(秒), by default 1.0
+
+        """
+        self._sinks = list(sinks)
+        self.min_interval = min_interval
+        self._jobs: list[StageProgress] = []
+
+    def __enter__(self: "ProgressReporter") -> "ProgressReporter":
+        """`with`文の開始時に自身を返す."""
+        return self
+
+    def __exit__(
+        self: "ProgressReporter",
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """`with`文の終了時に通知先を閉じる."""
+        self.close()
+
+    def close(self: "ProgressReporter") -> None:
+        """`close`を持つ通知先を閉じる. 閉じた通知先には以降通知しない."""
+        sinks, self._sinks = self._sinks, []
+        for sink in sinks:
+            close = getattr(sink, "close", None)
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception:
+                _logger.exception("progress sink close failed")
+
+    def add_sink(self: "ProgressReporter", sink: ProgressSink) -> None:
+        """通知先を追加する."""
+        self._sinks.append(sink)
+
+    def emit(self: "ProgressReporter", event: ProgressEvent) -> None:
+        """イベントを通知する. 処理全体の進捗にも反映する."""
+        for sink in self._sinks:
+            _send(sink, event)
+        for job in tuple(self._jobs):
+            job.observe(event)
+
+    @contextmanager
+    def stage(
+        self: "ProgressReporter",
+        stage: str,
+        *,
+        total: float | None = None,
+        audio_total: float | None = None,
+        stage_weights: Mapping[str, float] | None = None,
+    ) -> Generator[StageProgress, None, None]:
+        """処理の開始と終了を通知し、途中経過を通知するための`StageProgress`を返す.
+
+        `stage_weights`を指定した場合は、処理全体の進捗として他の処理の進捗を合算する.
+        """
+        if len(self._sinks) < 1:
+            progress: StageProgress = _NullStageProgress(self, stage)
+        else:
+            progress = StageProgress(
+                self,
+                stage,
+                total=total,
+                audio_total=audio_total,
+                stage_weights=stage_weights,
+            )
+        is_job = stage_weights is not None and len(self._sinks) > 0
+        progress.start()
+        if is_job:
+            self._jobs.append(progress)
+        try:
+            yield progress
+        except BaseException:
+            progress.end(status="failed")
+            raise
+        finally:
+            if is_job:
+                self._jobs.remove(progress)
+        progress.end(status="completed")
+
+
+class _NullStageProgress(StageProgress):
+    """通知先がない場合の`StageProgress`. 何もしない."""
+
+    def update(
+        self: "_NullStageProgress",
+        completed: float,
+        total: float | None = None,
+        *,
+        audio_seconds: float | None = None,
+        **extra: Any,  # noqa: ANN401
+    ) -> None:
+        """何もしない."""
+
+    def segment_done(
+        self: "_NullStageProgress",
+        audio_seconds: float = 0.0,
+        **extra: Any,  # noqa: ANN401
+    ) -> None:
+        """何もしない."""
+
+    def start(self: "_NullStageProgress") -> None:
+        """何もしない."""
+
+    def end(self: "_NullStageProgress", **extra: Any) -> None:  # noqa: ANN401
+        """何もしない."""
+
+
+class JsonLinesSink:
+    """進捗のイベントをJSON Lines形式でファイルに追記する."""
+
+    def __init__(self: "JsonLinesSink", filepath: Path) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        filepath : Path
+            出力先のファイルパス
+
+        """
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        self._file = filepath.open("a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def __call__(self: "JsonLinesSink", event: ProgressEvent) -> None:
+        """イベントを1行のjsonとして書き込む."""
+        line = json.dumps(event.to_dict(), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self: "JsonLinesSink") -> None:
+        """ファイルを閉じる."""
+        self._file.close()
+
+
+class SocketSink:
+    """進捗のイベントをローカルのソケットにデータグラムとして送る.
+
+    Notes
+    -----
+    "host:port"形式のアドレスはUDP、それ以外はUNIXドメインソケットのパスとして扱う。
+    受信側がいない場合や送信できない場合はイベントを破棄し、処理を待たせない。
+
+    """
+
+    def __init__(self: "SocketSink", address: str) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        address : str
+            送信先. "127.0.0.1:9999"もしくはUNIXドメインソケットのパス
+
+        """
+        host, _, port = address.rpartition(":")
+        if host != "" and port.isdigit():
+            self._address: str | tuple[str, int] = (host, int(port))
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            self._address = address
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)  # noqa: FBT003
+
+    def __call__(self: "SocketSink", event: ProgressEvent) -> None:
+        """イベントをjsonで送る."""
+        data = json.dumps(event.to_dict(), ensure_ascii=False).encode("utf-8")
+        try:
+            self._socket.sendto(data, self._address)
+        except OSError:
+            # 受信側がいない、もしくは受信が追いつかない場合は破棄する
+            return
+
+    def close(self: "SocketSink") -> None:
+        """ソケットを閉じる."""
+        self._socket.close()
+
+
+def _event_fraction(event: ProgressEvent) -> float:
+    """イベントから処理の完了した割合を求める."""
+    if event.kind == "stage_end":
+        return 1.0
+    if event.total and event.completed is not None:
+        return min(1.0, event.completed / event.total)
+    if event.audio_total and event.audio_seconds is not None:
+        return min(1.0, event.audio_seconds / event.audio_total)
+    return 0.0
+
+
+def _send(sink: ProgressSink, event: ProgressEvent) -> None:
+    """イベントを通知先に送る. 通知先の例外で処理を止めない."""
+    try:
+        sink(event)
+    except Exception:
+        _logger.exception("progress sink failed")
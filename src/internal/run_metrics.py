@@ -0,0 +1,65 @@
+"""処理中に発生した事象を集計し、ファイルに保存するモジュール."""
+
+import json
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from internal.interim_cache import atomic_write
+
+
+@dataclass(frozen=True)
+class DecodeIncident:
+    """whisper.cppの実行を中断した事象."""
+
+    key: int  # タスクの識別子
+    model_name: str  # 実行したモデル名
+    kind: str  # 中断の種類(abort: 暴走の検出, timeout: タイムアウト)
+    reason: str  # 中断理由
+    duration: float  # 音声の長さ(秒)
+    elapsed: float  # 中断までの時間(秒)
+    fallback_level: int  # 実行時のフォールバック設定の段階
+
+
+class RunMetrics:
+    """処理中に発生した事象を集計する. 複数のスレッドから記録できる."""
+
+    def __init__(self: "RunMetrics") -> None:
+        """初期化処理."""
+        self._counters: dict[str, int] = {}
+        self._incidents: list[DecodeIncident] = []
+        self._lock = threading.Lock()
+
+    @property
+    def incidents(self: "RunMetrics") -> list[DecodeIncident]:
+        """記録したwhisper.cppの中断."""
+        with self._lock:
+            return list(self._incidents)
+
+    def count(self: "RunMetrics", name: str, value: int = 1) -> None:
+        """カウンタを加算する."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def record_incident(self: "RunMetrics", incident: DecodeIncident) -> None:
+        """whisper.cppの中断を記録する."""
+        with self._lock:
+            self._incidents.append(incident)
+            name = f"whisper_{incident.kind}"
+            self._counters[name] = self._counters.get(name, 0) + 1
+
+    def to_dict(self: "RunMetrics") -> dict[str, Any]:
+        """集計結果を辞書にする."""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "incidents": [asdict(v) for v in self._incidents],
+            }
+
+    def save(self: "RunMetrics", filepath: Path) -> None:
+        """集計結果をjsonで保存する."""
+        with atomic_write(filepath) as temp_filepath:
+            temp_filepath.write_text(
+                json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+            )
@@ -0,0 +1,95 @@
+"""音声ファイルから必要な区間のみを読み込む音声データを表すモジュール."""
+
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+import torch
+from internal.audio_source import SAMPLE_RATE, AudioSource
+
+
+class SeekableAudioSource(AudioSource):
+    """音声ファイルをシークして、必要な区間のみを読み込む音声データ.
+
+    Notes
+    -----
+    wavに加えて、シーク情報(SEEKTABLE)を持つflacにも対応する。
+    flacの場合は指定した区間を含むブロックのみをデコードする。
+    区間の読み込みごとにファイルを開くため、複数スレッドから同時に読み込める。
+
+    """
+
+    def __init__(self: "SeekableAudioSource", filepath: Path) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        filepath : Path
+            16 kHzの音声ファイルのパス
+
+        """
+        info = sf.info(str(filepath))
+        if info.samplerate != SAMPLE_RATE:
+            message = f"sample rate must be {SAMPLE_RATE}: {info.samplerate}"
+            raise ValueError(message)
+        self._filepath = filepath
+        self._num_frames = info.frames
+
+    @classmethod
+    def open(cls: type["SeekableAudioSource"], filepath: Path) -> AudioSource:
+        """音声ファイルを開く.
+
+        Notes
+        -----
+        16 kHzでない場合などシークして読み込めない形式は、全体をメモリに読み込む。
+
+        """
+        try:
+            return cls(filepath)
+        except (ValueError, RuntimeError, sf.LibsndfileError):
+            return AudioSource.from_file(filepath)
+
+    @property
+    def filepath(self: "SeekableAudioSource") -> Path:
+        """音声ファイルのパス."""
+        return self._filepath
+
+    @property
+    def duration(self: "SeekableAudioSource") -> float:
+        """音声の長さ(秒)."""
+        return self._num_frames / SAMPLE_RATE
+
+    @property
+    def samples(self: "SeekableAudioSource") -> np.ndarray:
+        """int16の音声データ. ファイル全体を読み込む."""
+        return self._read(0, self._num_frames)
+
+    def slice(
+        self: "SeekableAudioSource", start_time: float, end_time: float
+    ) -> np.ndarray:
+        """指定した区間の音声データを取得する."""
+        start = max(0, int(start_time * SAMPLE_RATE))
+        end = min(self._num_frames, int(end_time * SAMPLE_RATE))
+        if end <= start:
+            st = start_time
+            et = end_time
+            message = f"empty audio segment. [{st:03.1f}s - {et:03.1f}s]"
+            raise ValueError(message)
+
+        return self._read(start, end)
+
+    def to_pyannote(
+        self: "SeekableAudioSource",
+    ) -> dict[str, torch.Tensor | int | Path]:
+        """pyannoteのパイプラインに渡せる形式に変換する."""
+        return {"audio": self._filepath}
+
+    def _read(self: "SeekableAudioSource", start: int, end: int) -> np.ndarray:
+        """指定したフレーム範囲を読み込む."""
+        with sf.SoundFile(str(self._filepath)) as f:
+            f.seek(start)
+            frames = f.read(end - start, dtype="int16", always_2d=True)
+        if frames.shape[1] == 1:
+            return frames[:, 0]
+
+        return frames.mean(axis=1).astype(np.int16)
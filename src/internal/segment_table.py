@@ -0,0 +1,249 @@
+"""話者区間と文字起こし結果を列ごとのNumPy配列で保持するモジュール."""
+
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+from internal.interim_cache import atomic_write
+from internal.speaker_segment import SpeakerSegment
+from internal.speaker_text import SpeakerText
+
+
+class SegmentTable:
+    """話者区間と文字起こし結果を列ごとのNumPy配列で保持する.
+
+    Notes
+    -----
+    区間ごとにpydanticのモデルを作らず、開始・終了時刻、話者ID、テキストを
+    それぞれ一つの配列にまとめる。
+    話者名は`speakers`に一度だけ保持し、各区間は`speakers`の添字を持つ。
+    テキストはUTF-8のバイト列を連結した`text_buffer`と、区間ごとの開始位置を表す
+    `text_offsets`(区間数+1の長さ)で保持する。テキストを持たない場合は全て空文字とする。
+    `SpeakerSegment`と`SpeakerText`のリストとは`from_segments`、`from_texts`、
+    `to_segments`、`to_texts`で相互に変換する。
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: "SegmentTable",
+        start_times: np.ndarray,
+        end_times: np.ndarray,
+        speaker_ids: np.ndarray,
+        speakers: Sequence[str],
+        text_offsets: np.ndarray | None = None,
+        text_buffer: np.ndarray | None = None,
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        start_times : np.ndarray
+            区間ごとの開始時刻(秒)
+
+        end_times : np.ndarray
+            区間ごとの終了時刻(秒)
+
+        speaker_ids : np.ndarray
+            区間ごとの話者ID. `speakers`の添字
+
+        speakers : Sequence[str]
+            話者名
+
+        text_offsets : np.ndarray | None, optional
+            区間ごとのテキストの`text_buffer`内の開始位置. 長さは区間数+1,
+            by default None
+
+        text_buffer : np.ndarray | None, optional
+            全区間のテキストをUTF-8で連結したuint8の配列, by default None
+
+        """
+        num_segments = len(start_times)
+        if len(end_times) != num_segments or len(speaker_ids) != num_segments:
+            message = "start_times, end_times and speaker_ids must have same length."
+            raise ValueError(message)
+        if text_offsets is None or text_buffer is None:
+            text_offsets = np.zeros(num_segments + 1, dtype=np.int64)
+            text_buffer = np.zeros(0, dtype=np.uint8)
+        if len(text_offsets) != num_segments + 1:
+            message = f"text_offsets must have {num_segments + 1} elements."
+            raise ValueError(message)
+
+        self.start_times = np.asarray(start_times, dtype=np.float64)
+        self.end_times = np.asarray(end_times, dtype=np.float64)
+        self.speaker_ids = np.asarray(speaker_ids, dtype=np.int32)
+        self.speakers = list(speakers)
+        self.text_offsets = np.asarray(text_offsets, dtype=np.int64)
+        self.text_buffer = np.asarray(text_buffer, dtype=np.uint8)
+
+    @classmethod
+    def empty(cls: type["SegmentTable"]) -> "SegmentTable":
+        """区間を持たないテーブルを作成する."""
+        return cls(np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int32), [])
+
+    @classmethod
+    def from_segments(
+        cls: type["SegmentTable"], segments: Sequence[SpeakerSegment]
+    ) -> "SegmentTable":
+        """話者区間のリストから作成する."""
+        speakers, speaker_ids = cls._intern([v.speaker_name for v in segments])
+
+        return cls(
+            start_times=np.fromiter((v.start_time for v in segments), np.float64),
+            end_times=np.fromiter((v.end_time for v in segments), np.float64),
+            speaker_ids=speaker_ids,
+            speakers=speakers,
+        )
+
+    @classmethod
+    def from_texts(
+        cls: type["SegmentTable"], texts: Sequence[SpeakerText]
+    ) -> "SegmentTable":
+        """話者ごとのテキストのリストから作成する."""
+        speakers, speaker_ids = cls._intern([v.speaker_name for v in texts])
+        encoded = [v.text.encode("utf-8") for v in texts]
+        text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(v) for v in encoded], out=text_offsets[1:])
+
+        return cls(
+            start_times=np.fromiter((v.start_time for v in texts), np.float64),
+            end_times=np.fromiter((v.end_time for v in texts), np.float64),
+            speaker_ids=speaker_ids,
+            speakers=speakers,
+            text_offsets=text_offsets,
+            text_buffer=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        )
+
+    @classmethod
+    def load(cls: type["SegmentTable"], filepath: Path) -> "SegmentTable":
+        """`save`で保存したファイルから読み込む."""
+        with np.load(filepath) as data:
+            return cls(
+                start_times=data["start_times"],
+                end_times=data["end_times"],
+                speaker_ids=data["speaker_ids"],
+                speakers=data["speakers"].tolist(),
+                text_offsets=data["text_offsets"],
+                text_buffer=data["text_buffer"],
+            )
+
+    def save(self: "SegmentTable", filepath: Path) -> None:
+        """列ごとの配列をnpz形式で保存する."""
+        with atomic_write(filepath) as temp_filepath, temp_filepath.open("wb") as f:
+            np.savez(
+                f,
+                start_times=self.start_times,
+                end_times=self.end_times,
+                speaker_ids=self.speaker_ids,
+                speakers=np.array(self.speakers, dtype=np.str_),
+                text_offsets=self.text_offsets,
+                text_buffer=self.text_buffer,
+            )
+
+    def __len__(self: "SegmentTable") -> int:
+        """区間数."""
+        return len(self.start_times)
+
+    @property
+    def durations(self: "SegmentTable") -> np.ndarray:
+        """区間ごとの長さ(秒)."""
+        return self.end_times - self.start_times
+
+    @property
+    def text_lengths(self: "SegmentTable") -> np.ndarray:
+        """区間ごとのテキストのバイト数."""
+        return np.diff(self.text_offsets)
+
+    def speaker_name(self: "SegmentTable", index: int) -> str:
+        """指定した区間の話者名."""
+        return self.speakers[self.speaker_ids[index]]
+
+    def text(self: "SegmentTable", index: int) -> str:
+        """指定した区間のテキスト."""
+        start, end = self.text_offsets[index], self.text_offsets[index + 1]
+        return self.text_buffer[start:end].tobytes().decode("utf-8")
+
+    def take(self: "SegmentTable", indices: np.ndarray) -> "SegmentTable":
+        """指定した添字の区間を取り出す. 添字はbool配列でもよい."""
+        indices = np.arange(len(self))[indices]
+        starts = self.text_offsets[indices]
+        lengths = self.text_offsets[indices + 1] - starts
+        text_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=text_offsets[1:])
+
+        return SegmentTable(
+            start_times=self.start_times[indices],
+            end_times=self.end_times[indices],
+            speaker_ids=self.speaker_ids[indices],
+            speakers=self.speakers,
+            text_offsets=text_offsets,
+            text_buffer=self.text_buffer[gather_ranges(starts, lengths)],
+        )
+
+    def to_segments(self: "SegmentTable") -> list[SpeakerSegment]:
+        """話者区間のリストに変換する."""
+        return [
+            SpeakerSegment(
+                start_time=start_time,
+                end_time=end_time,
+                speaker_name=self.speakers[speaker_id],
+            )
+            for start_time, end_time, speaker_id in zip(
+                self.start_times.tolist(),
+                self.end_times.tolist(),
+                self.speaker_ids.tolist(),
+                strict=True,
+            )
+        ]
+
+    def to_texts(self: "SegmentTable") -> list[SpeakerText]:
+        """話者ごとのテキストのリストに変換する."""
+        buffer = self.text_buffer.tobytes()
+        offsets = self.text_offsets.tolist()
+        return [
+            SpeakerText(
+                start_time=start_time,
+                end_time=end_time,
+                speaker_name=self.speakers[speaker_id],
+                text=buffer[offsets[index] : offsets[index + 1]].decode("utf-8"),
+            )
+            for index, (start_time, end_time, speaker_id) in enumerate(
+                zip(
+                    self.start_times.tolist(),
+                    self.end_times.tolist(),
+                    self.speaker_ids.tolist(),
+                    strict=True,
+                )
+            )
+        ]
+
+    @staticmethod
+    def _intern(names: list[str]) -> tuple[list[str], np.ndarray]:
+        """話者名を出現順に番号付けする."""
+        speakers: dict[str, int] = {}
+        speaker_ids = np.fromiter(
+            (speakers.setdefault(name, len(speakers)) for name in names),
+            dtype=np.int32,
+            count=len(names),
+        )
+
+        return list(speakers), speaker_ids
+
+
+def gather_ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """複数の範囲[start, start + length)の添字を連結した配列を作成する."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    total = int(lengths.sum())
+    if total < 1:
+        return np.zeros(0, dtype=np.int64)
+
+    # 各範囲の先頭位置で、前の範囲の末尾からの差分を加算して連番を作る
+    nonempty = lengths > 0
+    starts = np.asarray(starts, dtype=np.int64)[nonempty]
+    lengths = lengths[nonempty]
+    steps = np.ones(total, dtype=np.int64)
+    heads = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=heads[1:])
+    steps[0] = starts[0]
+    steps[heads[1:]] = starts[1:] - (starts[:-1] + lengths[:-1] - 1)
+
+    return np.cumsum(steps)
@@ -0,0 +1,50 @@
+"""話者ごとの埋め込みベクトルをファイルに保存するモジュール."""
+
+from pathlib import Path
+
+import numpy as np
+from internal.interim_cache import atomic_write
+
+
+class SpeakerEmbeddingFile:
+    """話者ごとの埋め込みベクトルをファイルに保存する."""
+
+    def __init__(self: "SpeakerEmbeddingFile", filepath: Path) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        filepath : Path
+            保存先のファイルパス
+
+        """
+        self._filepath = filepath
+
+    def save(self: "SpeakerEmbeddingFile", embeddings: dict[str, np.ndarray]) -> None:
+        """話者ごとの埋め込みベクトルを保存する."""
+        names = list(embeddings.keys())
+        matrix = (
+            np.stack([embeddings[name] for name in names]).astype(np.float32)
+            if len(names) > 0
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+        with (
+            atomic_write(self._filepath) as temp_filepath,
+            temp_filepath.open("wb") as f,
+        ):
+            np.savez(f, names=np.array(names, dtype=str), embeddings=matrix)
+
+    def get_embeddings(self: "SpeakerEmbeddingFile") -> dict[str, np.ndarray]:
+        """話者ごとの埋め込みベクトルを取得する."""
+        if not self._filepath.exists():
+            return {}
+
+        with np.load(self._filepath) as data:
+            return dict(zip(data["names"].tolist(), data["embeddings"], strict=True))
+
+    def clean(self: "SpeakerEmbeddingFile") -> None:
+        """保存されている埋め込みベクトルを削除する."""
+        if not self._filepath.exists():
+            return
+
+        self._filepath.unlink()
@@ -1,5 +1,7 @@
 """話者分離情報をテキスト化しやすいように統合するモジュール."""
 
+import numpy as np
+from internal.segment_table import SegmentTable
 from internal.speaker_segment import SpeakerSegment
 
 
@@ -34,48 +36,91 @@ class SpeakerIntegrator:
         self: "SpeakerIntegrator", segments: list[SpeakerSegment]
     ) -> list[SpeakerSegment]:
         """連続する話者区間を統合する."""
-        if len(segments) < 1:
-            return []
-
-        new_segments: list[SpeakerSegment] = [segments[0]]
-        is_force_split = False
-        for segment in segments[1:]:
-            current_segment = new_segments[-1]
-
-            # 強制的に分割する場合
-            if is_force_split:
-                new_segments.append(segment)
-                is_force_split = False
-                continue
-
-            # 話者が変わった場合は分割
-            if current_segment.speaker_name != segment.speaker_name:
-                new_segments.append(segment)
-                is_force_split = False
-                continue
-
-            # 閾値以下であればsegmentを統合
-            total_duration = segment.end_time - current_segment.start_time
-            if total_duration < self._segment_duration_threshold:
-                current_segment.end_time = segment.end_time
-                is_force_split = False
-                continue
-
-            # しきい値を超えている場合に短い区間だったら統合して次で分割
-            segment_duration = segment.end_time - segment.start_time
-            if segment_duration < self._split_segment_duration:
-                current_segment.end_time = segment.end_time
-                is_force_split = True
-                continue
-
-            # maxより小さければ統合
-            if total_duration < self._max_segment_duration:
-                current_segment.end_time = segment.end_time
-                is_force_split = False
-                continue
-
-            # maxを超えていて統合できるポイントがなかったので強制分割
-            new_segments.append(segment)
-            is_force_split = False
-
-        return new_segments
+        table = self.integrate_table(SegmentTable.from_segments(segments))
+
+        return table.to_segments()
+
+    def integrate_table(self: "SpeakerIntegrator", table: SegmentTable) -> SegmentTable:
+        """連続する話者区間を統合する.
+
+        Notes
+        -----
+        同じ話者が続く区間について、統合の先頭区間からの経過時間で統合可否を配列で判定し、
+        次に分割する位置まで一度に進める。判定は次の順に行う。
+
+        - 話者が変わった場合、もしくは直前で強制分割が指定された場合は分割する。
+        - 先頭からの長さが`segment_duration_threshold`未満であれば統合する。
+        - 区間が`split_segment_duration`未満であれば統合し、次の区間で強制的に分割する。
+        - 先頭からの長さが`max_segment_duration`未満であれば統合する。
+        - いずれにも当てはまらない場合は分割する。
+
+        """
+        num_segments = len(table)
+        if num_segments < 1:
+            return SegmentTable.empty()
+
+        start_times = table.start_times
+        end_times = table.end_times
+        is_short = table.durations < self._split_segment_duration
+
+        # 同じ話者が続く範囲の終端. 次の話者の先頭の添字となる
+        speaker_changes = np.flatnonzero(np.diff(table.speaker_ids) != 0) + 1
+        run_ends = np.append(speaker_changes, num_segments)
+
+        group_firsts: list[int] = []
+        group_lasts: list[int] = []
+        first = 0
+        for run_end in run_ends.tolist():
+            while first < run_end:
+                last = self._find_group_last(
+                    start_times[first], end_times, is_short, first, run_end
+                )
+                group_firsts.append(first)
+                group_lasts.append(last)
+                first = last + 1
+
+        firsts = np.array(group_firsts, dtype=np.int64)
+        lasts = np.array(group_lasts, dtype=np.int64)
+        return SegmentTable(
+            start_times=start_times[firsts],
+            end_times=end_times[lasts],
+            speaker_ids=table.speaker_ids[firsts],
+            speakers=table.speakers,
+        )
+
+    def _find_group_last(  # noqa: PLR0913
+        self: "SpeakerIntegrator",
+        group_start_time: float,
+        end_times: np.ndarray,
+        is_short: np.ndarray,
+        first: int,
+        run_end: int,
+    ) -> int:
+        """統合の先頭区間から、同じ話者の範囲内で統合される最後の区間を探す.
+
+        Notes
+        -----
+        長い範囲を毎回全て判定しないように、判定する範囲を倍々に広げながら探す。
+
+        """
+        window = 64
+        begin = first + 1
+        while begin < run_end:
+            stop = min(run_end, begin + window)
+            total_durations = end_times[begin:stop] - group_start_time
+            is_within_threshold = total_durations < self._segment_duration_threshold
+            is_force_split = ~is_within_threshold & is_short[begin:stop]
+            is_merged = (
+                is_within_threshold
+                | is_short[begin:stop]
+                | (total_durations < self._max_segment_duration)
+            )
+            # 統合できない区間の直前、もしくは強制分割を指定した区間で終わる
+            is_boundary = ~is_merged | is_force_split
+            if np.any(is_boundary):
+                index = begin + int(np.argmax(is_boundary))
+                return index if is_merged[index - begin] else index - 1
+            begin = stop
+            window *= 2
+
+        return run_end - 1
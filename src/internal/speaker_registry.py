@@ -0,0 +1,177 @@
+"""録音をまたいで話者を識別するための話者登録情報を管理するモジュール."""
+
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+_logger = logging.getLogger(__name__)
+
+
+class SpeakerRegistry:
+    """話者名と声の埋め込みベクトルを永続化し、新しい話者を照合する.
+
+    Notes
+    -----
+    埋め込みベクトルはL2正規化したfloat32の行列として保存する。
+    行は話者IDでソートしておき、照合時は行列積で全件のコサイン類似度を求めた後、
+    `np.maximum.reduceat`で話者ごとの最大類似度に集約する。
+
+    """
+
+    _EMBEDDINGS_FILENAME = "embeddings.npy"
+    _LABELS_FILENAME = "labels.npy"
+    _NAMES_FILENAME = "names.json"
+
+    def __init__(
+        self: "SpeakerRegistry", dirpath: Path, threshold: float = 0.5
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        dirpath : Path
+            登録情報を保存するディレクトリ
+
+        threshold : float, optional
+            同一話者とみなすコサイン類似度の下限, by default 0.5
+
+        """
+        self._dirpath = dirpath
+        self._threshold = threshold
+
+        self._names: list[str] = []
+        self._embeddings = np.zeros((0, 0), dtype=np.float32)
+        self._labels = np.zeros((0,), dtype=np.int32)
+        self._load()
+
+    @property
+    def names(self: "SpeakerRegistry") -> list[str]:
+        """登録済みの話者名."""
+        return list(self._names)
+
+    def __len__(self: "SpeakerRegistry") -> int:
+        """登録済みの埋め込みベクトル数."""
+        return len(self._labels)
+
+    def enroll(self: "SpeakerRegistry", name: str, embeddings: np.ndarray) -> None:
+        """話者の埋め込みベクトルを登録して保存する.
+
+        Parameters
+        ----------
+        name : str
+            話者名
+
+        embeddings : np.ndarray
+            埋め込みベクトル. (dim,)もしくは(num, dim)
+
+        """
+        vectors = _normalize(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+        vectors = vectors[np.all(np.isfinite(vectors), axis=1)]
+        if len(vectors) < 1:
+            _logger.warning("no valid embedding to enroll: %s", name)
+            return
+        if len(self._labels) > 0 and vectors.shape[1] != self._embeddings.shape[1]:
+            message = (
+                f"embedding dimension mismatch: {vectors.shape[1]} != "
+                f"{self._embeddings.shape[1]}"
+            )
+            raise ValueError(message)
+
+        if name not in self._names:
+            self._names.append(name)
+        label = self._names.index(name)
+
+        embeddings_all = (
+            vectors
+            if len(self._labels) < 1
+            else np.concatenate([np.asarray(self._embeddings), vectors])
+        )
+        labels_all = np.concatenate(
+            [self._labels, np.full(len(vectors), label, dtype=np.int32)]
+        )
+        order = np.argsort(labels_all, kind="stable")
+        self._embeddings = np.ascontiguousarray(embeddings_all[order])
+        self._labels = labels_all[order]
+        self._save()
+        _logger.info("enroll speaker: %s (+%d)", name, len(vectors))
+
+    def identify(self: "SpeakerRegistry", embeddings: np.ndarray) -> list[str | None]:
+        """埋め込みベクトルごとに登録済みの話者名を割り当てる.
+
+        Parameters
+        ----------
+        embeddings : np.ndarray
+            照合する埋め込みベクトル. (num, dim)
+
+        Returns
+        -------
+        list[str | None]
+            割り当てた話者名. 該当する話者がいない場合はNone.
+
+        Notes
+        -----
+        一つの録音内で同じ話者名が重複しないように、類似度の合計が最大となる組み合わせを
+        割り当てる。
+
+        """
+        queries = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        identified: list[str | None] = [None] * len(queries)
+        if len(self._labels) < 1 or len(queries) < 1:
+            return identified
+
+        valid = np.all(np.isfinite(queries), axis=1)
+        if not np.any(valid):
+            return identified
+        similarity = _normalize(queries[valid]) @ np.asarray(self._embeddings).T
+
+        # 行は話者IDでソート済みなので、区切りごとに最大類似度を集約する
+        boundaries = np.r_[0, np.flatnonzero(np.diff(self._labels)) + 1]
+        scores = np.maximum.reduceat(similarity, boundaries, axis=1)
+        speaker_ids = self._labels[boundaries]
+
+        valid_indices = np.flatnonzero(valid)
+        rows, cols = linear_sum_assignment(scores, maximize=True)
+        for row, col in zip(rows, cols, strict=True):
+            if scores[row, col] < self._threshold:
+                continue
+            identified[valid_indices[row]] = self._names[speaker_ids[col]]
+
+        return identified
+
+    def _load(self: "SpeakerRegistry") -> None:
+        """保存済みの登録情報を読み込む."""
+        names_filepath = self._dirpath / self._NAMES_FILENAME
+        if not names_filepath.exists():
+            return
+
+        self._names = json.loads(names_filepath.read_text(encoding="utf-8"))
+        self._embeddings = np.load(
+            self._dirpath / self._EMBEDDINGS_FILENAME, mmap_mode="r"
+        )
+        self._labels = np.load(self._dirpath / self._LABELS_FILENAME)
+
+    def _save(self: "SpeakerRegistry") -> None:
+        """登録情報を保存する."""
+        self._dirpath.mkdir(parents=True, exist_ok=True)
+        for filename, value in [
+            (self._EMBEDDINGS_FILENAME, self._embeddings),
+            (self._LABELS_FILENAME, self._labels),
+        ]:
+            temp_filepath = self._dirpath / f".{filename}.tmp"
+            with temp_filepath.open("wb") as f:
+                np.save(f, value)
+            temp_filepath.replace(self._dirpath / filename)
+        temp_filepath = self._dirpath / f".{self._NAMES_FILENAME}.tmp"
+        temp_filepath.write_text(
+            json.dumps(self._names, ensure_ascii=False), encoding="utf-8"
+        )
+        temp_filepath.replace(self._dirpath / self._NAMES_FILENAME)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """行ごとにL2正規化する."""
+    norm = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norm, np.finfo(np.float32).eps)
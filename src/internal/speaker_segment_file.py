@@ -2,12 +2,22 @@
 
 from pathlib import Path
 
+from internal.interim_cache import atomic_write
+from internal.segment_table import SegmentTable
 from internal.speaker_segment import SpeakerSegment
 from pydantic import RootModel
 
 
 class SpeakerSegmentFile:
-    """話者分離情報をファイルに保存する."""
+    """話者分離情報をファイルに保存する.
+
+    Notes
+    -----
+    拡張子が.npzの場合は`SegmentTable`の列ごとの配列をバイナリで保存し、
+    それ以外の場合はjsonで保存する。
+    .npzのファイルが存在せず、同名の.jsonのファイルが存在する場合はjsonから読み込む。
+
+    """
 
     class SpeakerSegmentList(RootModel[list[SpeakerSegment]]):
         """話者分離情報のリスト."""
@@ -22,25 +32,49 @@ class SpeakerSegmentFile:
 
         """
         self._filepath = filepath
+        self._is_binary = filepath.suffix == ".npz"
+        self._json_filepath = (
+            filepath.with_suffix(".json") if self._is_binary else filepath
+        )
 
     def save(self: "SpeakerSegmentFile", segments: list[SpeakerSegment]) -> None:
         """話者分離情報を保存する."""
+        if self._is_binary:
+            self.save_table(SegmentTable.from_segments(segments))
+            return
+
         segment_list = self.SpeakerSegmentList.model_validate(segments)
-        self._filepath.write_text(segment_list.model_dump_json())
+        with atomic_write(self._filepath) as temp_filepath:
+            temp_filepath.write_text(segment_list.model_dump_json())
+
+    def save_table(self: "SpeakerSegmentFile", table: SegmentTable) -> None:
+        """話者分離情報を保存する."""
+        if not self._is_binary:
+            self.save(table.to_segments())
+            return
+
+        table.save(self._filepath)
 
     def get_segment_list(self: "SpeakerSegmentFile") -> list[SpeakerSegment]:
         """話者分離情報を取得する."""
-        if not self._filepath.exists():
+        if self._is_binary and self._filepath.exists():
+            return self.get_table().to_segments()
+        if not self._json_filepath.exists():
             return []
 
         segment_list = self.SpeakerSegmentList.model_validate_json(
-            self._filepath.read_text()
+            self._json_filepath.read_text()
         )
         return segment_list.root
 
+    def get_table(self: "SpeakerSegmentFile") -> SegmentTable:
+        """話者分離情報を取得する."""
+        if self._is_binary and self._filepath.exists():
+            return SegmentTable.load(self._filepath)
+
+        return SegmentTable.from_segments(self.get_segment_list())
+
     def clean(self: "SpeakerSegmentFile") -> None:
         """保存されている話者分離情報を削除する."""
-        if not self._filepath.exists():
-            return
-
-        self._filepath.unlink()
+        self._filepath.unlink(missing_ok=True)
+        self._json_filepath.unlink(missing_ok=True)
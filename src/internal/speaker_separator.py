@@ -1,17 +1,45 @@
 """音声から話者分離を行うクラスを提供するモジュール."""
 
+import copy
 from collections.abc import Generator
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Any, ClassVar
 
+import numpy as np
 import torch
+from internal.audio_source import AudioSource
+from internal.batch_autotuner import BatchSetting
+from internal.diarization_cache_file import DiarizationCache
+from internal.onnx_diarization_backend import OnnxDiarizationBackend
+from internal.pipeline_snapshot import PipelineSnapshot
+from internal.progress import ProgressReporter
 from internal.speaker_segment import SpeakerSegment
-from pyannote.audio import Pipeline
+from internal.thread_governor import ThreadGovernor
+from pyannote.audio import Audio, Pipeline
+from pyannote.core import Annotation, SlidingWindowFeature
 
 
 class SpeakerSeparator:
     """音声から話者分離を行う."""
 
-    def __init__(self: "SpeakerSeparator", config_path: Path, device_name: str) -> None:
+    # 進捗の算出に利用する、pyannoteのパイプラインの処理ごとの処理時間の比率
+    _STEP_WEIGHTS: ClassVar[dict[str, float]] = {
+        "segmentation": 0.2,
+        "embeddings": 0.8,
+    }
+
+    def __init__(  # noqa: PLR0913
+        self: "SpeakerSeparator",
+        config_path: Path,
+        device_name: str,
+        *,
+        onnx_backend: OnnxDiarizationBackend | None = None,
+        snapshot_dir: Path | None = None,
+        governor: ThreadGovernor | None = None,
+        progress: ProgressReporter | None = None,
+        batch_setting: BatchSetting | None = None,
+    ) -> None:
         """初期化処理.
 
         Parameters
@@ -22,27 +50,249 @@ class SpeakerSeparator:
         device_name : str
             デバイス名
 
+        onnx_backend : OnnxDiarizationBackend | None, optional
+            指定した場合はモデルの推論をONNX Runtimeで行う, by default None
+
+        snapshot_dir : Path | None, optional
+            パイプラインのスナップショットのディレクトリ.
+            有効なスナップショットがある場合は設定ファイルの代わりに利用する,
+            by default None
+
+        governor : ThreadGovernor | None, optional
+            指定した場合は話者分離の間、torchのスレッド数を割り当てに合わせて変更する,
+            by default None
+
+        progress : ProgressReporter | None, optional
+            話者分離の進捗を通知する, by default None
+
+        batch_setting : BatchSetting | None, optional
+            パイプラインのバッチサイズ. Noneの場合は設定ファイルの値を利用する,
+            by default None
+
         """
         self._config_path = config_path
         self._device_name = device_name
+        self._onnx_backend = onnx_backend
+        self._snapshot_dir = snapshot_dir
+        self._governor = governor
+        self._progress = progress or ProgressReporter()
+        self._batch_setting = batch_setting
+        self._pipeline: Pipeline | None = None
+        self._speaker_embeddings: dict[str, np.ndarray] = {}
+        self._diarization_cache: DiarizationCache | None = None
+
+    @property
+    def speaker_embeddings(self: "SpeakerSeparator") -> dict[str, np.ndarray]:
+        """直前の`diarization`で得られた話者ごとの埋め込みベクトル."""
+        return self._speaker_embeddings
+
+    @property
+    def diarization_cache(self: "SpeakerSeparator") -> DiarizationCache | None:
+        """直前の`diarization`のクラスタリング前までの途中結果."""
+        return self._diarization_cache
 
     def diarization(
-        self: "SpeakerSeparator", wav_filepath: Path
+        self: "SpeakerSeparator",
+        audio: Path | AudioSource,
+        *,
+        num_speakers: int | None = None,
+        min_speakers: int | None = None,
+        max_speakers: int | None = None,
     ) -> Generator[SpeakerSegment, None, None]:
         """音声から話者分離を行う.
 
         Parameters
         ----------
-        wav_filepath : Path
-            音声ファイルのパス
+        audio : Path | AudioSource
+            音声ファイルのパス、もしくはメモリ上の音声データ
+
+        num_speakers : int | None, optional
+            話者数が分かっている場合に指定する, by default None
+
+        min_speakers : int | None, optional
+            話者数の下限, by default None
+
+        max_speakers : int | None, optional
+            話者数の上限, by default None
+
+        """
+        pipeline = self._load_pipeline()
+        file = audio.to_pyannote() if isinstance(audio, AudioSource) else audio
+        artifacts: dict[str, Any] = {}
+        duration = (
+            audio.duration
+            if isinstance(audio, AudioSource)
+            else Audio().get_duration(audio)
+        )
+        finished_weight = 0.0
+
+        def hook(
+            step_name: str,
+            step_artifact: Any,  # noqa: ANN401
+            file: dict | None = None,  # noqa: ARG001
+            total: int | None = None,
+            completed: int | None = None,
+        ) -> None:
+            nonlocal finished_weight
+            # 他のスレッドで変更されたtorchのスレッド数を、このスレッドで反映する
+            if lease is not None:
+                lease.apply_pending()
+            weight = self._STEP_WEIGHTS.get(step_name, 0.0)
+            if total is not None:
+                # 処理中のステップの進捗をパイプライン全体の進捗に換算する
+                if completed is not None and total > 0:
+                    stage.update(
+                        finished_weight + weight * completed / total, step=step_name
+                    )
+                return
+            # 途中経過の通知(total指定あり)は除き、各ステップの最終結果のみを保持する
+            if step_artifact is not None:
+                artifacts[step_name] = step_artifact
+                finished_weight += weight
+
+        lease_context = (
+            nullcontext()
+            if self._governor is None
+            else self._governor.lease("diarization", on_change=torch.set_num_threads)
+        )
+        with (
+            lease_context as lease,
+            self._progress.stage(
+                "diarization",
+                total=sum(self._STEP_WEIGHTS.values()),
+                audio_total=duration,
+            ) as stage,
+        ):
+            diarization, embeddings = pipeline(
+                file,
+                num_speakers=num_speakers,
+                min_speakers=min_speakers,
+                max_speakers=max_speakers,
+                return_embeddings=True,
+                hook=hook,
+            )
+        self._diarization_cache = None
+        if "segmentation" in artifacts and "embeddings" in artifacts:
+            self._diarization_cache = DiarizationCache(
+                segmentations=artifacts["segmentation"],
+                embeddings=artifacts["embeddings"],
+            )
+
+        yield from self._to_segments(diarization, embeddings)
+
+    def recluster(  # noqa: PLR0913
+        self: "SpeakerSeparator",
+        cache: DiarizationCache,
+        *,
+        num_speakers: int | None = None,
+        min_speakers: int | None = None,
+        max_speakers: int | None = None,
+        clustering_threshold: float | None = None,
+        min_cluster_size: int | None = None,
+    ) -> Generator[SpeakerSegment, None, None]:
+        """保存済みの途中結果から、クラスタリング以降のみを再実行する.
+
+        Parameters
+        ----------
+        cache : DiarizationCache
+            `diarization`で得られた途中結果
+
+        num_speakers : int | None, optional
+            話者数が分かっている場合に指定する, by default None
+
+        min_speakers : int | None, optional
+            話者数の下限, by default None
+
+        max_speakers : int | None, optional
+            話者数の上限, by default None
+
+        clustering_threshold : float | None, optional
+            クラスタリングの閾値. Noneの場合は設定ファイルの値を利用する,
+            by default None
+
+        min_cluster_size : int | None, optional
+            クラスタの最小サイズ. Noneの場合は設定ファイルの値を利用する,
+            by default None
+
+        Notes
+        -----
+        segmentationとembeddingの算出を保存済みの値に置き換えてパイプラインを実行する。
 
         """
-        pipeline = Pipeline.from_pretrained(self._config_path)
-        pipeline.to(torch.device(self._device_name))
-        diarization = pipeline(wav_filepath)
+        pipeline = self._load_pipeline()
+        params = pipeline.parameters(instantiated=True)
+        new_params = copy.deepcopy(params)
+        if clustering_threshold is not None:
+            new_params["clustering"]["threshold"] = clustering_threshold
+        if min_cluster_size is not None:
+            new_params["clustering"]["min_cluster_size"] = min_cluster_size
+
+        def get_segmentations(
+            file: dict,  # noqa: ARG001
+            hook: Any = None,  # noqa: ANN401, ARG001
+        ) -> SlidingWindowFeature:
+            return cache.segmentations
+
+        def get_embeddings(
+            file: dict,  # noqa: ARG001
+            binary_segmentations: SlidingWindowFeature,  # noqa: ARG001
+            exclude_overlap: bool = False,  # noqa: ARG001, FBT001, FBT002
+            hook: Any = None,  # noqa: ANN401, ARG001
+        ) -> np.ndarray:
+            return cache.embeddings
+
+        pipeline.instantiate(new_params)
+        pipeline.get_segmentations = get_segmentations
+        pipeline.get_embeddings = get_embeddings
+        try:
+            diarization, embeddings = pipeline.apply(
+                {"uri": "recluster"},
+                num_speakers=num_speakers,
+                min_speakers=min_speakers,
+                max_speakers=max_speakers,
+                return_embeddings=True,
+            )
+        finally:
+            del pipeline.get_segmentations
+            del pipeline.get_embeddings
+            pipeline.instantiate(params)
+
+        yield from self._to_segments(diarization, embeddings)
+
+    def _to_segments(
+        self: "SpeakerSeparator", diarization: Annotation, embeddings: np.ndarray
+    ) -> Generator[SpeakerSegment, None, None]:
+        """パイプラインの出力を話者区間に変換する."""
+        # embeddingsの行はdiarization.labels()の順序に対応する
+        self._speaker_embeddings = {
+            speaker: np.asarray(embedding, dtype=np.float32)
+            for speaker, embedding in zip(
+                diarization.labels(), embeddings, strict=False
+            )
+        }
 
         for segment, _, speaker in diarization.itertracks(yield_label=True):
             speaker_segment = SpeakerSegment(
                 start_time=segment.start, end_time=segment.end, speaker_name=speaker
             )
             yield speaker_segment
+
+    def _load_pipeline(self: "SpeakerSeparator") -> Pipeline:
+        """話者分離パイプラインを読み込む. 読み込み済みの場合は再利用する."""
+        if self._pipeline is not None:
+            return self._pipeline
+
+        pipeline = None
+        if self._snapshot_dir is not None:
+            pipeline = PipelineSnapshot(self._snapshot_dir).load(self._config_path)
+        if pipeline is None:
+            pipeline = Pipeline.from_pretrained(self._config_path)
+        if self._onnx_backend is not None:
+            pipeline = self._onnx_backend.attach(pipeline)
+        else:
+            pipeline.to(torch.device(self._device_name))
+        if self._batch_setting is not None:
+            self._batch_setting.apply(pipeline)
+        self._pipeline = pipeline
+
+        return pipeline
@@ -2,6 +2,8 @@
 
 import os
 
+import numpy as np
+from internal.segment_table import SegmentTable, gather_ranges
 from internal.speaker_text import SpeakerText
 
 
@@ -15,20 +17,56 @@ class SpeechIntegrator:
         self: "SpeechIntegrator", speaker_text: list[SpeakerText]
     ) -> list[SpeakerText]:
         """連続する話者区間を統合する."""
+        table = self.integrate_table(SegmentTable.from_texts(speaker_text))
+
+        return table.to_texts()
+
+    def integrate_table(self: "SpeechIntegrator", table: SegmentTable) -> SegmentTable:
+        """連続する話者区間を統合する.
+
+        Notes
+        -----
+        テキストがない区間を除き、同一話者が続く区間を一つにまとめる。
+        まとめた区間のテキストは改行で連結する。
+
+        """
         # テキストがない区間は削除する
-        remove_redundant_text: list[SpeakerText] = [
-            segment for segment in speaker_text if segment.text != ""
-        ]
+        table = table.take(table.text_lengths > 0)
+        if len(table) < 1:
+            return SegmentTable.empty()
 
         # 同一話者区間は一つのブロックにまとめる
-        integrated_speaker_text = [remove_redundant_text[0]]
-        for segment in remove_redundant_text[1:]:
-            current_text = integrated_speaker_text[-1]
-            if current_text.speaker_name != segment.speaker_name:
-                integrated_speaker_text.append(segment)
-                continue
+        is_first = np.ones(len(table), dtype=bool)
+        is_first[1:] = table.speaker_ids[1:] != table.speaker_ids[:-1]
+        firsts = np.flatnonzero(is_first)
+        lasts = np.append(firsts[1:] - 1, len(table) - 1)
+
+        # 同じブロック内の次の区間がある場合は、テキストの後ろに改行を挿入する
+        separator = np.frombuffer(os.linesep.encode("utf-8"), dtype=np.uint8)
+        has_separator = np.append(~is_first[1:], False)
+        text_lengths = table.text_lengths
+        piece_lengths = text_lengths + has_separator * len(separator)
+        piece_offsets = np.zeros(len(table) + 1, dtype=np.int64)
+        np.cumsum(piece_lengths, out=piece_offsets[1:])
 
-            current_text.end_time = segment.end_time
-            current_text.text += os.linesep + segment.text
+        text_buffer = np.empty(piece_offsets[-1], dtype=np.uint8)
+        text_positions = gather_ranges(piece_offsets[:-1], text_lengths)
+        text_buffer[text_positions] = table.text_buffer
+        separator_starts = (
+            piece_offsets[:-1][has_separator] + text_lengths[has_separator]
+        )
+        separator_positions = separator_starts[:, np.newaxis] + np.arange(
+            len(separator)
+        )
+        text_buffer[separator_positions.ravel()] = np.tile(
+            separator, len(separator_starts)
+        )
 
-        return integrated_speaker_text
+        return SegmentTable(
+            start_times=table.start_times[firsts],
+            end_times=table.end_times[lasts],
+            speaker_ids=table.speaker_ids[firsts],
+            speakers=table.speakers,
+            text_offsets=piece_offsets[np.append(firsts, len(table))],
+            text_buffer=text_buffer,
+        )
@@ -2,12 +2,22 @@
 
 from pathlib import Path
 
+from internal.interim_cache import atomic_write
+from internal.segment_table import SegmentTable
 from internal.speaker_text import SpeakerText
 from pydantic import RootModel
 
 
 class SpeechTextFile:
-    """話者ごとのテキストをファイル保存する."""
+    """話者ごとのテキストをファイル保存する.
+
+    Notes
+    -----
+    拡張子が.npzの場合は`SegmentTable`の列ごとの配列をバイナリで保存し、
+    それ以外の場合はjsonで保存する。
+    .npzのファイルが存在せず、同名の.jsonのファイルが存在する場合はjsonから読み込む。
+
+    """
 
     class SpeechTextList(RootModel[list[SpeakerText]]):
         """話者ごとのテキストのリスト."""
@@ -22,25 +32,49 @@ class SpeechTextFile:
 
         """
         self._filepath = filepath
+        self._is_binary = filepath.suffix == ".npz"
+        self._json_filepath = (
+            filepath.with_suffix(".json") if self._is_binary else filepath
+        )
 
     def save(self: "SpeechTextFile", segments: list[SpeakerText]) -> None:
         """話者ごとのテキストを保存する."""
+        if self._is_binary:
+            self.save_table(SegmentTable.from_texts(segments))
+            return
+
         segment_list = self.SpeechTextList.model_validate(segments)
-        self._filepath.write_text(segment_list.model_dump_json())
+        with atomic_write(self._filepath) as temp_filepath:
+            temp_filepath.write_text(segment_list.model_dump_json())
+
+    def save_table(self: "SpeechTextFile", table: SegmentTable) -> None:
+        """話者ごとのテキストを保存する."""
+        if not self._is_binary:
+            self.save(table.to_texts())
+            return
+
+        table.save(self._filepath)
 
     def get_segment_list(self: "SpeechTextFile") -> list[SpeakerText]:
         """話者ごとのテキストを取得する."""
-        if not self._filepath.exists():
+        if self._is_binary and self._filepath.exists():
+            return self.get_table().to_texts()
+        if not self._json_filepath.exists():
             return []
 
         segment_list = self.SpeechTextList.model_validate_json(
-            self._filepath.read_text()
+            self._json_filepath.read_text()
         )
         return segment_list.root
 
+    def get_table(self: "SpeechTextFile") -> SegmentTable:
+        """話者ごとのテキストを取得する."""
+        if self._is_binary and self._filepath.exists():
+            return SegmentTable.load(self._filepath)
+
+        return SegmentTable.from_texts(self.get_segment_list())
+
     def clean(self: "SpeechTextFile") -> None:
         """保存されている話者ごとのテキストを削除する."""
-        if not self._filepath.exists():
-            return
-
-        self._filepath.unlink()
+        self._filepath.unlink(missing_ok=True)
+        self._json_filepath.unlink(missing_ok=True)
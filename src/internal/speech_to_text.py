@@ -1,14 +1,18 @@
 """音声データをテキスト化するモジュール."""
 
 import logging
-import os
-import re
-import subprocess
+import tempfile
+from collections.abc import Sequence
+from functools import partial
 from pathlib import Path
 
+from internal.audio_source import AudioSource
+from internal.progress import ProgressReporter
+from internal.run_metrics import RunMetrics
 from internal.speaker_segment import SpeakerSegment
 from internal.speaker_text import SpeakerText
-from pydub import AudioSegment
+from internal.thread_governor import ThreadGovernor
+from internal.whisper_executor import WhisperExecutor, WhisperResult, WhisperTask
 
 _logger = logging.getLogger(__name__)
 
@@ -16,15 +20,25 @@ _logger = logging.getLogger(__name__)
 class SpeechToText:
     """音声データをテキスト化する."""
 
-    def __init__(
-        self: "SpeechToText", wav_dirpath: Path, whisper_cpp_path: Path, model_name: str
+    def __init__(  # noqa: PLR0913
+        self: "SpeechToText",
+        wav_dirpath: Path | None,
+        whisper_cpp_path: Path,
+        model_name: str,
+        *,
+        fallback_model_names: Sequence[str] = (),
+        num_workers: int = 1,
+        governor: ThreadGovernor | None = None,
+        metrics: RunMetrics | None = None,
+        progress: ProgressReporter | None = None,
     ) -> None:
         """初期化処理.
 
         Parameters
         ----------
-        wav_dirpath : Path
-            wavファイルのディレクトリパス
+        wav_dirpath : Path | None
+            区間ごとのwavファイルを書き出すディレクトリパス.
+            Noneの場合は中間ファイルを作らずに文字起こしする.
 
         whisper_cpp_path : Path
             whisper.cppのパス
@@ -32,112 +46,112 @@ class SpeechToText:
         model_name : string
             モデル名
 
+        fallback_model_names : Sequence[str], optional
+            失敗時に利用するモデル名. 小さいモデルから順に指定する, by default ()
+
+        num_workers : int, optional
+            同時に実行するwhisper.cppのプロセス数, by default 1
+
+        governor : ThreadGovernor | None, optional
+            whisper.cppのスレッド数を割り当てる, by default None
+
+        metrics : RunMetrics | None, optional
+            whisper.cppの実行回数や暴走による中断を記録する, by default None
+
+        progress : ProgressReporter | None, optional
+            区間ごとの文字起こしの完了を通知する, by default None
+
         """
         self._wav_dirpath = wav_dirpath
-        self._whisper_cpp_path = whisper_cpp_path.resolve()
-
-        self._re_query = re.compile(
-            r"(\[\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}])\s+(.+)"
+        self._executor = WhisperExecutor(
+            whisper_cpp_path=whisper_cpp_path,
+            model_names=[model_name, *fallback_model_names],
+            num_workers=num_workers,
+            governor=governor,
+            metrics=metrics,
         )
-        self._whisper_cpp_venv = self._whisper_cpp_path / ".venv/bin"
-        self._whisper_command = [
-            str(whisper_cpp_path / "main"),
-            "-m",
-            str(whisper_cpp_path / f"models/ggml-{model_name}.bin"),
-            "-l",
-            "ja",
-        ]
+        self._failed_segments: list[SpeakerSegment] = []
+        self._progress = progress or ProgressReporter()
+
+    @property
+    def metrics(self: "SpeechToText") -> RunMetrics:
+        """whisper.cppの実行回数や暴走による中断の記録."""
+        return self._executor.metrics
+
+    @property
+    def failed_segments(self: "SpeechToText") -> list[SpeakerSegment]:
+        """直前の`to_text`で文字起こしに失敗した区間."""
+        return self._failed_segments
 
     def to_text(
-        self: "SpeechToText", sound: AudioSegment, segments: list[SpeakerSegment]
+        self: "SpeechToText", sound: AudioSource, segments: list[SpeakerSegment]
     ) -> list[SpeakerText]:
-        """指定したwavファイルをテキスト化する."""
-        speaker_text_list: list[SpeakerText] = []
-        for segment in segments:
-            start_time = int(segment.start_time * 1000)  # s -> ms
-            end_time = int(segment.end_time * 1000)  # s -> ms
-            sound_segment = sound[start_time:end_time]
-            if type(sound_segment) is not AudioSegment:
-                st = segment.start_time
-                et = segment.end_time
-                message = (
-                    f"sound segment is not AudioSegment. [{st:03.1f}s - {et:03.1f}s]"
+        """指定した音声データの区間ごとにテキスト化する.
+
+        Notes
+        -----
+        文字起こしに失敗した区間は結果に含めず、`failed_segments`に記録する。
+
+        """
+        tasks = [
+            WhisperTask(
+                key=index,
+                duration=segment.end_time - segment.start_time,
+                load=partial(sound.wav_bytes, segment.start_time, segment.end_time),
+            )
+            for index, segment in enumerate(segments)
+        ]
+        with self._progress.stage(
+            "speech_to_text",
+            total=len(tasks),
+            audio_total=sum(task.duration for task in tasks),
+        ) as stage:
+
+            def on_done(task: WhisperTask, result: WhisperResult) -> None:
+                stage.segment_done(
+                    audio_seconds=task.duration,
+                    key=task.key,
+                    model_name=result.model_name,
+                    succeeded=result.text is not None,
                 )
-                raise ValueError(message)
-            try:
-                text = self._sound_segment_to_text(sound_segment)
-            except Exception:
-                _logger.exception(
-                    (
-                        "Unhandled exception in speech to text. continue... "
-                        "[%03.1f s - %03.1f s] %s"
-                    ),
+
+            if self._wav_dirpath is None:
+                results = self._executor.run(tasks, on_done=on_done)
+            else:
+                with tempfile.TemporaryDirectory(
+                    dir=self._wav_dirpath, prefix="whisper_"
+                ) as temp_dir:
+                    results = self._executor.run(
+                        tasks, work_dir=Path(temp_dir), on_done=on_done
+                    )
+
+        speaker_text_list: list[SpeakerText] = []
+        self._failed_segments = []
+        for segment, result in zip(segments, results, strict=True):
+            if result.text is None:
+                _logger.error(
+                    "speech to text failed after %d attempts. [%03.1f s - %03.1f s] %s",
+                    result.attempts,
                     segment.start_time,
                     segment.end_time,
                     segment.speaker_name,
                 )
+                self._failed_segments.append(segment)
                 continue
             speaker_text = SpeakerText(
                 start_time=segment.start_time,
                 end_time=segment.end_time,
                 speaker_name=segment.speaker_name,
-                text=text,
+                text=result.text,
             )
             speaker_text_list.append(speaker_text)
             _logger.debug(
-                "[%03.1f s - %03.1f s] %s : %s",
+                "[%03.1f s - %03.1f s] %s (%s) : %s",
                 segment.start_time,
                 segment.end_time,
                 segment.speaker_name,
-                text,
+                result.model_name,
+                result.text,
             )
 
         return speaker_text_list
-
-    def _sound_segment_to_text(self: "SpeechToText", sound: AudioSegment) -> str:
-        """1つ分のオーディオデータをテキスト化する."""
-        wav_filepath = self._wav_dirpath / "cut_export.wav"
-        sound.export(wav_filepath, format="wav")
-
-        old_path = os.environ["PATH"]
-        os.environ["PATH"] = (
-            f"{self._whisper_cpp_path}/.venv/bin:{os.environ.get('PATH')}"
-        )
-        command_args = [
-            *self._whisper_command,
-            "-f",
-            str(wav_filepath),
-        ]
-        proc = subprocess.Popen(
-            command_args,  # noqa: S603
-            encoding="utf-8",
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        try:
-            result, error = proc.communicate(timeout=1800)
-        except Exception:
-            proc.kill()
-            raise
-        if proc.returncode != 0:
-            _logger.error("command failed with exit status %d", proc.returncode)
-            _logger.error(error)
-
-            message = "speech to text error."
-            raise ValueError(message)
-        os.environ["PATH"] = old_path
-        wav_filepath.unlink()
-
-        result_lines = result.splitlines()
-        match_list: list[str] = []
-        num_split = 2  # regexで分割した場合に2個に分割されることを期待している
-        for line in result_lines:
-            line_str = self._re_query.search(line)
-            if line_str is None:
-                continue
-            if len(line_str.groups()) != num_split:
-                _logger.warning("skip match string: num=%d", len(line_str.groups()))
-                continue
-            match_list.append(line_str.group(2))
-
-        return " ".join(match_list)
@@ -0,0 +1,262 @@
+"""CPUのスレッド数を処理全体で配分するモジュール."""
+
+import logging
+import os
+import shutil
+import threading
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ThreadLease:
+    """処理に割り当てたスレッド数."""
+
+    stage: str  # 処理名
+    num_threads: int  # 割り当てたスレッド数
+    cpus: list[int]  # 割り当てたCPU番号
+    min_threads: int = 1  # 最小スレッド数
+    max_threads: int | None = None  # 最大スレッド数. Noneの場合は上限なし
+    on_change: Callable[[int], None] | None = field(default=None, repr=False)
+    owner: int = field(default_factory=threading.get_ident, repr=False)  # 取得スレッド
+    applied_threads: int = field(default=0, repr=False)  # on_changeに反映した値
+
+    @property
+    def adjustable(self: "ThreadLease") -> bool:
+        """実行中にスレッド数を変更できるかどうか."""
+        return self.on_change is not None
+
+    def apply_pending(self: "ThreadLease") -> None:
+        """未反映のスレッド数の変更を`on_change`に反映する.
+
+        Notes
+        -----
+        torchのスレッド数のように呼び出したスレッドにのみ反映される設定があるため、
+        リースを取得したスレッドで呼び出した場合のみ反映する。
+        他のスレッドで変更された場合は、処理の区切りで取得したスレッドから呼び出す。
+
+        """
+        if self.on_change is None or self.applied_threads == self.num_threads:
+            return
+        if threading.get_ident() != self.owner:
+            return
+        self.applied_threads = self.num_threads
+        self.on_change(self.num_threads)
+
+
+class ThreadGovernor:
+    """CPUのスレッド数の上限を管理し、処理ごとにスレッド数を割り当てる.
+
+    Notes
+    -----
+    torch、ONNX Runtime、whisper.cpp、ffmpegがそれぞれCPUコア数分のスレッドを
+    利用すると、同時に実行した場合にスレッド数がコア数を超えて遅くなる。
+    処理の開始時に`acquire`でスレッド数を受け取り、終了時に`release`で返却する。
+    空きがない場合は他の処理が返却するまで待つ。
+    torchのように実行中にスレッド数を変更できる処理は`on_change`を指定すると、
+    他の処理の開始時に縮小し、終了時に拡大する。
+    ffmpegやwhisper.cppのように実行中に変更できない処理は、先に開始した処理が全ての
+    スレッドを占有して後の処理が待ち続けないよう、`max_threads`の指定がない場合は
+    全体の半分を上限とする。また、変更できない処理の合計は`reserved_threads`を
+    残した数までとし、話者分離のような変更できる処理が常に開始できるようにする。
+    `pin_affinity`を指定した場合は割り当てたCPUに外部プロセスを固定する。
+
+    """
+
+    def __init__(
+        self: "ThreadGovernor",
+        total_threads: int = 0,
+        *,
+        pin_affinity: bool = False,
+        reserved_threads: int = 1,
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        total_threads : int, optional
+            全体で利用するスレッド数. 0の場合は利用可能なCPUコア数, by default 0
+
+        pin_affinity : bool, optional
+            外部プロセスを割り当てたCPUに固定するかどうか, by default False
+
+        reserved_threads : int, optional
+            実行中にスレッド数を変更できない処理には割り当てず、変更できる処理のために
+            残すスレッド数. 全体のスレッド数未満に制限する, by default 1
+
+        """
+        available_cpus = sorted(_available_cpus())
+        if total_threads < 1 or total_threads > len(available_cpus):
+            total_threads = len(available_cpus)
+        self._total_threads = total_threads
+        self._reserved_threads = max(0, min(reserved_threads, total_threads - 1))
+        self._free_cpus = available_cpus[:total_threads]
+        self._pin_affinity = pin_affinity and shutil.which("taskset") is not None
+        if pin_affinity and not self._pin_affinity:
+            _logger.warning("taskset not found. cpu affinity is disabled.")
+        self._leases: list[ThreadLease] = []
+        self._condition = threading.Condition()
+
+    @property
+    def total_threads(self: "ThreadGovernor") -> int:
+        """全体で利用するスレッド数."""
+        return self._total_threads
+
+    def share(self: "ThreadGovernor", num_workers: int) -> int:
+        """同時に実行する処理の数で均等に分けた場合のスレッド数."""
+        return max(1, self._total_threads // max(1, num_workers))
+
+    def acquire(
+        self: "ThreadGovernor",
+        stage: str,
+        *,
+        min_threads: int = 1,
+        max_threads: int | None = None,
+        on_change: Callable[[int], None] | None = None,
+    ) -> ThreadLease:
+        """スレッド数を割り当てる. 空きがない場合は空くまで待つ.
+
+        Parameters
+        ----------
+        stage : str
+            処理名
+
+        min_threads : int, optional
+            最小スレッド数, by default 1
+
+        max_threads : int | None, optional
+            最大スレッド数. Noneの場合は、実行中に変更できる処理は上限なし、
+            変更できない処理は全体の半分, by default None
+
+        on_change : Callable[[int], None] | None, optional
+            実行中にスレッド数を変更できる場合に、変更後のスレッド数を受け取る関数.
+            割り当て時にも呼び出す. 他のスレッドでの変更は、取得したスレッドが
+            `ThreadLease.apply_pending`を呼び出した時点で反映する, by default None
+
+        """
+        adjustable = on_change is not None
+        capacity = self._total_threads - (0 if adjustable else self._reserved_threads)
+        min_threads = max(1, min(min_threads, capacity))
+        limit = max_threads or (self._total_threads if adjustable else self.share(2))
+        with self._condition:
+            while True:
+                fair_share = max(min_threads, self.share(len(self._leases) + 1))
+                self._shrink(fair_share)
+                available = (
+                    len(self._free_cpus) if adjustable else self._fixed_capacity()
+                )
+                if available >= min_threads:
+                    break
+                self._condition.wait()
+
+            num_threads = min(available, fair_share, limit)
+            lease = ThreadLease(
+                stage=stage,
+                num_threads=num_threads,
+                cpus=self._take_cpus(num_threads),
+                min_threads=min_threads,
+                max_threads=max_threads,
+                on_change=on_change,
+            )
+            self._leases.append(lease)
+            _logger.debug("acquire threads: %s=%d", stage, num_threads)
+
+        lease.apply_pending()
+
+        return lease
+
+    def release(self: "ThreadGovernor", lease: ThreadLease) -> None:
+        """割り当てたスレッド数を返却し、実行中の処理に再配分する."""
+        with self._condition:
+            if lease not in self._leases:
+                return
+            self._leases.remove(lease)
+            self._free_cpus = sorted([*self._free_cpus, *lease.cpus])
+            lease.cpus = []
+            _logger.debug("release threads: %s=%d", lease.stage, lease.num_threads)
+            self._grow()
+            self._condition.notify_all()
+
+    @contextmanager
+    def lease(
+        self: "ThreadGovernor",
+        stage: str,
+        *,
+        min_threads: int = 1,
+        max_threads: int | None = None,
+        on_change: Callable[[int], None] | None = None,
+    ) -> Generator[ThreadLease, None, None]:
+        """処理の間だけスレッド数を割り当てる."""
+        lease = self.acquire(
+            stage, min_threads=min_threads, max_threads=max_threads, on_change=on_change
+        )
+        try:
+            yield lease
+        finally:
+            self.release(lease)
+
+    def command_prefix(self: "ThreadGovernor", lease: ThreadLease) -> list[str]:
+        """外部プロセスを割り当てたCPUに固定するためのコマンドの接頭辞."""
+        if not self._pin_affinity or len(lease.cpus) < 1:
+            return []
+
+        return ["taskset", "--cpu-list", ",".join(str(v) for v in lease.cpus)]
+
+    def _fixed_capacity(self: "ThreadGovernor") -> int:
+        """実行中に変更できない処理に割り当てられるスレッド数."""
+        fixed_threads = sum(v.num_threads for v in self._leases if not v.adjustable)
+        capacity = self._total_threads - self._reserved_threads - fixed_threads
+
+        return min(len(self._free_cpus), capacity)
+
+    def _take_cpus(self: "ThreadGovernor", num_threads: int) -> list[int]:
+        """空いているCPUを取得する."""
+        cpus = self._free_cpus[:num_threads]
+        self._free_cpus = self._free_cpus[num_threads:]
+
+        return cpus
+
+    def _shrink(self: "ThreadGovernor", target: int) -> None:
+        """変更可能な処理のスレッド数を縮小して空きを作る."""
+        for lease in self._leases:
+            if not lease.adjustable or lease.num_threads <= target:
+                continue
+            num_threads = max(lease.min_threads, target)
+            released = lease.cpus[num_threads:]
+            lease.cpus = lease.cpus[:num_threads]
+            self._free_cpus = sorted([*self._free_cpus, *released])
+            self._resize(lease, num_threads)
+
+    def _grow(self: "ThreadGovernor") -> None:
+        """空いたスレッドを変更可能な処理に配分する."""
+        adjustable = [v for v in self._leases if v.adjustable]
+        for index, lease in enumerate(adjustable):
+            share = len(self._free_cpus) // (len(adjustable) - index)
+            limit = lease.max_threads or self._total_threads
+            num_threads = min(lease.num_threads + share, limit)
+            if num_threads <= lease.num_threads:
+                continue
+            lease.cpus += self._take_cpus(num_threads - lease.num_threads)
+            self._resize(lease, num_threads)
+
+    def _resize(self: "ThreadGovernor", lease: ThreadLease, num_threads: int) -> None:
+        """処理のスレッド数を変更する."""
+        _logger.debug(
+            "rebalance threads: %s=%d -> %d",
+            lease.stage,
+            lease.num_threads,
+            num_threads,
+        )
+        lease.num_threads = num_threads
+        lease.apply_pending()
+
+
+def _available_cpus() -> set[int]:
+    """プロセスが利用できるCPU番号を取得する."""
+    if hasattr(os, "sched_getaffinity"):
+        return os.sched_getaffinity(0)
+
+    return set(range(os.cpu_count() or 1))
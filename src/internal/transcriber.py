@@ -0,0 +1,240 @@
+"""話者分離と文字起こしをまとめて行うライブラリ向けのAPIを提供するモジュール."""
+
+import logging
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+
+import numpy as np
+from internal.audio_source import AudioSource
+from internal.onnx_diarization_backend import OnnxDiarizationBackend
+from internal.overlap_planner import OverlapPlanner
+from internal.speaker_integrator import SpeakerIntegrator
+from internal.speaker_segment import SpeakerSegment
+from internal.speaker_separator import SpeakerSeparator
+from internal.speaker_text import SpeakerText
+from internal.speech_integrator import SpeechIntegrator
+from internal.speech_to_text import SpeechToText
+from internal.thread_governor import ThreadGovernor
+
+_logger = logging.getLogger(__name__)
+
+AudioInput = Path | str | bytes | np.ndarray | AudioSource
+
+
+@dataclass(frozen=True)
+class TranscribeProfile:
+    """文字起こしの精度と速度に関する設定."""
+
+    model_name: str  # whisper.cppのモデル名
+    fallback_model_names: tuple[str, ...] = ()  # 失敗時に利用するモデル名
+    whisper_workers: int = 1  # 同時に実行するwhisper.cppのプロセス数
+    segment_duration_threshold: float = 60.0  # 統合する話者区間の最小時間(秒)
+    split_segment_duration: float = 1.0  # 閾値を超えた後に分割する区間の長さ(秒)
+    max_segment_duration: float = 120.0  # 統合する話者区間の最大時間(秒)
+    onnx_dir: Path | None = None  # 指定した場合はONNX Runtimeで話者分離する
+    onnx_quantized: bool = False  # int8に量子化したONNXモデルを利用するかどうか
+
+
+PROFILES: dict[str, TranscribeProfile] = {
+    "accurate": TranscribeProfile(
+        model_name="large-v3", fallback_model_names=("medium",)
+    ),
+    "balanced": TranscribeProfile(
+        model_name="medium",
+        fallback_model_names=("small",),
+        whisper_workers=2,
+        segment_duration_threshold=30.0,
+        max_segment_duration=60.0,
+    ),
+    "fast": TranscribeProfile(
+        model_name="small",
+        fallback_model_names=("base",),
+        whisper_workers=4,
+        segment_duration_threshold=20.0,
+        max_segment_duration=30.0,
+        onnx_dir=Path("data/raw/onnx"),
+        onnx_quantized=True,
+    ),
+}
+
+
+class Transcriber:
+    """話者分離と文字起こしをまとめて行う.
+
+    Notes
+    -----
+    話者分離のパイプラインやwhisper.cppの実行状況(実時間係数など)はインスタンスに保持し、
+    複数回の呼び出しで再利用する。
+    `work_dir`を指定しない場合は中間ファイルを作らず、全てメモリ上で処理する。
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: "Transcriber",
+        *,
+        config_path: Path = Path("data/raw/config.yaml"),
+        whisper_cpp_path: Path = Path("whisper.cpp"),
+        device: str = "cpu",
+        profile: str | TranscribeProfile = "accurate",
+        work_dir: Path | None = None,
+        snapshot_dir: Path | None = Path("data/raw/pipeline_snapshot"),
+        governor: ThreadGovernor | None = None,
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        config_path : Path, optional
+            pyannoteのモデル設定ファイルのパス, by default Path("data/raw/config.yaml")
+
+        whisper_cpp_path : Path, optional
+            whisper.cppのパス, by default Path("whisper.cpp")
+
+        device : str, optional
+            話者分離に利用するデバイス, by default "cpu"
+
+        profile : str | TranscribeProfile, optional
+            文字起こしの設定. 文字列の場合は`PROFILES`から選択する,
+            by default "accurate"
+
+        work_dir : Path | None, optional
+            中間ファイルの出力先. Noneの場合はメモリ上で処理する, by default None
+
+        snapshot_dir : Path | None, optional
+            話者分離パイプラインのスナップショットのディレクトリ,
+            by default Path("data/raw/pipeline_snapshot")
+
+        governor : ThreadGovernor | None, optional
+            話者分離と文字起こしにスレッド数を割り当てる.
+            Noneの場合は利用可能なCPUコア数を上限として作成する, by default None
+
+        """
+        self._profile = PROFILES[profile] if isinstance(profile, str) else profile
+        governor = ThreadGovernor() if governor is None else governor
+
+        onnx_backend = None
+        onnx_dir = self._profile.onnx_dir
+        if onnx_dir is not None and device == "cpu" and onnx_dir.exists():
+            onnx_backend = OnnxDiarizationBackend(
+                model_dir=onnx_dir,
+                quantized=self._profile.onnx_quantized,
+                intra_op_num_threads=governor.total_threads,
+            )
+        elif onnx_dir is not None:
+            _logger.warning("onnx backend is not available. use torch: %s", onnx_dir)
+        self._speaker_separator = SpeakerSeparator(
+            config_path=config_path,
+            device_name=device,
+            onnx_backend=onnx_backend,
+            snapshot_dir=snapshot_dir,
+            governor=governor,
+        )
+        self._speaker_integrator = SpeakerIntegrator(
+            segment_duration_threshold=self._profile.segment_duration_threshold,
+            split_segment_duration=self._profile.split_segment_duration,
+            max_segment_duration=self._profile.max_segment_duration,
+        )
+        self._overlap_planner = OverlapPlanner(
+            max_segment_duration=self._profile.max_segment_duration
+        )
+        self._speech_to_text = SpeechToText(
+            wav_dirpath=work_dir,
+            whisper_cpp_path=whisper_cpp_path,
+            model_name=self._profile.model_name,
+            fallback_model_names=self._profile.fallback_model_names,
+            num_workers=self._profile.whisper_workers,
+            governor=governor,
+        )
+        self._speech_integrator = SpeechIntegrator()
+        self._speaker_segments: list[SpeakerSegment] = []
+
+    @property
+    def profile(self: "Transcriber") -> TranscribeProfile:
+        """文字起こしの設定."""
+        return self._profile
+
+    @property
+    def speaker_segments(self: "Transcriber") -> list[SpeakerSegment]:
+        """直前の`diarize`もしくは`transcribe`での統合前の話者分離の結果."""
+        return self._speaker_segments
+
+    @property
+    def failed_segments(self: "Transcriber") -> list[SpeakerSegment]:
+        """直前の`transcribe`で文字起こしに失敗した区間."""
+        return self._speech_to_text.failed_segments
+
+    def diarize(self: "Transcriber", audio: AudioInput) -> list[SpeakerSegment]:
+        """話者分離を行い、文字起こししやすいように統合した区間を返す."""
+        return self._diarize(AudioSource.load(audio))
+
+    def transcribe(self: "Transcriber", audio: AudioInput) -> list[SpeakerText]:
+        """話者分離と文字起こしを行う.
+
+        Parameters
+        ----------
+        audio : AudioInput
+            音声ファイルのパス、音声ファイルのバイト列、16 kHzのNumPy配列のいずれか
+
+        """
+        sound = AudioSource.load(audio)
+        segments = self._diarize(sound)
+        speaker_text = self._speech_to_text.to_text(sound=sound, segments=segments)
+        if len(speaker_text) < 1:
+            return []
+
+        return self._speech_integrator.integrate(speaker_text)
+
+    def _diarize(self: "Transcriber", sound: AudioSource) -> list[SpeakerSegment]:
+        """話者分離を行い、重なった区間を一度だけ文字起こしするようにまとめる."""
+        self._speaker_segments = list(self._speaker_separator.diarization(sound))
+        segments = self._speaker_integrator.integrate(self._speaker_segments)
+        planned_segments = self._overlap_planner.plan(segments)
+        _logger.info(
+            "overlap deduplication saved %.1f sec",
+            self._overlap_planner.saved_duration,
+        )
+
+        return planned_segments
+
+
+@cache
+def _get_transcriber(
+    device: str, profile: str | TranscribeProfile, config_path: Path
+) -> Transcriber:
+    """設定ごとにTranscriberを生成し、再利用する."""
+    _logger.info("create transcriber: device=%s, profile=%s", device, profile)
+    return Transcriber(config_path=config_path, device=device, profile=profile)
+
+
+def transcribe(
+    audio: AudioInput,
+    *,
+    device: str = "cpu",
+    profile: str | TranscribeProfile = "accurate",
+    config_path: Path = Path("data/raw/config.yaml"),
+) -> list[SpeakerText]:
+    """音声の話者分離と文字起こしを中間ファイルを作らずに行う.
+
+    Parameters
+    ----------
+    audio : AudioInput
+        音声ファイルのパス、音声ファイルのバイト列、16 kHzのNumPy配列のいずれか
+
+    device : str, optional
+        話者分離に利用するデバイス, by default "cpu"
+
+    profile : str | TranscribeProfile, optional
+        文字起こしの設定. 文字列の場合は`PROFILES`から選択する, by default "accurate"
+
+    config_path : Path, optional
+        pyannoteのモデル設定ファイルのパス, by default Path("data/raw/config.yaml")
+
+    Notes
+    -----
+    同じ設定での呼び出しでは、読み込み済みのモデルを再利用する。
+
+    """
+    transcriber = _get_transcriber(device, profile, config_path)
+
+    return transcriber.transcribe(audio)
@@ -0,0 +1,704 @@
+"""whisper.cppの実行をタイムアウト、リトライ、ヘッジ実行付きで管理するモジュール."""
+
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, ClassVar
+
+from internal.decode_monitor import DecodeMonitor, trim_silence
+from internal.run_metrics import DecodeIncident, RunMetrics
+from internal.thread_governor import ThreadGovernor
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WhisperTask:
+    """whisper.cppで文字起こしする1区間分のタスク."""
+
+    key: int  # タスクの識別子
+    duration: float  # 音声の長さ(秒)
+    load: Callable[[], bytes]  # whisper.cppに渡すwav形式の音声データを返す関数
+
+
+@dataclass
+class WhisperResult:
+    """1区間分の文字起こし結果."""
+
+    key: int  # タスクの識別子
+    text: str | None  # 文字起こし結果. 失敗した場合はNone
+    model_name: str | None  # 文字起こしに成功したモデル名
+    attempts: int  # 実行回数(ヘッジ実行は含まない)
+    errors: list[str] = field(default_factory=list)  # 失敗時のエラー内容
+
+
+class _Attempt:
+    """whisper.cppの1回分の実行."""
+
+    def __init__(  # noqa: PLR0913
+        self: "_Attempt",
+        task: WhisperTask,
+        model_name: str,
+        *,
+        hedged: bool,
+        options: Sequence[str] = (),
+        fallback_level: int = 0,
+    ) -> None:
+        self.task = task
+        self.model_name = model_name
+        self.hedged = hedged
+        self.options = list(options)  # whisper.cppに追加で渡すデコード設定
+        self.fallback_level = fallback_level
+        self.started_at = time.monotonic()
+        self.cancelled = False
+        self.timed_out = False
+        self.abort_reason: str | None = None  # 暴走を検出して中断した理由
+        self.proc: subprocess.Popen[bytes] | None = None
+        self._lock = threading.Lock()
+
+    def attach(self: "_Attempt", proc: subprocess.Popen[bytes]) -> None:
+        """実行中のプロセスを登録する. キャンセル済みの場合は即座に停止する."""
+        with self._lock:
+            self.proc = proc
+            if self.cancelled:
+                proc.kill()
+
+    def cancel(self: "_Attempt") -> None:
+        """実行を取り消す."""
+        with self._lock:
+            self.cancelled = True
+            self._kill()
+
+    def abort(self: "_Attempt", reason: str) -> None:
+        """暴走を検出した実行を中断する."""
+        with self._lock:
+            self.abort_reason = reason
+            self._kill()
+
+    def expire(self: "_Attempt") -> None:
+        """タイムアウトした実行を中断する."""
+        with self._lock:
+            self.timed_out = True
+            self._kill()
+
+    def _kill(self: "_Attempt") -> None:
+        """実行中のプロセスを停止する."""
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.kill()
+
+
+@dataclass
+class _TaskState:
+    """タスクごとの実行状況."""
+
+    task: WhisperTask
+    attempts: int = 0
+    prepared: bool = False
+    wav_filepath: Path | None = None  # 中間ファイルを利用する場合のwavファイル
+    wav_data: bytes | None = None  # 標準入力で渡す場合のwavデータ
+    hedged: bool = False
+    fallback_level: int = 0  # 暴走を検出するたびに上げるフォールバック設定の段階
+    trimmed: bool = False  # 無音を除いた音声に置き換えたかどうか
+    active: list[_Attempt] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    result: WhisperResult | None = None
+
+
+class WhisperExecutor:
+    """whisper.cppの実行をタイムアウト、リトライ、ヘッジ実行付きで管理する.
+
+    Notes
+    -----
+    - タイムアウトは音声長と観測した実時間係数(処理時間/音声長)から決める。
+    - 失敗した場合は`model_names`の後ろにあるモデル(小さいモデル)で再実行する。
+    - 空きワーカーがある場合、想定より時間のかかっている区間を重複して実行し、
+      先に終わった結果を採用する。
+    - 出力を逐次`DecodeMonitor`で監視し、繰り返しなどの暴走を検出した場合は
+      その時点で停止して、`FALLBACK_DECODE_OPTIONS`の次の段階の設定で再実行する。
+
+    """
+
+    # 暴走を検出した場合のデコード設定. (whisper.cppの引数, 無音を除くかどうか)
+    # 直前の文脈を引き継がず(-mc 0)、温度を上げる(-tp)ことで繰り返しを抜けやすくする.
+    FALLBACK_DECODE_OPTIONS: ClassVar[list[tuple[list[str], bool]]] = [
+        ([], False),
+        (["-mc", "0", "-tp", "0.4"], False),
+        (["-mc", "0", "-tp", "0.6"], True),
+    ]
+
+    def __init__(  # noqa: PLR0913
+        self: "WhisperExecutor",
+        whisper_cpp_path: Path,
+        model_names: Sequence[str],
+        *,
+        language: str = "ja",
+        num_workers: int = 1,
+        max_attempts: int = 3,
+        base_timeout: float = 120.0,
+        timeout_factor: float = 3.0,
+        initial_rtf: float = 2.0,
+        hedge_factor: float = 2.0,
+        poll_interval: float = 1.0,
+        governor: ThreadGovernor | None = None,
+        metrics: RunMetrics | None = None,
+    ) -> None:
+        """初期化処理.
+
+        Parameters
+        ----------
+        whisper_cpp_path : Path
+            whisper.cppのパス
+
+        model_names : Sequence[str]
+            利用するモデル名. 先頭から順にリトライ時のフォールバックとして利用する.
+
+        language : str, optional
+            文字起こしする言語, by default "ja"
+
+        num_workers : int, optional
+            同時に実行するwhisper.cppのプロセス数, by default 1
+
+        max_attempts : int, optional
+            1区間あたりの最大実行回数, by default 3
+
+        base_timeout : float, optional
+            モデルの読み込みなどを考慮した固定のタイムアウト時間(秒), by default 120.0
+
+        timeout_factor : float, optional
+            想定処理時間に対するタイムアウトの倍率, by default 3.0
+
+        initial_rtf : float, optional
+            実測値がない場合に利用する実時間係数, by default 2.0
+
+        hedge_factor : float, optional
+            想定処理時間の何倍を超えたらヘッジ実行するか, by default 2.0
+
+        poll_interval : float, optional
+            実行状況を確認する間隔(秒), by default 1.0
+
+        governor : ThreadGovernor | None, optional
+            指定した場合は実行ごとにスレッド数の割り当てを受け、`-t`に指定する.
+            Noneの場合はwhisper.cppの既定値を利用する, by default None
+
+        metrics : RunMetrics | None, optional
+            実行回数や暴走による中断を記録する, by default None
+
+        """
+        self._whisper_cpp_path = whisper_cpp_path.resolve()
+        self._language = language
+        self._num_workers = max(1, num_workers)
+        self._max_attempts = max(1, max_attempts)
+        self._base_timeout = base_timeout
+        self._timeout_factor = timeout_factor
+        self._initial_rtf = initial_rtf
+        self._hedge_factor = hedge_factor
+        self._poll_interval = poll_interval
+        self._governor = governor
+        self._metrics = metrics or RunMetrics()
+
+        self._model_names = [
+            name for name in model_names if self._model_filepath(name).exists()
+        ]
+        for name in model_names:
+            if name not in self._model_names:
+                _logger.warning("whisper model not found. skip: %s", name)
+        if len(self._model_names) < 1:
+            message = f"whisper model not found: {', '.join(model_names)}"
+            raise FileNotFoundError(message)
+
+        self._work_dir: Path | None = None
+        self._on_done: Callable[[WhisperTask, WhisperResult], None] | None = None
+        self._rtf: dict[str, float] = {}  # モデルごとの実時間係数(指数移動平均)
+        self._rtf_lock = threading.Lock()
+        self._re_query = re.compile(
+            r"(\[\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}])\s+(.+)"
+        )
+
+    @property
+    def metrics(self: "WhisperExecutor") -> RunMetrics:
+        """実行回数や暴走による中断の記録."""
+        return self._metrics
+
+    def observed_rtf(self: "WhisperExecutor", model_name: str) -> float | None:
+        """観測した実時間係数を取得する. 観測値がない場合はNoneを返す."""
+        with self._rtf_lock:
+            return self._rtf.get(model_name)
+
+    def timeout(
+        self: "WhisperExecutor", duration: float, model_name: str, attempt: int = 0
+    ) -> float:
+        """音声長と実時間係数からタイムアウト時間(秒)を算出する.
+
+        Parameters
+        ----------
+        duration : float
+            音声の長さ(秒)
+
+        model_name : str
+            利用するモデル名
+
+        attempt : int, optional
+            何回目の実行か(0始まり). リトライ時はタイムアウトを延長する, by default 0
+
+        """
+        rtf = self.observed_rtf(model_name) or self._initial_rtf
+        expected = duration * rtf * self._timeout_factor
+
+        return (self._base_timeout + expected) * (1 + attempt)
+
+    def run(
+        self: "WhisperExecutor",
+        tasks: Sequence[WhisperTask],
+        work_dir: Path | None = None,
+        on_done: Callable[[WhisperTask, WhisperResult], None] | None = None,
+    ) -> list[WhisperResult]:
+        """タスクを実行し、入力と同じ順序で結果を返す.
+
+        Parameters
+        ----------
+        tasks : Sequence[WhisperTask]
+            実行するタスク
+
+        work_dir : Path | None, optional
+            区間ごとのwavファイルを書き出すディレクトリ.
+            Noneの場合は中間ファイルを作らず、標準入力でwhisper.cppに渡す,
+            by default None
+
+        on_done : Callable[[WhisperTask, WhisperResult], None] | None, optional
+            タスクの結果が確定するたびに呼び出す関数, by default None
+
+        """
+        self._work_dir = work_dir
+        self._on_done = on_done
+        states = {task.key: _TaskState(task=task) for task in tasks}
+        pending = deque(tasks)
+        running: dict[Future[str], _Attempt] = {}
+
+        with ThreadPoolExecutor(max_workers=self._num_workers) as pool:
+            while len(pending) > 0 or len(running) > 0:
+                while len(pending) > 0 and len(running) < self._num_workers:
+                    state = states[pending.popleft().key]
+                    self._submit(pool, running, state, hedged=False)
+                if len(pending) < 1 and len(running) < self._num_workers:
+                    self._hedge_stragglers(pool, running, states)
+
+                done, _ = wait(
+                    running, timeout=self._poll_interval, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    attempt = running.pop(future)
+                    state = states[attempt.task.key]
+                    state.active.remove(attempt)
+                    if state.result is not None or attempt.cancelled:
+                        continue
+                    self._handle_done(future, attempt, state, pending)
+
+        return [states[task.key].result for task in tasks]  # type: ignore[misc]
+
+    def _handle_done(
+        self: "WhisperExecutor",
+        future: Future[str],
+        attempt: _Attempt,
+        state: _TaskState,
+        pending: deque[WhisperTask],
+    ) -> None:
+        """終了した実行の結果を処理する."""
+        task = state.task
+        try:
+            text = future.result()
+        except Exception as e:  # noqa: BLE001
+            self._record_incident(attempt, state)
+            state.errors.append(f"{attempt.model_name}: {e!r}")
+            _logger.warning(
+                "whisper failed (attempt %d/%d, model=%s, hedged=%s): %r",
+                state.attempts,
+                self._max_attempts,
+                attempt.model_name,
+                attempt.hedged,
+                e,
+            )
+            if len(state.active) > 0:
+                return  # 重複実行中のものがあれば結果を待つ
+            if state.attempts < self._max_attempts:
+                state.hedged = False
+                pending.appendleft(task)
+                return
+            self._metrics.count("whisper_failed")
+            state.result = WhisperResult(
+                key=task.key,
+                text=None,
+                model_name=None,
+                attempts=state.attempts,
+                errors=state.errors,
+            )
+            self._release(state)
+            self._notify(state)
+            return
+
+        elapsed = time.monotonic() - attempt.started_at
+        self._update_rtf(attempt.model_name, elapsed, task.duration)
+        for sibling in state.active:
+            sibling.cancel()
+        self._metrics.count("whisper_succeeded")
+        state.result = WhisperResult(
+            key=task.key,
+            text=text,
+            model_name=attempt.model_name,
+            attempts=state.attempts,
+            errors=state.errors,
+        )
+        if attempt.hedged:
+            _logger.info("hedged whisper run won: key=%d", task.key)
+        self._release(state)
+        self._notify(state)
+
+    def _record_incident(
+        self: "WhisperExecutor", attempt: _Attempt, state: _TaskState
+    ) -> None:
+        """暴走の検出やタイムアウトによる中断を記録する."""
+        if attempt.abort_reason is not None:
+            kind, reason = "abort", attempt.abort_reason
+            # 次の実行では繰り返しを抜けやすい設定を利用する
+            state.fallback_level = min(
+                max(state.fallback_level, attempt.fallback_level + 1),
+                len(self.FALLBACK_DECODE_OPTIONS) - 1,
+            )
+        elif attempt.timed_out:
+            kind, reason = "timeout", "timeout"
+        else:
+            return
+
+        self._metrics.record_incident(
+            DecodeIncident(
+                key=attempt.task.key,
+                model_name=attempt.model_name,
+                kind=kind,
+                reason=reason,
+                duration=attempt.task.duration,
+                elapsed=time.monotonic() - attempt.started_at,
+                fallback_level=attempt.fallback_level,
+            )
+        )
+        _logger.warning(
+            "whisper %s: key=%d, model=%s, %s",
+            kind,
+            attempt.task.key,
+            attempt.model_name,
+            reason,
+        )
+
+    def _hedge_stragglers(
+        self: "WhisperExecutor",
+        pool: ThreadPoolExecutor,
+        running: dict[Future[str], _Attempt],
+        states: dict[int, _TaskState],
+    ) -> None:
+        """空きワーカーで想定より遅れている区間を重複実行する."""
+        now = time.monotonic()
+        candidates: list[tuple[float, _Attempt]] = []
+        for attempt in running.values():
+            state = states[attempt.task.key]
+            rtf = self.observed_rtf(attempt.model_name)
+            if state.hedged or rtf is None:
+                continue
+            expected = max(attempt.task.duration * rtf, self._poll_interval)
+            ratio = (now - attempt.started_at) / expected
+            if ratio > self._hedge_factor:
+                candidates.append((ratio, attempt))
+
+        candidates.sort(key=lambda v: v[0], reverse=True)
+        for _, attempt in candidates[: self._num_workers - len(running)]:
+            state = states[attempt.task.key]
+            _logger.info(
+                "hedge straggler: key=%d, elapsed=%.1f s",
+                attempt.task.key,
+                now - attempt.started_at,
+            )
+            self._submit(pool, running, state, hedged=True, model=attempt.model_name)
+
+    def _submit(  # noqa: PLR0913
+        self: "WhisperExecutor",
+        pool: ThreadPoolExecutor,
+        running: dict[Future[str], _Attempt],
+        state: _TaskState,
+        *,
+        hedged: bool,
+        model: str | None = None,
+    ) -> None:
+        """whisper.cppの実行を登録する.
+
+        Notes
+        -----
+        区間の音声を取得できない場合(長さが0の区間など)は実行せず、
+        失敗した結果として確定する。
+
+        """
+        task = state.task
+        if not state.prepared:
+            try:
+                wav_data = task.load()
+            except Exception as e:  # noqa: BLE001
+                _logger.warning("failed to load audio: key=%d, %r", task.key, e)
+                state.errors.append(f"load: {e!r}")
+                self._metrics.count("whisper_failed")
+                state.result = WhisperResult(
+                    key=task.key,
+                    text=None,
+                    model_name=None,
+                    attempts=state.attempts,
+                    errors=state.errors,
+                )
+                self._notify(state)
+                return
+            if self._work_dir is None:
+                state.wav_data = wav_data
+            else:
+                state.wav_filepath = self._work_dir / f"segment_{task.key:05d}.wav"
+                state.wav_filepath.write_bytes(wav_data)
+            state.prepared = True
+
+        if hedged:
+            state.hedged = True
+            attempt_index = max(state.attempts - 1, 0)
+        else:
+            attempt_index = state.attempts
+            state.attempts += 1
+        model_name = (
+            model or self._model_names[min(attempt_index, len(self._model_names) - 1)]
+        )
+        options, trim = self.FALLBACK_DECODE_OPTIONS[state.fallback_level]
+        if trim and not state.trimmed:
+            self._trim(state)
+
+        attempt = _Attempt(
+            task,
+            model_name,
+            hedged=hedged,
+            options=options,
+            fallback_level=state.fallback_level,
+        )
+        self._metrics.count("whisper_attempts")
+        timeout = self.timeout(task.duration, model_name, attempt_index)
+        state.active.append(attempt)
+        future = pool.submit(
+            self._run_attempt, attempt, timeout, state.wav_filepath, state.wav_data
+        )
+        running[future] = attempt
+
+    def _trim(self: "WhisperExecutor", state: _TaskState) -> None:
+        """区間の音声を無音を除いたものに置き換える."""
+        if state.wav_filepath is None:
+            state.wav_data = trim_silence(state.wav_data or b"")
+        else:
+            trimmed = trim_silence(state.wav_filepath.read_bytes())
+            state.wav_filepath.unlink(missing_ok=True)
+            state.wav_filepath = state.wav_filepath.with_name(
+                f"segment_{state.task.key:05d}_trimmed.wav"
+            )
+            state.wav_filepath.write_bytes(trimmed)
+        state.trimmed = True
+        _logger.info("trim silence for retry: key=%d", state.task.key)
+
+    def _notify(self: "WhisperExecutor", state: _TaskState) -> None:
+        """タスクの結果の確定を通知する."""
+        if self._on_done is not None and state.result is not None:
+            self._on_done(state.task, state.result)
+
+    def _release(self: "WhisperExecutor", state: _TaskState) -> None:
+        """完了したタスクの音声データを解放する."""
+        if state.wav_filepath is not None:
+            state.wav_filepath.unlink(missing_ok=True)
+        state.wav_data = None
+
+    def _run_attempt(
+        self: "WhisperExecutor",
+        attempt: _Attempt,
+        timeout: float,
+        wav_filepath: Path | None,
+        wav_data: bytes | None,
+    ) -> str:
+        """whisper.cppを1回実行する.
+
+        Notes
+        -----
+        wav_filepathがNoneの場合は、wav_dataを標準入力から渡す。
+
+        """
+        if self._governor is None:
+            return self._run_process(attempt, timeout, wav_filepath, wav_data, [])
+
+        with self._governor.lease(
+            "whisper", max_threads=self._governor.share(self._num_workers)
+        ) as lease:
+            thread_args = ["-t", str(lease.num_threads)]
+            return self._run_process(
+                attempt,
+                timeout,
+                wav_filepath,
+                wav_data,
+                thread_args,
+                prefix=self._governor.command_prefix(lease),
+            )
+
+    def _run_process(  # noqa: PLR0913
+        self: "WhisperExecutor",
+        attempt: _Attempt,
+        timeout: float,
+        wav_filepath: Path | None,
+        wav_data: bytes | None,
+        thread_args: list[str],
+        *,
+        prefix: Sequence[str] = (),
+    ) -> str:
+        """whisper.cppのプロセスを起動し、出力からテキストを抽出する."""
+        command_args = [
+            *prefix,
+            str(self._whisper_cpp_path / "main"),
+            "-m",
+            str(self._model_filepath(attempt.model_name)),
+            "-l",
+            self._language,
+            "-f",
+            "-" if wav_filepath is None else str(wav_filepath),
+            *thread_args,
+            *attempt.options,
+        ]
+        env = {
+            **os.environ,
+            "PATH": f"{self._whisper_cpp_path}/.venv/bin:{os.environ.get('PATH')}",
+        }
+        proc = subprocess.Popen(
+            command_args,  # noqa: S603
+            stdin=subprocess.DEVNULL if wav_filepath is not None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+        )
+        attempt.attach(proc)
+
+        # 標準出力を1行ずつ読みながら監視するため、標準入力と標準エラー出力は
+        # 別スレッドで読み書きする
+        stderr_chunks: list[bytes] = []
+        threads = [
+            threading.Thread(
+                target=_read_stream, args=(proc.stderr, stderr_chunks), daemon=True
+            )
+        ]
+        if wav_filepath is None:
+            threads.append(
+                threading.Thread(
+                    target=_write_stdin, args=(proc, wav_data or b""), daemon=True
+                )
+            )
+        for thread in threads:
+            thread.start()
+        timer = threading.Timer(timeout, attempt.expire)
+        timer.start()
+        lines: list[str] = []
+        try:
+            lines = self._monitor_output(attempt, proc)
+            proc.wait()
+        finally:
+            timer.cancel()
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            for thread in threads:
+                thread.join()
+
+        if attempt.cancelled:
+            message = "whisper run cancelled."
+            raise RuntimeError(message)
+        if attempt.abort_reason is not None:
+            message = f"whisper decode aborted: {attempt.abort_reason}"
+            raise RuntimeError(message)
+        if attempt.timed_out:
+            raise subprocess.TimeoutExpired(command_args, timeout)
+        if proc.returncode != 0:
+            _logger.error("command failed with exit status %d", proc.returncode)
+            _logger.error(b"".join(stderr_chunks).decode("utf-8", errors="replace"))
+
+            message = "speech to text error."
+            raise ValueError(message)
+
+        return self._parse_output("".join(lines))
+
+    def _monitor_output(
+        self: "WhisperExecutor", attempt: _Attempt, proc: subprocess.Popen[bytes]
+    ) -> list[str]:
+        """whisper.cppの標準出力を1行ずつ読み込み、暴走を検出したら停止する."""
+        monitor = DecodeMonitor(attempt.task.duration)
+        lines: list[str] = []
+        for raw_line in proc.stdout:  # type: ignore[union-attr]
+            line = raw_line.decode("utf-8", errors="replace")
+            lines.append(line)
+            match = self._re_query.search(line)
+            if match is None or attempt.abort_reason is not None:
+                continue
+            reason = monitor.feed(_parse_end_time(match.group(1)), match.group(2))
+            if reason is not None:
+                attempt.abort(reason)
+
+        return lines
+
+    def _parse_output(self: "WhisperExecutor", result: str) -> str:
+        """whisper.cppの出力からテキスト部分を抽出する."""
+        match_list: list[str] = []
+        num_split = 2  # regexで分割した場合に2個に分割されることを期待している
+        for line in result.splitlines():
+            line_str = self._re_query.search(line)
+            if line_str is None:
+                continue
+            if len(line_str.groups()) != num_split:
+                _logger.warning("skip match string: num=%d", len(line_str.groups()))
+                continue
+            match_list.append(line_str.group(2))
+
+        return " ".join(match_list)
+
+    def _model_filepath(self: "WhisperExecutor", model_name: str) -> Path:
+        """モデルファイルのパスを取得する."""
+        return self._whisper_cpp_path / f"models/ggml-{model_name}.bin"
+
+    def _update_rtf(
+        self: "WhisperExecutor", model_name: str, elapsed: float, duration: float
+    ) -> None:
+        """実時間係数の指数移動平均を更新する."""
+        if duration <= 0:
+            return
+        sample = elapsed / duration
+        alpha = 0.3
+        with self._rtf_lock:
+            current = self._rtf.get(model_name)
+            self._rtf[model_name] = (
+                sample if current is None else (1 - alpha) * current + alpha * sample
+            )
+
+
+def _read_stream(stream: IO[bytes], chunks: list[bytes]) -> None:
+    """ストリームを終端まで読み込む."""
+    chunks.append(stream.read())
+
+
+def _write_stdin(proc: subprocess.Popen[bytes], data: bytes) -> None:
+    """whisper.cppの標準入力に音声データを書き込む."""
+    # 中断などでプロセスが先に終了した場合は書き込めない
+    with suppress(OSError):
+        proc.stdin.write(data)  # type: ignore[union-attr]
+        proc.stdin.close()  # type: ignore[union-attr]
+
+
+def _parse_end_time(timestamps: str) -> float:
+    """whisper.cppの"[00:00:00.000 --> 00:00:05.000]"から終了時刻(秒)を取得する."""
+    hours, minutes, seconds = timestamps.strip("[]").split("-->")[1].split(":")
+
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
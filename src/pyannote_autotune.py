@@ -0,0 +1,267 @@
+"""話者分離パイプラインのバッチサイズごとの処理速度とメモリ使用量を計測し、保存する."""
+
+import logging
+import sys
+from argparse import ArgumentParser
+from logging import Formatter, StreamHandler
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+import torch
+from internal import (
+    AudioSource,
+    BatchAutotuner,
+    BatchSettingFile,
+    OnnxDiarizationBackend,
+    PipelineSnapshot,
+    batch_setting_key,
+    parse_size,
+    select_batch_setting,
+)
+from pyannote.audio import Pipeline
+from pydantic import BaseModel
+
+_logger = logging.getLogger(__name__)
+
+
+class _RunConfig(BaseModel):
+    """スクリプト実行のためのオプション."""
+
+    filepath: Path  # 計測に利用する音源
+    config_path: Path  # pyannoteのモデル設定ファイルのパス
+    pipeline_snapshot: Path  # 話者分離パイプラインのスナップショットのディレクトリ
+    output_dir: Path  # 計測結果の保存先ディレクトリ
+    device: str  # デバイス
+    diarization_backend: str  # 話者分離のモデル推論に利用するバックエンド
+    onnx_dir: Path  # ONNXモデルのディレクトリ
+    onnx_quantized: bool  # int8に量子化したONNXモデルを利用するかどうか
+    threads: int  # 計測で利用するスレッド数. 0の場合は変更しない
+
+    batch_sizes: list[int]  # 計測するバッチサイズ
+    sample_duration: float  # 計測に利用する音声の長さ(秒)
+    rss_limit: int | None  # メモリ使用量の上限(バイト)
+    repeat: int  # バッチサイズごとの計測回数
+
+    verbose: int  # ログレベル
+
+
+def _main() -> None:
+    """スクリプトのエントリポイント."""
+    # 実行時引数の読み込み
+    config = _parse_args()
+
+    # ログ設定
+    loglevel = {
+        0: logging.ERROR,
+        1: logging.WARNING,
+        2: logging.INFO,
+        3: logging.DEBUG,
+    }.get(config.verbose, logging.DEBUG)
+    script_filepath = Path(__file__)
+    log_filepath = Path("data/interim") / f"{script_filepath.stem}.log"
+    log_filepath.parent.mkdir(exist_ok=True)
+    _setup_logger(log_filepath, loglevel=loglevel)
+    _logger.info(config)
+
+    # 実行時と同じ方法でパイプラインを読み込む
+    if config.threads > 0:
+        torch.set_num_threads(config.threads)
+    pipeline = PipelineSnapshot(config.pipeline_snapshot).load(config.config_path)
+    if pipeline is None:
+        pipeline = Pipeline.from_pretrained(config.config_path)
+    if config.diarization_backend == "onnx":
+        pipeline = OnnxDiarizationBackend(
+            model_dir=config.onnx_dir,
+            quantized=config.onnx_quantized,
+            intra_op_num_threads=config.threads,
+        ).attach(pipeline)
+    else:
+        pipeline.to(torch.device(config.device))
+
+    # 計測に利用する音声
+    source = AudioSource.from_file(config.filepath)
+    num_samples = int(config.sample_duration * source.sample_rate)
+    source = AudioSource(source.samples[:num_samples])
+
+    # 計測
+    measurements = BatchAutotuner(
+        pipeline,
+        candidates=config.batch_sizes,
+        rss_limit=config.rss_limit,
+        repeat=config.repeat,
+    ).measure(source.to_pyannote(), source.duration)
+    setting_file = BatchSettingFile(config.output_dir)
+    setting_file.save(
+        batch_setting_key(config.diarization_backend, config.device),
+        measurements,
+        threads=torch.get_num_threads(),
+        sample_duration=source.duration,
+    )
+    _logger.info("saved: %s", setting_file.filepath)
+
+    best = select_batch_setting(measurements, rss_limit=config.rss_limit)
+    sys.stdout.write(
+        "\n".join(
+            [
+                f"audio duration: {source.duration:.1f} s, "
+                f"threads: {torch.get_num_threads()}",
+                "step         batch  time [s]  speed [x]  peak rss [MB]",
+                *[
+                    f"{v.step:<12} {v.batch_size:>5} {v.elapsed:>9.2f} "
+                    f"{v.throughput:>10.1f} {v.peak_rss / 1024**2:>14.1f}"
+                    for v in measurements
+                ],
+                f"selected: {best}",
+                "",
+            ]
+        )
+    )
+
+
+def _parse_args() -> _RunConfig:
+    """スクリプト実行のための引数を読み込む."""
+    parser = ArgumentParser(
+        description=(
+            "話者分離パイプラインのバッチサイズごとの処理速度とメモリ使用量を計測し、"
+            "ホストごとに保存する."
+        )
+    )
+
+    parser.add_argument("filepath", help="計測に利用する音源のファイルパス.")
+    parser.add_argument(
+        "--config-path",
+        type=Path,
+        default=Path("data/raw/config.yaml"),
+        help="pyannoteのモデル設定ファイルのパス.",
+    )
+    parser.add_argument(
+        "--pipeline-snapshot",
+        type=Path,
+        default=Path("data/raw/pipeline_snapshot"),
+        help="pyannote_download_model.py --snapshotで保存したパイプライン.",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=Path("data/raw/autotune"),
+        help="計測結果の保存先ディレクトリ. ホスト名ごとのjsonに保存する.",
+    )
+    parser.add_argument(
+        "-d",
+        "--device",
+        default="cpu",
+        choices=["cpu", "cuda", "mps"],
+        help="話者分離に利用するデバイス.",
+    )
+    parser.add_argument(
+        "--diarization-backend",
+        default="torch",
+        choices=["torch", "onnx"],
+        help="話者分離のモデル推論に利用するバックエンド. onnxはCPUのみ.",
+    )
+    parser.add_argument(
+        "--onnx-dir",
+        type=Path,
+        default=Path("data/raw/onnx"),
+        help="pyannote_export_onnx.pyで変換したONNXモデルのディレクトリ.",
+    )
+    parser.add_argument(
+        "--onnx-quantized",
+        action="store_true",
+        help="int8に量子化したONNXモデルを利用する.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=0,
+        help="計測で利用するスレッド数. 実行時の--threadsに合わせる. 0の場合は自動.",
+    )
+
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16, 32],
+        help="計測するバッチサイズ.",
+    )
+    parser.add_argument(
+        "--sample-duration",
+        type=float,
+        default=300.0,
+        help="計測に利用する音声の長さ(秒). 音源の先頭から切り出す.",
+    )
+    parser.add_argument(
+        "--rss-limit",
+        type=parse_size,
+        default=None,
+        help="メモリ使用量の上限(例: 8G). 超えた場合は大きいバッチサイズを計測しない.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="バッチサイズごとの計測回数. 最も速い結果を利用する.",
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="詳細メッセージのレベルを設定.",
+    )
+
+    args = parser.parse_args()
+
+    return _RunConfig(**vars(args))
+
+
+def _setup_logger(
+    filepath: Path | None,  # ログ出力するファイルパス. Noneの場合はファイル出力しない.
+    loglevel: int,  # 出力するログレベル
+) -> None:
+    """ログ出力設定.
+
+    Notes
+    -----
+    ファイル出力とコンソール出力を行うように設定する。
+
+    """
+    lib_logger = logging.getLogger("internal")
+
+    _logger.setLevel(loglevel)
+    lib_logger.setLevel(loglevel)
+
+    # consoleログ
+    console_handler = StreamHandler()
+    console_handler.setLevel(loglevel)
+    console_handler.setFormatter(
+        Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+    )
+    _logger.addHandler(console_handler)
+    lib_logger.addHandler(console_handler)
+
+    # ファイル出力するログ
+    # 基本的に大量に利用することを想定していないので、ログファイルは多くは残さない。
+    if filepath is not None:
+        file_handler = RotatingFileHandler(
+            filepath,
+            encoding="utf-8",
+            mode="a",
+            maxBytes=10 * 1024 * 1024,  # 10 MB
+            backupCount=1,
+        )
+        file_handler.setLevel(loglevel)
+        file_handler.setFormatter(
+            Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+        )
+        _logger.addHandler(file_handler)
+        lib_logger.addHandler(file_handler)
+
+
+if __name__ == "__main__":
+    try:
+        _main()
+    except Exception:
+        _logger.exception("Exception")
+        sys.exit(1)
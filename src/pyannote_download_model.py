@@ -12,6 +12,7 @@ from pathlib import Path
 
 import yaml
 from huggingface_hub import hf_hub_download, snapshot_download
+from internal import PipelineSnapshot
 
 _logger = logging.getLogger(__name__)
 
@@ -20,6 +21,10 @@ _logger = logging.getLogger(__name__)
 class _RunConfig:
     """スクリプト実行のためのオプション."""
 
+    snapshot: bool  # 初期化済みのパイプラインのスナップショットを保存するかどうか
+    snapshot_only: bool  # ダウンロードせずにスナップショットのみを保存するかどうか
+    snapshot_dir: Path  # スナップショットの保存先
+
     verbose: int  # ログレベル
 
 
@@ -41,6 +46,18 @@ def _main() -> None:
     _setup_logger(log_filepath, loglevel=loglevel)
     _logger.info(config)
 
+    dst_config_path = Path("data/raw/config.yaml")
+    if not config.snapshot_only:
+        _download(dst_config_path)
+
+    # 初期化済みのパイプラインの保存
+    if config.snapshot or config.snapshot_only:
+        PipelineSnapshot(config.snapshot_dir).save(dst_config_path)
+        _logger.info("save pipeline snapshot to %s", config.snapshot_dir)
+
+
+def _download(dst_config_path: Path) -> None:
+    """モデルをダウンロードし、ダウンロードしたモデルを参照する設定ファイルを作成する."""
     # hugging faceのtoken取得
     hf_token = os.environ.get("HUGGINGFACE_ACCESS_TOKEN", None)
     if hf_token is None:
@@ -53,7 +70,6 @@ def _main() -> None:
         filename="config.yaml",
         token=hf_token,
     )
-    dst_config_path = Path("data/raw/config.yaml")
     shutil.copy(src_config_path, dst_config_path)
     _logger.info("copy config.yaml to %s", dst_config_path)
 
@@ -83,6 +99,22 @@ def _parse_args() -> _RunConfig:
         description="pyannote-audio v3を利用するために必要なモデルをダウンロードする."
     )
 
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="ダウンロード後に初期化済みのパイプラインを高速に読み込める形式で保存する.",
+    )
+    parser.add_argument(
+        "--snapshot-only",
+        action="store_true",
+        help="ダウンロード済みのモデルからスナップショットのみを保存する.",
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        type=Path,
+        default=Path("data/raw/pipeline_snapshot"),
+        help="スナップショットの保存先ディレクトリ.",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -0,0 +1,137 @@
+"""話者分離に利用するpyannoteのモデルをONNX形式に変換する."""
+
+import logging
+import sys
+from argparse import ArgumentParser
+from logging import Formatter, StreamHandler
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from internal import OnnxModelExporter
+from pyannote.audio import Pipeline
+from pydantic import BaseModel
+
+_logger = logging.getLogger(__name__)
+
+
+class _RunConfig(BaseModel):
+    """スクリプト実行のためのオプション."""
+
+    config_path: Path  # pyannoteのモデル設定ファイルのパス
+    output_dir: Path  # ONNXモデルの保存先ディレクトリ
+    quantize: bool  # int8に量子化したモデルも保存するかどうか
+
+    verbose: int  # ログレベル
+
+
+def _main() -> None:
+    """スクリプトのエントリポイント."""
+    # 実行時引数の読み込み
+    config = _parse_args()
+
+    # ログ設定
+    loglevel = {
+        0: logging.ERROR,
+        1: logging.WARNING,
+        2: logging.INFO,
+        3: logging.DEBUG,
+    }.get(config.verbose, logging.DEBUG)
+    script_filepath = Path(__file__)
+    log_filepath = Path("data/interim") / f"{script_filepath.stem}.log"
+    log_filepath.parent.mkdir(exist_ok=True)
+    _setup_logger(log_filepath, loglevel=loglevel)
+    _logger.info(config)
+
+    # モデルの変換
+    pipeline = Pipeline.from_pretrained(config.config_path)
+    exporter = OnnxModelExporter(output_dir=config.output_dir)
+    for filepath in exporter.export(pipeline, quantize=config.quantize):
+        _logger.info("saved: %s", filepath)
+
+
+def _parse_args() -> _RunConfig:
+    """スクリプト実行のための引数を読み込む."""
+    parser = ArgumentParser(
+        description="話者分離に利用するpyannoteのモデルをONNX形式に変換する."
+    )
+
+    parser.add_argument(
+        "--config-path",
+        type=Path,
+        default=Path("data/raw/config.yaml"),
+        help="pyannoteのモデル設定ファイルのパス.",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=Path("data/raw/onnx"),
+        help="ONNXモデルの保存先ディレクトリ.",
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="int8に量子化したモデルも保存する.",
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="詳細メッセージのレベルを設定.",
+    )
+
+    args = parser.parse_args()
+
+    return _RunConfig(**vars(args))
+
+
+def _setup_logger(
+    filepath: Path | None,  # ログ出力するファイルパス. Noneの場合はファイル出力しない.
+    loglevel: int,  # 出力するログレベル
+) -> None:
+    """ログ出力設定.
+
+    Notes
+    -----
+    ファイル出力とコンソール出力を行うように設定する。
+
+    """
+    lib_logger = logging.getLogger("internal")
+
+    _logger.setLevel(loglevel)
+    lib_logger.setLevel(loglevel)
+
+    # consoleログ
+    console_handler = StreamHandler()
+    console_handler.setLevel(loglevel)
+    console_handler.setFormatter(
+        Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+    )
+    _logger.addHandler(console_handler)
+    lib_logger.addHandler(console_handler)
+
+    # ファイル出力するログ
+    # 基本的に大量に利用することを想定していないので、ログファイルは多くは残さない。
+    if filepath is not None:
+        file_handler = RotatingFileHandler(
+            filepath,
+            encoding="utf-8",
+            mode="a",
+            maxBytes=10 * 1024 * 1024,  # 10 MB
+            backupCount=1,
+        )
+        file_handler.setLevel(loglevel)
+        file_handler.setFormatter(
+            Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+        )
+        _logger.addHandler(file_handler)
+        lib_logger.addHandler(file_handler)
+
+
+if __name__ == "__main__":
+    try:
+        _main()
+    except Exception:
+        _logger.exception("Exception")
+        sys.exit(1)
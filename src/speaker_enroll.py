@@ -0,0 +1,146 @@
+"""処理済みの音源で分離した話者を、話者名とともに登録する."""
+
+import logging
+import sys
+from argparse import ArgumentParser
+from logging import Formatter, StreamHandler
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from internal import SpeakerEmbeddingFile, SpeakerRegistry
+from pydantic import BaseModel
+
+_logger = logging.getLogger(__name__)
+
+
+class _RunConfig(BaseModel):
+    """スクリプト実行のためのオプション."""
+
+    filepath: Path  # 処理済みの音源
+    speakers: list[str]  # "SPEAKER_00=名前"形式の登録する話者
+    speaker_registry: Path  # 話者登録情報のディレクトリ
+
+    verbose: int  # ログレベル
+
+
+def _main() -> None:
+    """スクリプトのエントリポイント."""
+    # 実行時引数の読み込み
+    config = _parse_args()
+
+    # ログ設定
+    loglevel = {
+        0: logging.ERROR,
+        1: logging.WARNING,
+        2: logging.INFO,
+        3: logging.DEBUG,
+    }.get(config.verbose, logging.DEBUG)
+    script_filepath = Path(__file__)
+    log_filepath = Path("data/interim") / f"{script_filepath.stem}.log"
+    log_filepath.parent.mkdir(exist_ok=True)
+    _setup_logger(log_filepath, loglevel=loglevel)
+    _logger.info(config)
+
+    # 話者分離時の埋め込みベクトルの読み込み
+    interim_dir = Path("data/interim") / config.filepath.stem
+    embeddings = SpeakerEmbeddingFile(
+        filepath=(interim_dir / "speaker_embedding.npz")
+    ).get_embeddings()
+    if len(embeddings) < 1:
+        message = f"speaker embedding not found: {interim_dir!s}"
+        raise FileNotFoundError(message)
+
+    # 話者の登録
+    registry = SpeakerRegistry(dirpath=config.speaker_registry)
+    for speaker in config.speakers:
+        label, sep, name = speaker.partition("=")
+        if sep == "" or name == "":
+            message = f"invalid speaker format. use LABEL=NAME: {speaker}"
+            raise ValueError(message)
+        if label not in embeddings:
+            message = f"speaker label not found: {label}"
+            raise ValueError(message)
+        registry.enroll(name, embeddings[label])
+
+
+def _parse_args() -> _RunConfig:
+    """スクリプト実行のための引数を読み込む."""
+    parser = ArgumentParser(
+        description="処理済みの音源で分離した話者を、話者名とともに登録する."
+    )
+
+    parser.add_argument("filepath", help="処理済みの音源のファイルパス.")
+    parser.add_argument(
+        "speakers",
+        nargs="+",
+        help="登録する話者. SPEAKER_00=名前 の形式で指定する.",
+    )
+    parser.add_argument(
+        "--speaker-registry",
+        type=Path,
+        default=Path("data/raw/speaker_registry"),
+        help="話者登録情報のディレクトリ.",
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="詳細メッセージのレベルを設定.",
+    )
+
+    args = parser.parse_args()
+
+    return _RunConfig(**vars(args))
+
+
+def _setup_logger(
+    filepath: Path | None,  # ログ出力するファイルパス. Noneの場合はファイル出力しない.
+    loglevel: int,  # 出力するログレベル
+) -> None:
+    """ログ出力設定.
+
+    Notes
+    -----
+    ファイル出力とコンソール出力を行うように設定する。
+
+    """
+    lib_logger = logging.getLogger("internal")
+
+    _logger.setLevel(loglevel)
+    lib_logger.setLevel(loglevel)
+
+    # consoleログ
+    console_handler = StreamHandler()
+    console_handler.setLevel(loglevel)
+    console_handler.setFormatter(
+        Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+    )
+    _logger.addHandler(console_handler)
+    lib_logger.addHandler(console_handler)
+
+    # ファイル出力するログ
+    # 基本的に大量に利用することを想定していないので、ログファイルは多くは残さない。
+    if filepath is not None:
+        file_handler = RotatingFileHandler(
+            filepath,
+            encoding="utf-8",
+            mode="a",
+            maxBytes=10 * 1024 * 1024,  # 10 MB
+            backupCount=1,
+        )
+        file_handler.setLevel(loglevel)
+        file_handler.setFormatter(
+            Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+        )
+        _logger.addHandler(file_handler)
+        lib_logger.addHandler(file_handler)
+
+
+if __name__ == "__main__":
+    try:
+        _main()
+    except Exception:
+        _logger.exception("Exception")
+        sys.exit(1)
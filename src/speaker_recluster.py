@@ -0,0 +1,197 @@
+"""保存済みの話者分離の途中結果から、話者数などを指定してクラスタリングをやり直す."""
+
+import logging
+import sys
+from argparse import ArgumentParser
+from logging import Formatter, StreamHandler
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from internal import (
+    DiarizationCacheFile,
+    SpeakerEmbeddingFile,
+    SpeakerSegmentFile,
+    SpeakerSeparator,
+    SpeechTextFile,
+    lock_recording,
+)
+from pydantic import BaseModel
+
+_logger = logging.getLogger(__name__)
+
+
+class _RunConfig(BaseModel):
+    """スクリプト実行のためのオプション."""
+
+    filepath: Path  # 処理済みの音源
+    device: str  # デバイス
+
+    num_speakers: int | None  # 話者数
+    min_speakers: int | None  # 話者数の下限
+    max_speakers: int | None  # 話者数の上限
+    clustering_threshold: float | None  # クラスタリングの閾値
+    min_cluster_size: int | None  # クラスタの最小サイズ
+
+    verbose: int  # ログレベル
+
+
+def _main() -> None:
+    """スクリプトのエントリポイント."""
+    # 実行時引数の読み込み
+    config = _parse_args()
+
+    # ログ設定
+    loglevel = {
+        0: logging.ERROR,
+        1: logging.WARNING,
+        2: logging.INFO,
+        3: logging.DEBUG,
+    }.get(config.verbose, logging.DEBUG)
+    script_filepath = Path(__file__)
+    log_filepath = Path("data/interim") / f"{script_filepath.stem}.log"
+    log_filepath.parent.mkdir(exist_ok=True)
+    _setup_logger(log_filepath, loglevel=loglevel)
+    _logger.info(config)
+
+    # 話者分離の途中結果の読み込み
+    interim_dir = Path("data/interim") / config.filepath.stem
+    with lock_recording(interim_dir):
+        cache = DiarizationCacheFile(
+            filepath=(interim_dir / "speaker_diarization_cache.npz")
+        ).get_cache()
+        if cache is None:
+            message = f"diarization cache not found: {interim_dir!s}"
+            raise FileNotFoundError(message)
+
+        # クラスタリングのやり直し
+        speaker_separator = SpeakerSeparator(
+            config_path=Path("data/raw/config.yaml"),
+            device_name=config.device,
+            snapshot_dir=Path("data/raw/pipeline_snapshot"),
+        )
+        speaker_segments = list(
+            speaker_separator.recluster(
+                cache,
+                num_speakers=config.num_speakers,
+                min_speakers=config.min_speakers,
+                max_speakers=config.max_speakers,
+                clustering_threshold=config.clustering_threshold,
+                min_cluster_size=config.min_cluster_size,
+            )
+        )
+        speakers = {segment.speaker_name for segment in speaker_segments}
+        _logger.info("num speakers: %d", len(speakers))
+
+        SpeakerSegmentFile(filepath=(interim_dir / "speaker_segment.npz")).save(
+            speaker_segments
+        )
+        SpeakerEmbeddingFile(filepath=(interim_dir / "speaker_embedding.npz")).save(
+            speaker_separator.speaker_embeddings
+        )
+
+        # 話者区間に依存する後段の結果は作り直す
+        SpeakerSegmentFile(
+            filepath=(interim_dir / "speaker_segment_integrate.npz")
+        ).clean()
+        SpeakerSegmentFile(filepath=(interim_dir / "speech_text_failed.npz")).clean()
+        SpeechTextFile(filepath=(interim_dir / "speech_text.npz")).clean()
+        SpeechTextFile(filepath=(interim_dir / "speech_integrate_text.npz")).clean()
+
+
+def _parse_args() -> _RunConfig:
+    """スクリプト実行のための引数を読み込む."""
+    parser = ArgumentParser(
+        description=(
+            "保存済みの話者分離の途中結果から、話者数などを指定してクラスタリングをやり直す."
+        )
+    )
+
+    parser.add_argument("filepath", help="処理済みの音源のファイルパス.")
+    parser.add_argument(
+        "-d",
+        "--device",
+        default="cpu",
+        choices=["cpu", "cuda", "mps"],
+        help="話者分離に利用するデバイス.",
+    )
+
+    parser.add_argument(
+        "--num-speakers", type=int, default=None, help="話者数が分かっている場合に指定."
+    )
+    parser.add_argument("--min-speakers", type=int, default=None, help="話者数の下限.")
+    parser.add_argument("--max-speakers", type=int, default=None, help="話者数の上限.")
+    parser.add_argument(
+        "--clustering-threshold",
+        type=float,
+        default=None,
+        help="クラスタリングの閾値. 小さいほど話者が多く分離される.",
+    )
+    parser.add_argument(
+        "--min-cluster-size",
+        type=int,
+        default=None,
+        help="クラスタの最小サイズ.",
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="詳細メッセージのレベルを設定.",
+    )
+
+    args = parser.parse_args()
+
+    return _RunConfig(**vars(args))
+
+
+def _setup_logger(
+    filepath: Path | None,  # ログ出力するファイルパス. Noneの場合はファイル出力しない.
+    loglevel: int,  # 出力するログレベル
+) -> None:
+    """ログ出力設定.
+
+    Notes
+    -----
+    ファイル出力とコンソール出力を行うように設定する。
+
+    """
+    lib_logger = logging.getLogger("internal")
+
+    _logger.setLevel(loglevel)
+    lib_logger.setLevel(loglevel)
+
+    # consoleログ
+    console_handler = StreamHandler()
+    console_handler.setLevel(loglevel)
+    console_handler.setFormatter(
+        Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+    )
+    _logger.addHandler(console_handler)
+    lib_logger.addHandler(console_handler)
+
+    # ファイル出力するログ
+    # 基本的に大量に利用することを想定していないので、ログファイルは多くは残さない。
+    if filepath is not None:
+        file_handler = RotatingFileHandler(
+            filepath,
+            encoding="utf-8",
+            mode="a",
+            maxBytes=10 * 1024 * 1024,  # 10 MB
+            backupCount=1,
+        )
+        file_handler.setLevel(loglevel)
+        file_handler.setFormatter(
+            Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+        )
+        _logger.addHandler(file_handler)
+        lib_logger.addHandler(file_handler)
+
+
+if __name__ == "__main__":
+    try:
+        _main()
+    except Exception:
+        _logger.exception("Exception")
+        sys.exit(1)
@@ -3,14 +3,30 @@
 import logging
 import sys
 from argparse import ArgumentParser
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum
 from logging import Formatter, StreamHandler
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
+import numpy as np
 from internal import (
+    BatchSetting,
+    BatchSettingFile,
+    ConvertToMp4File,
     ConvertToWavFile,
+    DiarizationCacheFile,
+    InterimCache,
+    JsonLinesSink,
+    MediaProbe,
+    OnnxDiarizationBackend,
+    OverlapPlanner,
+    ProgressReporter,
+    SeekableAudioSource,
+    SocketSink,
+    SpeakerEmbeddingFile,
     SpeakerIntegrator,
+    SpeakerRegistry,
     SpeakerSegment,
     SpeakerSegmentFile,
     SpeakerSeparator,
@@ -19,12 +35,24 @@ from internal import (
     SpeechTextFile,
     SpeechTextWriter,
     SpeechToText,
+    ThreadGovernor,
+    batch_setting_key,
+    join_speaker_names,
+    lock_recording,
+    parse_size,
+    split_speaker_names,
 )
 from pydantic import BaseModel
-from pydub import AudioSegment
 
 _logger = logging.getLogger(__name__)
 
+# 処理全体の進捗に占める各処理の重み. 実行する順に並べ、値は処理時間のおおよその比率
+_STAGE_WEIGHTS = {
+    "convert": 0.05,
+    "diarization": 0.35,
+    "speech_to_text": 0.6,
+}
+
 
 class _DeviceType(Enum):
     """pytorchを利用するデバイス設定."""
@@ -34,39 +62,101 @@ class _DeviceType(Enum):
     MPS = "mps"
 
 
+class _DiarizationBackend(Enum):
+    """話者分離のモデル推論に利用するバックエンド."""
+
+    TORCH = "torch"
+    ONNX = "onnx"
+
+
 class _RunConfig(BaseModel):
     """スクリプト実行のためのオプション."""
 
     filepath: Path  # 処理対象の音源
     device: str  # デバイス
+    diarization_backend: str  # 話者分離のモデル推論に利用するバックエンド
+    onnx_dir: Path  # ONNXモデルのディレクトリ
+    onnx_quantized: bool  # int8に量子化したONNXモデルを利用するかどうか
+    onnx_threads: int  # ONNX Runtimeの演算内の並列数. 0の場合は自動
+    pipeline_snapshot: Path  # 話者分離パイプラインのスナップショットのディレクトリ
+    autotune_dir: Path  # pyannote_autotune.pyで計測したバッチサイズのディレクトリ
+    rss_limit: int | None  # 話者分離のバッチサイズを選ぶメモリ使用量の上限(バイト)
+    num_speakers: int | None  # 話者数
+    min_speakers: int | None  # 話者数の下限
+    max_speakers: int | None  # 話者数の上限
 
     save_mp4: bool  # Trueの場合は、mp4以外の形式の場合にmp4に変換して保存する
+    interim_format: str  # 中間ファイルとして保存する音声の形式
+    ffmpeg_workers: int  # 音声の変換で分割してデコードする場合の並列数
+
+    whisper_workers: int  # 同時に実行するwhisper.cppのプロセス数
+    fallback_model: list[str]  # whisper.cppの失敗時に利用するモデル名
+    retry_failed: bool  # 文字起こしに失敗した区間のみを再実行するかどうか
+
+    speaker_registry: Path  # 話者登録情報のディレクトリ
+    speaker_threshold: float  # 登録済み話者とみなすコサイン類似度の下限
+
+    threads: int  # 全体で利用するスレッド数. 0の場合はCPUコア数
+    pin_cpu: bool  # 外部プロセスを割り当てたCPUに固定するかどうか
+
+    cache_budget: int | None  # 中間ファイルの合計容量の上限(バイト)
+
+    progress_jsonl: Path | None  # 進捗のイベントを追記するJSON Linesファイル
+    progress_socket: str | None  # 進捗のイベントを送るソケットのアドレス
+    progress_interval: float  # 途中経過のイベントを送る最小の間隔(秒)
 
     force: bool  # 保存済みのファイルを無視して実行するかどうか
     verbose: int  # ログレベル
 
 
-def _calc_speaker_segment(
+def _calc_speaker_segment(  # noqa: PLR0913
     wav_filepath: Path,  # 話者分離を行う音声ファイルのパス
     model_config_filepath: Path,  # pyannoteのモデル設定ファイルのパス
     output_dir: Path,  # 出力先ディレクトリ
     *,
     device: str = "cpu",  # 話者分離に利用するデバイス
+    onnx_backend: OnnxDiarizationBackend | None = None,  # ONNX Runtimeで推論する場合
+    snapshot_dir: Path | None = None,  # パイプラインのスナップショットのディレクトリ
+    batch_setting: BatchSetting | None = None,  # パイプラインのバッチサイズ
+    governor: ThreadGovernor | None = None,  # スレッド数の割り当て
+    progress: ProgressReporter | None = None,  # 進捗の通知先
+    num_speakers: int | None = None,  # 話者数
+    min_speakers: int | None = None,  # 話者数の下限
+    max_speakers: int | None = None,  # 話者数の上限
     force: bool = False,  # 保存済みのファイルを無視して実行するかどうか
 ) -> list[SpeakerSegment]:
     """音声ファイルから話者区間を算出する."""
     # 話者分離情報の取得
     speaker_segment_file = SpeakerSegmentFile(
-        filepath=(output_dir / "speaker_segment.json")
+        filepath=(output_dir / "speaker_segment.npz")
+    )
+    speaker_embedding_file = SpeakerEmbeddingFile(
+        filepath=(output_dir / "speaker_embedding.npz")
+    )
+    diarization_cache_file = DiarizationCacheFile(
+        filepath=(output_dir / "speaker_diarization_cache.npz")
     )
     if force:
         speaker_segment_file.clean()
+        speaker_embedding_file.clean()
+        diarization_cache_file.clean()
     speaker_segments = speaker_segment_file.get_segment_list()
     if len(speaker_segments) < 1:
         speaker_separator = SpeakerSeparator(
-            config_path=model_config_filepath, device_name=device
+            config_path=model_config_filepath,
+            device_name=device,
+            onnx_backend=onnx_backend,
+            snapshot_dir=snapshot_dir,
+            governor=governor,
+            progress=progress,
+            batch_setting=batch_setting,
         )
-        for segment in speaker_separator.diarization(wav_filepath=wav_filepath):
+        for segment in speaker_separator.diarization(
+            wav_filepath,
+            num_speakers=num_speakers,
+            min_speakers=min_speakers,
+            max_speakers=max_speakers,
+        ):
             _logger.info(
                 "[%03.1f s - %03.1f s] %s",
                 segment.start_time,
@@ -75,10 +165,13 @@ def _calc_speaker_segment(
             )
             speaker_segments.append(segment)
         speaker_segment_file.save(speaker_segments)
+        speaker_embedding_file.save(speaker_separator.speaker_embeddings)
+        if speaker_separator.diarization_cache is not None:
+            diarization_cache_file.save(speaker_separator.diarization_cache)
 
     # 話者区間の統合
     speaker_integrate_file = SpeakerSegmentFile(
-        filepath=(output_dir / "speaker_segment_integrate.json")
+        filepath=(output_dir / "speaker_segment_integrate.npz")
     )
     if force:
         speaker_integrate_file.clean()
@@ -90,6 +183,14 @@ def _calc_speaker_segment(
             max_segment_duration=120.0,
         )
         integrated_segments = speaker_integrator.integrate(speaker_segments)
+
+        # 重なった区間は一度だけ文字起こしするようにまとめる
+        overlap_planner = OverlapPlanner(max_segment_duration=120.0)
+        integrated_segments = overlap_planner.plan(integrated_segments)
+        _logger.info(
+            "overlap deduplication saved %.1f sec",
+            overlap_planner.saved_duration,
+        )
         speaker_integrate_file.save(integrated_segments)
 
     return integrated_segments
@@ -98,16 +199,82 @@ def _calc_speaker_segment(
 def _convert_to_wav_file(
     filepath: Path,  # 変換対象の音声ファイルのパス
     output_dir: Path,  # wavファイルの出力先ディレクトリ
+    audio_format: str = "wav",  # 出力形式(wav, flac)
+    governor: ThreadGovernor | None = None,  # スレッド数の割り当て
+    num_workers: int = 1,  # 分割してデコードする場合の並列数
 ) -> Path:
-    """音声ファイルをwavファイルに変換する."""
-    if filepath.suffix == ".wav":
-        return filepath
-
-    convert_to_wav_file = ConvertToWavFile(output_dir=output_dir)
+    """音声ファイルをwavファイルに変換する. 既に変換後の形式の場合はそのまま返す."""
+    convert_to_wav_file = ConvertToWavFile(
+        output_dir=output_dir,
+        audio_format=audio_format,
+        governor=governor,
+        num_workers=num_workers,
+    )
 
     return convert_to_wav_file.convert(filepath)
 
 
+def _start_mp4_export(
+    filepath: Path,  # 変換対象の音源のファイルパス
+    output_dir: Path,  # mp4ファイルの出力先ディレクトリ
+    executor: ThreadPoolExecutor,  # バックグラウンドで変換するためのexecutor
+    governor: ThreadGovernor | None = None,  # スレッド数の割り当て
+) -> Future[Path]:
+    """mp4への変換をバックグラウンドで開始する."""
+    convert_to_mp4_file = ConvertToMp4File(output_dir=output_dir, governor=governor)
+
+    return executor.submit(convert_to_mp4_file.convert, filepath)
+
+
+def _create_progress_reporter(config: _RunConfig) -> ProgressReporter:
+    """実行時引数で指定した通知先に進捗を送る`ProgressReporter`を作成する."""
+    progress = ProgressReporter(min_interval=config.progress_interval)
+    if config.progress_jsonl is not None:
+        progress.add_sink(JsonLinesSink(config.progress_jsonl))
+    if config.progress_socket is not None:
+        progress.add_sink(SocketSink(config.progress_socket))
+
+    return progress
+
+
+def _identify_speakers(
+    speaker_text: list[SpeakerText],
+    embedding_filepath: Path,  # 話者ごとの埋め込みベクトルのファイルパス
+    registry_dir: Path,  # 話者登録情報のディレクトリ
+    threshold: float,  # 登録済み話者とみなすコサイン類似度の下限
+) -> list[SpeakerText]:
+    """登録済みの話者と照合して話者名を置き換える."""
+    registry = SpeakerRegistry(dirpath=registry_dir, threshold=threshold)
+    embeddings = SpeakerEmbeddingFile(filepath=embedding_filepath).get_embeddings()
+    if len(registry) < 1 or len(embeddings) < 1:
+        return speaker_text
+
+    labels = list(embeddings.keys())
+    identified = registry.identify(np.stack([embeddings[v] for v in labels]))
+    mapping = {
+        label: name
+        for label, name in zip(labels, identified, strict=True)
+        if name is not None
+    }
+    for label, name in mapping.items():
+        _logger.info("identify speaker: %s -> %s", label, name)
+
+    # 複数話者をまとめた話者名は、話者ごとに置き換える
+    return [
+        text.model_copy(
+            update={
+                "speaker_name": join_speaker_names(
+                    [
+                        mapping.get(name, name)
+                        for name in split_speaker_names(text.speaker_name)
+                    ]
+                )
+            }
+        )
+        for text in speaker_text
+    ]
+
+
 def _main() -> None:
     """スクリプトのエントリポイント."""
     # 実行時引数の読み込み
@@ -134,38 +301,111 @@ def _main() -> None:
     processed_dir.mkdir(exist_ok=True)
     model_config_filepath = raw_dir / "config.yaml"
 
-    if config.save_mp4 and config.filepath.suffix == ".mp4":
-        pass
+    # 処理全体の残り時間を推定するため、音源の長さを取得する
+    media_info = MediaProbe().probe(config.filepath)
+    audio_total = None if media_info is None else media_info.duration
+
+    # 処理中は中間ファイルの整理の対象から外す. 終了時は進捗の通知先を閉じる
+    with (
+        _create_progress_reporter(config) as progress,
+        lock_recording(interim_dir),
+        progress.stage(
+            "pipeline", audio_total=audio_total, stage_weights=_STAGE_WEIGHTS
+        ),
+    ):
+        # 処理全体で利用するスレッド数
+        governor = ThreadGovernor(
+            total_threads=config.threads, pin_affinity=config.pin_cpu
+        )
+        _logger.info("thread budget: %d", governor.total_threads)
+
+        # mp4への変換は後続の処理と並行して行う
+        background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mp4")
+        mp4_future = None
+        if config.save_mp4:
+            _logger.info("start mp4 export: %s", config.filepath.name)
+            mp4_future = _start_mp4_export(
+                config.filepath, processed_dir, background, governor=governor
+            )
 
-    # wavファイルへの変更
-    _logger.info("convert to wav file: %s", config.filepath.name)
-    target_filepath = _convert_to_wav_file(config.filepath, interim_dir)
+        # wavファイルへの変更
+        _logger.info("convert to wav file: %s", config.filepath.name)
+        with progress.stage("convert"):
+            target_filepath = _convert_to_wav_file(
+                config.filepath,
+                interim_dir,
+                audio_format=config.interim_format,
+                governor=governor,
+                num_workers=config.ffmpeg_workers,
+            )
 
-    # 話者区間の算出
-    integrated_segments = _calc_speaker_segment(
-        wav_filepath=target_filepath,
-        model_config_filepath=model_config_filepath,
-        output_dir=interim_dir,
-        device=config.device,
-        force=config.force,
-    )
+        # 話者区間の算出
+        onnx_backend = None
+        if config.diarization_backend == _DiarizationBackend.ONNX.value:
+            onnx_backend = OnnxDiarizationBackend(
+                model_dir=config.onnx_dir,
+                quantized=config.onnx_quantized,
+                intra_op_num_threads=config.onnx_threads or governor.total_threads,
+            )
+        batch_setting = BatchSettingFile(config.autotune_dir).load(
+            batch_setting_key(config.diarization_backend, config.device),
+            rss_limit=config.rss_limit,
+        )
+        integrated_segments = _calc_speaker_segment(
+            wav_filepath=target_filepath,
+            model_config_filepath=model_config_filepath,
+            output_dir=interim_dir,
+            device=config.device,
+            onnx_backend=onnx_backend,
+            snapshot_dir=config.pipeline_snapshot,
+            batch_setting=batch_setting,
+            governor=governor,
+            progress=progress,
+            num_speakers=config.num_speakers,
+            min_speakers=config.min_speakers,
+            max_speakers=config.max_speakers,
+            force=config.force,
+        )
 
-    # Speech to Text
-    _logger.info("speech to text ...")
-    speaker_text = _speech_to_text(
-        wav_filepath=target_filepath,
-        segments=integrated_segments,
-        output_dir=interim_dir,
-        force=config.force,
-    )
+        # Speech to Text
+        _logger.info("speech to text ...")
+        speaker_text = _speech_to_text(
+            wav_filepath=target_filepath,
+            segments=integrated_segments,
+            output_dir=interim_dir,
+            fallback_model_names=config.fallback_model,
+            num_workers=config.whisper_workers,
+            governor=governor,
+            progress=progress,
+            force=config.force,
+            retry_failed=config.retry_failed,
+        )
 
-    # ファイル出力
-    speech_md_file = SpeechTextWriter(
-        filepath=(processed_dir / f"{target_filepath.stem}.txt")
-    )
-    if config.force:
-        speech_md_file.clean()
-    speech_md_file.save(speaker_text)
+        # 登録済み話者の照合
+        speaker_text = _identify_speakers(
+            speaker_text,
+            embedding_filepath=(interim_dir / "speaker_embedding.npz"),
+            registry_dir=config.speaker_registry,
+            threshold=config.speaker_threshold,
+        )
+
+        # ファイル出力
+        speech_md_file = SpeechTextWriter(
+            filepath=(processed_dir / f"{target_filepath.stem}.txt")
+        )
+        if config.force:
+            speech_md_file.clean()
+        speech_md_file.save(speaker_text)
+
+        # バックグラウンドで実行したmp4への変換の完了を待つ
+        if mp4_future is not None:
+            _logger.info("mp4 file: %s", mp4_future.result())
+        background.shutdown()
+
+    # 中間ファイルの合計容量を上限以下にする
+    if config.cache_budget is not None:
+        removed = InterimCache(Path("data/interim")).prune(config.cache_budget)
+        _logger.info("evict interim files: %d", len(removed))
 
 
 def _parse_args() -> _RunConfig:
@@ -182,11 +422,163 @@ def _parse_args() -> _RunConfig:
         choices=[v.value for v in _DeviceType],
         help="話者分離に利用するデバイス.",
     )
+    parser.add_argument(
+        "--diarization-backend",
+        default=_DiarizationBackend.TORCH.value,
+        choices=[v.value for v in _DiarizationBackend],
+        help="話者分離のモデル推論に利用するバックエンド. onnxはCPUのみ.",
+    )
+    parser.add_argument(
+        "--onnx-dir",
+        type=Path,
+        default=Path("data/raw/onnx"),
+        help="pyannote_export_onnx.pyで変換したONNXモデルのディレクトリ.",
+    )
+    parser.add_argument(
+        "--onnx-quantized",
+        action="store_true",
+        help="int8に量子化したONNXモデルを利用する.",
+    )
+    parser.add_argument(
+        "--onnx-threads",
+        type=int,
+        default=0,
+        help="ONNX Runtimeの演算内の並列数. 0の場合は--threadsの値を利用する.",
+    )
+    parser.add_argument(
+        "--pipeline-snapshot",
+        type=Path,
+        default=Path("data/raw/pipeline_snapshot"),
+        help=(
+            "pyannote_download_model.py --snapshotで保存したパイプラインのディレクトリ."
+            " 有効なスナップショットがない場合は設定ファイルから読み込む."
+        ),
+    )
+    parser.add_argument(
+        "--autotune-dir",
+        type=Path,
+        default=Path("data/raw/autotune"),
+        help=(
+            "pyannote_autotune.pyで計測したバッチサイズのディレクトリ."
+            " このホストの計測結果がない場合は設定ファイルの値を利用する."
+        ),
+    )
+    parser.add_argument(
+        "--rss-limit",
+        type=parse_size,
+        default=None,
+        help=(
+            "話者分離のメモリ使用量の上限(例: 8G). 計測結果のうち上限内で"
+            "最も速いバッチサイズを利用する."
+        ),
+    )
+
+    parser.add_argument(
+        "--num-speakers", type=int, default=None, help="話者数が分かっている場合に指定."
+    )
+    parser.add_argument("--min-speakers", type=int, default=None, help="話者数の下限.")
+    parser.add_argument("--max-speakers", type=int, default=None, help="話者数の上限.")
 
     parser.add_argument(
         "--save-mp4",
         action="store_true",
-        help="mp4以外のファイルの場合にmp4に変換したファイルを保存する.",
+        help=(
+            "mp4以外のファイルの場合にmp4に変換したファイルを保存する."
+            " 文字起こしと並行して変換し、可能な場合は再エンコードしない."
+        ),
+    )
+
+    parser.add_argument(
+        "--interim-format",
+        default="wav",
+        choices=list(ConvertToWavFile.CODECS.keys()),
+        help="中間ファイルとして保存する音声の形式. flacは可逆圧縮で容量を削減する.",
+    )
+    parser.add_argument(
+        "--ffmpeg-workers",
+        type=int,
+        default=1,
+        help=(
+            "長い音源を時間で分割し、並列にデコードするffmpegのプロセス数."
+            " 1の場合は分割しない."
+        ),
+    )
+
+    parser.add_argument(
+        "--whisper-workers",
+        type=int,
+        default=1,
+        help="同時に実行するwhisper.cppのプロセス数.",
+    )
+    parser.add_argument(
+        "--fallback-model",
+        nargs="*",
+        default=["medium"],
+        help="whisper.cppの失敗時に利用するモデル名. 指定した順に利用する.",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="文字起こしに失敗した区間のみを再実行する.",
+    )
+
+    parser.add_argument(
+        "--speaker-registry",
+        type=Path,
+        default=Path("data/raw/speaker_registry"),
+        help="話者登録情報のディレクトリ.",
+    )
+    parser.add_argument(
+        "--speaker-threshold",
+        type=float,
+        default=0.5,
+        help="登録済み話者とみなすコサイン類似度の下限.",
+    )
+
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=0,
+        help=(
+            "torch、ONNX Runtime、whisper.cpp、ffmpegで分け合うスレッド数の上限."
+            " 0の場合はCPUコア数."
+        ),
+    )
+    parser.add_argument(
+        "--pin-cpu",
+        action="store_true",
+        help="whisper.cppとffmpegを割り当てたCPUに固定する. tasksetが必要.",
+    )
+
+    parser.add_argument(
+        "--cache-budget",
+        type=parse_size,
+        default=None,
+        help=(
+            "data/interimの中間ファイルの合計容量の上限(例: 20G)."
+            " 処理後に超えた分を、再作成しやすい音声から古い順に削除する."
+        ),
+    )
+
+    parser.add_argument(
+        "--progress-jsonl",
+        type=Path,
+        default=None,
+        help="進捗のイベント(処理の開始・終了、区間の完了、ETAなど)を追記するファイル.",
+    )
+    parser.add_argument(
+        "--progress-socket",
+        default=None,
+        help=(
+            "進捗のイベントをjsonで送るソケット. host:port形式の場合はUDP、"
+            "それ以外はUNIXドメインソケットのパス."
+        ),
+    )
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=1.0,
+        help="処理の途中経過のイベントを送る最小の間隔(秒).",
     )
 
     parser.add_argument(
@@ -251,35 +643,69 @@ def _setup_logger(
         lib_logger.addHandler(file_handler)
 
 
-def _speech_to_text(
+def _speech_to_text(  # noqa: PLR0913
     wav_filepath: Path,
     segments: list[SpeakerSegment],
     output_dir: Path,
     *,
+    fallback_model_names: list[str],
+    num_workers: int = 1,
+    governor: ThreadGovernor | None = None,
+    progress: ProgressReporter | None = None,
     force: bool = False,
+    retry_failed: bool = False,
 ) -> list[SpeakerText]:
     """音声ファイルからごとに、whisper.cppを利用して文字起こしを行う."""
     # Speech to Text
-    speech_text_file = SpeechTextFile(filepath=(output_dir / "speech_text.json"))
+    speech_text_file = SpeechTextFile(filepath=(output_dir / "speech_text.npz"))
+    failed_segment_file = SpeakerSegmentFile(
+        filepath=(output_dir / "speech_text_failed.npz")
+    )
     if force:
         speech_text_file.clean()
+        failed_segment_file.clean()
     speaker_text_list = speech_text_file.get_segment_list()
-    if len(speaker_text_list) < 1:
-        sound: AudioSegment = AudioSegment.from_wav(wav_filepath)
+    target_segments = segments
+    if retry_failed and len(speaker_text_list) > 0:
+        # 失敗した区間のみを再実行して、既存の結果に追加する
+        target_segments = failed_segment_file.get_segment_list()
+        _logger.info("retry failed segments: %d", len(target_segments))
+    elif len(speaker_text_list) > 0:
+        target_segments = []
+    if len(target_segments) > 0:
+        sound = SeekableAudioSource.open(wav_filepath)
         speech_to_text = SpeechToText(
             wav_dirpath=output_dir,
             whisper_cpp_path=Path("whisper.cpp"),
             model_name="large-v3",
+            fallback_model_names=fallback_model_names,
+            num_workers=num_workers,
+            governor=governor,
+            progress=progress,
+        )
+        speaker_text_list = sorted(
+            [
+                *speaker_text_list,
+                *speech_to_text.to_text(sound=sound, segments=target_segments),
+            ],
+            key=lambda v: v.start_time,
         )
-        speaker_text_list = speech_to_text.to_text(sound=sound, segments=segments)
         speech_text_file.save(speaker_text_list)
+        speech_to_text.metrics.save(output_dir / "run_metrics.json")
+        failed_segment_file.clean()
+        if len(speech_to_text.failed_segments) > 0:
+            _logger.warning(
+                "failed segments: %d. rerun with --retry-failed.",
+                len(speech_to_text.failed_segments),
+            )
+            failed_segment_file.save(speech_to_text.failed_segments)
 
     # 冗長なテキストなどの除去
     _logger.info("integrate text ...")
     speech_integrate_file = SpeechTextFile(
-        filepath=(output_dir / "speech_integrate_text.json")
+        filepath=(output_dir / "speech_integrate_text.npz")
     )
-    if force:
+    if force or len(target_segments) > 0:
         speech_integrate_file.clean()
     integrated_text = speech_integrate_file.get_segment_list()
     if len(integrated_text) < 1:
@@ -0,0 +1,503 @@
+"""共有ファイルシステム上のジョブキューを介して、複数のホストで文字起こしを分担する."""
+
+import logging
+import os
+import sys
+import time
+import traceback
+from argparse import ArgumentParser
+from logging import Formatter, StreamHandler
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any
+
+from internal import (
+    BatchSettingFile,
+    ConvertToWavFile,
+    Job,
+    JobQueue,
+    OverlapPlanner,
+    SeekableAudioSource,
+    SegmentTable,
+    SpeakerEmbeddingFile,
+    SpeakerIntegrator,
+    SpeakerSegmentFile,
+    SpeakerSeparator,
+    SpeechIntegrator,
+    SpeechTextFile,
+    SpeechTextWriter,
+    SpeechToText,
+    ThreadGovernor,
+    batch_setting_key,
+    lock_recording,
+    parse_size,
+)
+from pydantic import BaseModel
+
+_logger = logging.getLogger(__name__)
+
+
+class _RunConfig(BaseModel):
+    """スクリプト実行のためのオプション."""
+
+    command: str  # 実行するコマンド
+    queue_dir: Path  # 共有ファイルシステム上のジョブキューのディレクトリ
+
+    # submit
+    filepaths: list[Path] = []  # 処理対象の音源
+    segments_per_job: int = 20  # 1つの文字起こしジョブで処理する区間数
+    num_speakers: int | None = None  # 話者数
+    min_speakers: int | None = None  # 話者数の下限
+    max_speakers: int | None = None  # 話者数の上限
+
+    # run
+    device: str = "cpu"  # 話者分離に利用するデバイス
+    pipeline_snapshot: Path = Path("data/raw/pipeline_snapshot")  # スナップショット
+    autotune_dir: Path = Path("data/raw/autotune")  # バッチサイズの計測結果
+    rss_limit: int | None = None  # 話者分離のメモリ使用量の上限(バイト)
+    whisper_workers: int = 1  # 同時に実行するwhisper.cppのプロセス数
+    fallback_model: list[str] = ["medium"]  # whisper.cppの失敗時に利用するモデル名
+    threads: int = 0  # 全体で利用するスレッド数. 0の場合はCPUコア数
+    lease_duration: float = 60.0  # リースの有効期間(秒)
+    max_attempts: int = 3  # ジョブを失敗とみなすまでの実行回数
+    poll_interval: float = 5.0  # 実行可能なジョブがない場合の待ち時間(秒)
+    exit_when_idle: bool = False  # 実行待ちのジョブがなくなったら終了するかどうか
+
+    verbose: int  # ログレベル
+
+
+def _main() -> None:
+    """スクリプトのエントリポイント."""
+    # 実行時引数の読み込み
+    config = _parse_args()
+
+    # ログ設定
+    loglevel = {
+        0: logging.ERROR,
+        1: logging.WARNING,
+        2: logging.INFO,
+        3: logging.DEBUG,
+    }.get(config.verbose, logging.DEBUG)
+    script_filepath = Path(__file__)
+    log_filepath = Path("data/interim") / f"{script_filepath.stem}.log"
+    log_filepath.parent.mkdir(exist_ok=True)
+    _setup_logger(log_filepath, loglevel=loglevel)
+    _logger.info(config)
+
+    job_queue = JobQueue(
+        config.queue_dir,
+        lease_duration=config.lease_duration,
+        max_attempts=config.max_attempts,
+    )
+    match config.command:
+        case "submit":
+            for filepath in config.filepaths:
+                _submit(job_queue, filepath, config)
+        case "run":
+            _run_worker(job_queue, config)
+        case "status":
+            for job_id, status in job_queue.status().items():
+                sys.stdout.write(f"{status:8s} {job_id}\n")
+
+
+def _submit(job_queue: JobQueue, filepath: Path, config: _RunConfig) -> None:
+    """音源の前処理ジョブを登録する. 文字起こしと結合のジョブは前処理で登録する."""
+    job_queue.submit(
+        Job(
+            job_id=f"prepare:{filepath.stem}",
+            kind="prepare",
+            payload={
+                "filepath": str(filepath),
+                "segments_per_job": config.segments_per_job,
+                "num_speakers": config.num_speakers,
+                "min_speakers": config.min_speakers,
+                "max_speakers": config.max_speakers,
+            },
+        )
+    )
+
+
+def _run_worker(job_queue: JobQueue, config: _RunConfig) -> None:
+    """ジョブを取得して実行することを繰り返す."""
+    governor = ThreadGovernor(total_threads=config.threads)
+    handlers = {
+        "prepare": _prepare,
+        "transcribe": _transcribe,
+        "merge": _merge,
+    }
+    _logger.info("start worker: %s", job_queue.worker_id)
+    while True:
+        lease = job_queue.claim(kinds=list(handlers.keys()))
+        if lease is None:
+            if config.exit_when_idle and job_queue.is_idle():
+                break
+            time.sleep(config.poll_interval)
+            continue
+
+        _logger.info("run job: %s", lease.job.job_id)
+        with job_queue.keep_alive(lease), lock_recording(_interim_dir(lease.job)):
+            try:
+                result = handlers[lease.job.kind](
+                    lease.job, job_queue, config, governor
+                )
+            except Exception:
+                _logger.exception("job failed: %s", lease.job.job_id)
+                job_queue.fail(lease, traceback.format_exc())
+                continue
+        if not job_queue.complete(lease, result):
+            _logger.warning("discard result of lost job: %s", lease.job.job_id)
+    _logger.info("stop worker: %s", job_queue.worker_id)
+
+
+def _interim_dir(job: Job) -> Path:
+    """ジョブの対象の音源の中間ファイルのディレクトリ."""
+    return Path("data/interim") / Path(job.payload["filepath"]).stem
+
+
+def _prepare(
+    job: Job, job_queue: JobQueue, config: _RunConfig, governor: ThreadGovernor
+) -> dict[str, Any]:
+    """wavファイルへの変換と話者分離を行い、区間を分けた文字起こしジョブを登録する."""
+    filepath = Path(job.payload["filepath"])
+    interim_dir = _interim_dir(job)
+
+    wav_filepath = ConvertToWavFile(output_dir=interim_dir, governor=governor).convert(
+        filepath
+    )
+
+    speaker_segment_file = SpeakerSegmentFile(
+        filepath=(interim_dir / "speaker_segment.npz")
+    )
+    speaker_segments = speaker_segment_file.get_segment_list()
+    if len(speaker_segments) < 1:
+        speaker_separator = SpeakerSeparator(
+            config_path=Path("data/raw/config.yaml"),
+            device_name=config.device,
+            snapshot_dir=config.pipeline_snapshot,
+            governor=governor,
+            batch_setting=BatchSettingFile(config.autotune_dir).load(
+                batch_setting_key("torch", config.device), rss_limit=config.rss_limit
+            ),
+        )
+        speaker_segments = list(
+            speaker_separator.diarization(
+                wav_filepath,
+                num_speakers=job.payload["num_speakers"],
+                min_speakers=job.payload["min_speakers"],
+                max_speakers=job.payload["max_speakers"],
+            )
+        )
+        speaker_segment_file.save(speaker_segments)
+        SpeakerEmbeddingFile(filepath=(interim_dir / "speaker_embedding.npz")).save(
+            speaker_separator.speaker_embeddings
+        )
+
+    speaker_integrator = SpeakerIntegrator(
+        segment_duration_threshold=60.0,
+        split_segment_duration=1.0,
+        max_segment_duration=120.0,
+    )
+    overlap_planner = OverlapPlanner(max_segment_duration=120.0)
+    integrated_segments = overlap_planner.plan(
+        speaker_integrator.integrate(speaker_segments)
+    )
+    SpeakerSegmentFile(filepath=(interim_dir / "speaker_segment_integrate.npz")).save(
+        integrated_segments
+    )
+
+    # 区間の範囲ごとの文字起こしと、その結果を結合するジョブを登録する
+    segments_per_job = max(1, job.payload["segments_per_job"])
+    ranges = [
+        (start, min(start + segments_per_job, len(integrated_segments)))
+        for start in range(0, len(integrated_segments), segments_per_job)
+    ]
+    transcribe_ids = [
+        f"transcribe:{filepath.stem}:{start:06d}-{end:06d}" for start, end in ranges
+    ]
+    for job_id, (start, end) in zip(transcribe_ids, ranges, strict=True):
+        job_queue.submit(
+            Job(
+                job_id=job_id,
+                kind="transcribe",
+                payload={
+                    "filepath": str(filepath),
+                    "wav_filepath": str(wav_filepath),
+                    "start": start,
+                    "end": end,
+                },
+                depends_on=(job.job_id,),
+            )
+        )
+    job_queue.submit(
+        Job(
+            job_id=f"merge:{filepath.stem}",
+            kind="merge",
+            payload={
+                "filepath": str(filepath),
+                "wav_filepath": str(wav_filepath),
+                "parts": [f"{start:06d}-{end:06d}" for start, end in ranges],
+            },
+            depends_on=(job.job_id, *transcribe_ids),
+        )
+    )
+
+    return {"wav_filepath": str(wav_filepath), "num_segments": len(integrated_segments)}
+
+
+def _transcribe(
+    job: Job,
+    job_queue: JobQueue,  # noqa: ARG001
+    config: _RunConfig,
+    governor: ThreadGovernor,
+) -> dict[str, Any]:
+    """話者区間の範囲を文字起こしして、範囲ごとのファイルに保存する."""
+    wav_filepath = Path(job.payload["wav_filepath"])
+    start, end = job.payload["start"], job.payload["end"]
+    interim_dir = _interim_dir(job)
+    parts_dir = interim_dir / "speech_text_parts"
+    parts_dir.mkdir(exist_ok=True)
+    if not wav_filepath.exists():
+        # 前処理の後に中間ファイルの整理で削除された場合は変換し直す
+        wav_filepath = ConvertToWavFile(
+            output_dir=interim_dir, governor=governor
+        ).convert(Path(job.payload["filepath"]))
+
+    segment_filepath = interim_dir / "speaker_segment_integrate.npz"
+    segments = SpeakerSegmentFile(filepath=segment_filepath).get_segment_list()[
+        start:end
+    ]
+    if len(segments) != end - start:
+        # 前処理の結果がない場合は、空の文字起こし結果で完了とせず失敗とする
+        message = f"speaker segments not found: {segment_filepath!s} [{start}:{end}]"
+        raise FileNotFoundError(message)
+    speech_to_text = SpeechToText(
+        wav_dirpath=interim_dir,
+        whisper_cpp_path=Path("whisper.cpp"),
+        model_name="large-v3",
+        fallback_model_names=config.fallback_model,
+        num_workers=config.whisper_workers,
+        governor=governor,
+    )
+    speaker_text = speech_to_text.to_text(
+        sound=SeekableAudioSource.open(wav_filepath), segments=segments
+    )
+
+    SpeechTextFile(filepath=(parts_dir / f"{start:06d}-{end:06d}.npz")).save(
+        speaker_text
+    )
+
+    return {
+        "num_texts": len(speaker_text),
+        "num_failed": len(speech_to_text.failed_segments),
+        "metrics": speech_to_text.metrics.to_dict(),
+    }
+
+
+def _merge(
+    job: Job,
+    job_queue: JobQueue,  # noqa: ARG001
+    config: _RunConfig,  # noqa: ARG001
+    governor: ThreadGovernor,  # noqa: ARG001
+) -> dict[str, Any]:
+    """範囲ごとの文字起こし結果を結合して、テキストファイルを出力する."""
+    wav_filepath = Path(job.payload["wav_filepath"])
+    interim_dir = _interim_dir(job)
+    parts_dir = interim_dir / "speech_text_parts"
+
+    speaker_text = sorted(
+        (
+            text
+            for part in job.payload["parts"]
+            for text in SpeechTextFile(
+                filepath=(parts_dir / f"{part}.npz")
+            ).get_segment_list()
+        ),
+        key=lambda v: v.start_time,
+    )
+    SpeechTextFile(filepath=(interim_dir / "speech_text.npz")).save(speaker_text)
+
+    integrated_text = SpeechIntegrator().integrate_table(
+        SegmentTable.from_texts(speaker_text)
+    )
+    SpeechTextFile(filepath=(interim_dir / "speech_integrate_text.npz")).save_table(
+        integrated_text
+    )
+
+    processed_dir = Path("data/processed") / interim_dir.name
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    output_filepath = processed_dir / f"{wav_filepath.stem}.txt"
+    SpeechTextWriter(filepath=output_filepath).save(integrated_text.to_texts())
+
+    return {"output": os.fspath(output_filepath), "num_texts": len(integrated_text)}
+
+
+def _parse_args() -> _RunConfig:
+    """スクリプト実行のための引数を読み込む."""
+    parser = ArgumentParser(
+        description=(
+            "共有ファイルシステム上のジョブキューを介して、複数のホストで"
+            "文字起こしを分担する."
+        )
+    )
+    parser.add_argument(
+        "--queue-dir",
+        type=Path,
+        default=Path("data/queue"),
+        help="全てのホストから参照できるジョブキューのディレクトリ.",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="詳細メッセージのレベルを設定.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = subparsers.add_parser("submit", help="音源をキューに登録する.")
+    submit_parser.add_argument(
+        "filepaths", nargs="+", type=Path, help="文字起こしする音源のファイルパス."
+    )
+    submit_parser.add_argument(
+        "--segments-per-job",
+        type=int,
+        default=20,
+        help="1つの文字起こしジョブで処理する話者区間の数.",
+    )
+    submit_parser.add_argument(
+        "--num-speakers", type=int, default=None, help="話者数が分かっている場合に指定."
+    )
+    submit_parser.add_argument(
+        "--min-speakers", type=int, default=None, help="話者数の下限."
+    )
+    submit_parser.add_argument(
+        "--max-speakers", type=int, default=None, help="話者数の上限."
+    )
+
+    run_parser = subparsers.add_parser("run", help="キューのジョブを実行する.")
+    run_parser.add_argument(
+        "-d",
+        "--device",
+        default="cpu",
+        choices=["cpu", "cuda", "mps"],
+        help="話者分離に利用するデバイス.",
+    )
+    run_parser.add_argument(
+        "--pipeline-snapshot",
+        type=Path,
+        default=Path("data/raw/pipeline_snapshot"),
+        help=(
+            "pyannote_download_model.py --snapshotで保存したパイプラインの"
+            "ディレクトリ."
+        ),
+    )
+    run_parser.add_argument(
+        "--autotune-dir",
+        type=Path,
+        default=Path("data/raw/autotune"),
+        help="pyannote_autotune.pyで計測したバッチサイズのディレクトリ.",
+    )
+    run_parser.add_argument(
+        "--rss-limit",
+        type=parse_size,
+        default=None,
+        help="話者分離のメモリ使用量の上限(例: 8G). 上限内で最速のバッチサイズを利用.",
+    )
+    run_parser.add_argument(
+        "--whisper-workers",
+        type=int,
+        default=1,
+        help="同時に実行するwhisper.cppのプロセス数.",
+    )
+    run_parser.add_argument(
+        "--fallback-model",
+        nargs="*",
+        default=["medium"],
+        help="whisper.cppの失敗時に利用するモデル名. 指定した順に利用する.",
+    )
+    run_parser.add_argument(
+        "--threads",
+        type=int,
+        default=0,
+        help="このワーカーで利用するスレッド数の上限. 0の場合はCPUコア数.",
+    )
+    run_parser.add_argument(
+        "--lease-duration",
+        type=float,
+        default=60.0,
+        help="この時間(秒)を超えて応答のないワーカーのジョブを再取得する.",
+    )
+    run_parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="ジョブを失敗とみなすまでの実行回数.",
+    )
+    run_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5.0,
+        help="実行可能なジョブがない場合に待つ時間(秒).",
+    )
+    run_parser.add_argument(
+        "--exit-when-idle",
+        action="store_true",
+        help="実行待ちと実行中のジョブがなくなったら終了する.",
+    )
+
+    subparsers.add_parser("status", help="ジョブごとの状態を表示する.")
+
+    args = parser.parse_args()
+
+    return _RunConfig(**vars(args))
+
+
+def _setup_logger(
+    filepath: Path | None,  # ログ出力するファイルパス. Noneの場合はファイル出力しない.
+    loglevel: int,  # 出力するログレベル
+) -> None:
+    """ログ出力設定.
+
+    Notes
+    -----
+    ファイル出力とコンソール出力を行うように設定する。
+
+    """
+    lib_logger = logging.getLogger("internal")
+
+    _logger.setLevel(loglevel)
+    lib_logger.setLevel(loglevel)
+
+    # consoleログ
+    console_handler = StreamHandler()
+    console_handler.setLevel(loglevel)
+    console_handler.setFormatter(
+        Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+    )
+    _logger.addHandler(console_handler)
+    lib_logger.addHandler(console_handler)
+
+    # ファイル出力するログ
+    # 基本的に大量に利用することを想定していないので、ログファイルは多くは残さない。
+    if filepath is not None:
+        file_handler = RotatingFileHandler(
+            filepath,
+            encoding="utf-8",
+            mode="a",
+            maxBytes=10 * 1024 * 1024,  # 10 MB
+            backupCount=1,
+        )
+        file_handler.setLevel(loglevel)
+        file_handler.setFormatter(
+            Formatter("[%(levelname)7s] %(asctime)s (%(name)s) %(message)s")
+        )
+        _logger.addHandler(file_handler)
+        lib_logger.addHandler(file_handler)
+
+
+if __name__ == "__main__":
+    try:
+        _main()
+    except Exception:
+        _logger.exception("Exception")
+        sys.exit(1)
@@ -0,0 +1,62 @@
+"""ConvertToMp4Fileのバックグラウンドでの変換が後続の処理を妨げないことを確認する."""
+
+import threading
+from pathlib import Path
+
+import pytest
+from internal import thread_governor
+from internal.convert2mp4file import ConvertToMp4File
+from internal.media_probe import MediaProbe
+from internal.thread_governor import ThreadGovernor
+
+
+def test_export_lease_leaves_threads_for_following_stages(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """mp4への変換中も、音声の変換と話者分離のスレッド数が割り当てられること."""
+    monkeypatch.setattr(thread_governor, "_available_cpus", lambda: set(range(8)))
+    monkeypatch.setattr(MediaProbe, "probe", lambda *_: None)
+    started = threading.Event()
+    finish = threading.Event()
+    export_options: list[str] = []
+
+    def run(
+        _: ConvertToMp4File,
+        __: Path,
+        output_filepath: Path,
+        options: list[str],
+        ___: list[str],
+    ) -> None:
+        export_options.extend(options)
+        started.set()
+        finish.wait(timeout=10.0)
+        output_filepath.touch()
+
+    monkeypatch.setattr(ConvertToMp4File, "_run", run)
+    governor = ThreadGovernor(total_threads=8)
+    input_filepath = tmp_path / "input.wav"
+    input_filepath.touch()
+    converter = ConvertToMp4File(output_dir=tmp_path, governor=governor)
+    export = threading.Thread(target=converter.convert, args=(input_filepath,))
+    export.start()
+    try:
+        assert started.wait(timeout=10.0)
+        assert export_options[export_options.index("-threads") + 1] == "1"
+
+        leases: list = []
+
+        def acquire(stage: str) -> None:
+            on_change = (lambda _: None) if stage == "diarization" else None
+            leases.append(governor.acquire(stage, on_change=on_change))
+
+        for stage in ("ffmpeg", "diarization"):
+            thread = threading.Thread(target=acquire, args=(stage,), daemon=True)
+            thread.start()
+            thread.join(timeout=2.0)
+            assert not thread.is_alive(), f"{stage} is not granted"
+        assert all(v.num_threads >= 1 for v in leases)
+        for lease in leases:
+            governor.release(lease)
+    finally:
+        finish.set()
+        export.join()
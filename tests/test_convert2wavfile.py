@@ -0,0 +1,75 @@
+"""ConvertToWavFileの変換の要否の判定を確認する."""
+
+from pathlib import Path
+
+import pytest
+from internal.convert2wavfile import ConvertToWavFile
+from internal.media_probe import MediaInfo, MediaProbe
+
+
+def _wav_info(channels: int) -> MediaInfo:
+    """16kHz、16 bitのPCMのwavファイルの形式."""
+    return MediaInfo(
+        format_names=("wav",),
+        duration=10.0,
+        audio_codec="pcm_s16le",
+        sample_rate=16000,
+        channels=channels,
+        sample_fmt="s16",
+        video_codec=None,
+    )
+
+
+@pytest.fixture()
+def ffmpeg_options(monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    """ffmpegを実行せず、渡したオプションを記録する."""
+    calls: list[list[str]] = []
+
+    def run(
+        _: ConvertToWavFile,
+        __: Path,
+        output_filepath: Path,
+        options: list[str],
+        ___: list[str],
+    ) -> None:
+        calls.append(options)
+        output_filepath.touch()
+
+    monkeypatch.setattr(ConvertToWavFile, "_run", run)
+
+    return calls
+
+
+def test_mono_wav_is_not_converted(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, ffmpeg_options: list[list[str]]
+) -> None:
+    """16kHzで1チャンネルのwavファイルは変換しないこと."""
+    monkeypatch.setattr(MediaProbe, "probe", lambda *_: _wav_info(1))
+    input_filepath = tmp_path / "input.wav"
+    input_filepath.touch()
+
+    output_filepath = ConvertToWavFile(output_dir=tmp_path / "out").convert(
+        input_filepath
+    )
+
+    assert output_filepath == input_filepath
+    assert ffmpeg_options == []
+
+
+def test_stereo_wav_is_downmixed(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, ffmpeg_options: list[list[str]]
+) -> None:
+    """16kHzで2チャンネルのwavファイルは、コピーせずに1チャンネルに変換すること."""
+    monkeypatch.setattr(MediaProbe, "probe", lambda *_: _wav_info(2))
+    input_filepath = tmp_path / "input.wav"
+    input_filepath.touch()
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+
+    output_filepath = ConvertToWavFile(output_dir=output_dir).convert(input_filepath)
+
+    assert output_filepath == output_dir / "input.wav"
+    assert len(ffmpeg_options) == 1
+    options = ffmpeg_options[0]
+    assert options[options.index("-ac") + 1] == "1"
+    assert "copy" not in options
@@ -0,0 +1,64 @@
+"""DecodeMonitorの暴走の判定を確認する."""
+
+import pytest
+from internal.decode_monitor import DecodeMonitor
+
+
+def _feed(monitor: DecodeMonitor, lines: list[str]) -> list[str | None]:
+    """1行ずつ2秒間隔の区間として入力し、判定結果を返す."""
+    return [
+        monitor.feed(end_time=2.0 * (i + 1), text=line) for i, line in enumerate(lines)
+    ]
+
+
+def test_short_repeated_lines_are_not_aborted() -> None:
+    """短い相槌の繰り返しは暴走とみなさないこと."""
+    monitor = DecodeMonitor(duration=60.0)
+
+    assert _feed(monitor, ["はい"] * 8) == [None] * 8
+
+
+@pytest.mark.parametrize("line", ["はい", "ええ", "ははは", "うん、うん"])
+def test_many_backchannel_lines_are_not_aborted(line: str) -> None:
+    """短い相槌の区間が多く続いても、区間をまたいだ文字列の繰り返しとみなさないこと."""
+    monitor = DecodeMonitor(duration=120.0)
+
+    assert _feed(monitor, [line] * 30) == [None] * 30
+
+
+def test_loop_within_line_is_aborted() -> None:
+    """1区間の中で同じ文字列を繰り返している場合は暴走とみなすこと."""
+    monitor = DecodeMonitor(duration=60.0)
+
+    reason = monitor.feed(end_time=10.0, text="ありがとうございます" * 6)
+
+    assert reason is not None
+    assert reason.startswith("loop of 10 chars")
+
+
+def test_long_repeated_lines_are_aborted() -> None:
+    """長い文の繰り返しは暴走とみなすこと."""
+    monitor = DecodeMonitor(duration=60.0)
+    line = "本日はお忙しいところお集まりいただきありがとうございます"
+
+    results = _feed(monitor, [line] * 4)
+
+    assert results[:-1] == [None] * 3
+    assert results[-1] is not None
+    assert results[-1].startswith("line repeated 4 times")
+
+
+def test_repeated_lines_interleaved_with_other_lines() -> None:
+    """別の区間を挟んだ繰り返しは連続とみなさないこと."""
+    monitor = DecodeMonitor(duration=60.0)
+    line = "本日はお忙しいところお集まりいただきありがとうございます"
+
+    assert _feed(monitor, [line, line, line, "次の議題です", line]) == [None] * 5
+
+
+def test_timestamp_beyond_audio_is_aborted() -> None:
+    """区間の時刻が音声の長さを大きく超えた場合は暴走とみなすこと."""
+    monitor = DecodeMonitor(duration=10.0, time_margin=5.0)
+
+    assert monitor.feed(end_time=5.0, text="はい") is None
+    assert monitor.feed(end_time=20.0, text="そうです") is not None
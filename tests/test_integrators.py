@@ -0,0 +1,140 @@
+"""配列で統合するSpeakerIntegratorとSpeechIntegratorが、従来の逐次処理と一致することを確認する."""
+
+import os
+
+import numpy as np
+import pytest
+from internal.segment_table import SegmentTable
+from internal.speaker_integrator import SpeakerIntegrator
+from internal.speaker_segment import SpeakerSegment
+from internal.speaker_text import SpeakerText
+from internal.speech_integrator import SpeechIntegrator
+
+_SPEAKERS = ["SPEAKER_00", "SPEAKER_01", "SPEAKER_02"]
+_TEXTS = ["", "はい", "そうですね", "abc", "次の議題です"]
+
+
+def _legacy_speaker_integrate(
+    segments: list[SpeakerSegment],
+    segment_duration_threshold: float,
+    split_segment_duration: float,
+    max_segment_duration: float,
+) -> list[SpeakerSegment]:
+    """SpeakerIntegrator.integrateの従来の逐次処理."""
+    if len(segments) < 1:
+        return []
+
+    new_segments = [segments[0].model_copy()]
+    is_force_split = False
+    for segment in segments[1:]:
+        current_segment = new_segments[-1]
+        if is_force_split or current_segment.speaker_name != segment.speaker_name:
+            new_segments.append(segment.model_copy())
+            is_force_split = False
+            continue
+
+        total_duration = segment.end_time - current_segment.start_time
+        if total_duration < segment_duration_threshold:
+            current_segment.end_time = segment.end_time
+            is_force_split = False
+            continue
+
+        if segment.end_time - segment.start_time < split_segment_duration:
+            current_segment.end_time = segment.end_time
+            is_force_split = True
+            continue
+
+        if total_duration < max_segment_duration:
+            current_segment.end_time = segment.end_time
+            is_force_split = False
+            continue
+
+        new_segments.append(segment.model_copy())
+        is_force_split = False
+
+    return new_segments
+
+
+def _legacy_speech_integrate(speaker_text: list[SpeakerText]) -> list[SpeakerText]:
+    """SpeechIntegrator.integrateの従来の逐次処理. 空の入力は空のリストとする."""
+    remove_redundant_text = [v.model_copy() for v in speaker_text if v.text != ""]
+    if len(remove_redundant_text) < 1:
+        return []
+
+    integrated_speaker_text = [remove_redundant_text[0]]
+    for segment in remove_redundant_text[1:]:
+        current_text = integrated_speaker_text[-1]
+        if current_text.speaker_name != segment.speaker_name:
+            integrated_speaker_text.append(segment)
+            continue
+
+        current_text.end_time = segment.end_time
+        current_text.text += os.linesep + segment.text
+
+    return integrated_speaker_text
+
+
+def _random_segments(rng: np.random.Generator, size: int) -> list[SpeakerSegment]:
+    """短い区間と長い区間、同じ話者の連続を含む話者区間を作成する."""
+    durations = rng.choice([0.3, 0.8, 5.0, 20.0, 45.0], size=size)
+    gaps = rng.uniform(0.0, 2.0, size=size)
+    start_times = np.cumsum(gaps + np.append(0.0, durations[:-1]))
+    speakers = rng.choice(len(_SPEAKERS), size=size, p=[0.6, 0.3, 0.1])
+    return [
+        SpeakerSegment(
+            start_time=float(start),
+            end_time=float(start + duration),
+            speaker_name=_SPEAKERS[speaker],
+        )
+        for start, duration, speaker in zip(
+            start_times, durations, speakers, strict=True
+        )
+    ]
+
+
+def _random_texts(rng: np.random.Generator, size: int) -> list[SpeakerText]:
+    """空文字を含むテキスト付きの話者区間を作成する."""
+    return [
+        SpeakerText(**v.model_dump(), text=_TEXTS[rng.integers(len(_TEXTS))])
+        for v in _random_segments(rng, size)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_speaker_integrate_table_matches_loop(seed: int) -> None:
+    """ランダムな話者区間で、従来の逐次処理と同じ結果になること."""
+    rng = np.random.default_rng(seed)
+    segments = _random_segments(rng, int(rng.integers(1, 300)))
+    integrator = SpeakerIntegrator(
+        segment_duration_threshold=60.0,
+        split_segment_duration=1.0,
+        max_segment_duration=120.0,
+    )
+
+    actual = integrator.integrate_table(SegmentTable.from_segments(segments))
+
+    assert actual.to_segments() == _legacy_speaker_integrate(segments, 60.0, 1.0, 120.0)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_speech_integrate_table_matches_loop(seed: int) -> None:
+    """ランダムなテキストで、従来の逐次処理と同じ結果になること."""
+    rng = np.random.default_rng(seed)
+    texts = _random_texts(rng, int(rng.integers(1, 100)))
+
+    actual = SpeechIntegrator().integrate_table(SegmentTable.from_texts(texts))
+
+    assert actual.to_texts() == _legacy_speech_integrate(texts)
+
+
+def test_empty_input() -> None:
+    """空の入力、テキストが全て空の入力では空の結果を返すこと."""
+    assert len(SpeakerIntegrator().integrate_table(SegmentTable.empty())) == 0
+    assert SpeakerIntegrator().integrate([]) == []
+    assert len(SpeechIntegrator().integrate_table(SegmentTable.empty())) == 0
+    assert SpeechIntegrator().integrate([]) == []
+
+    texts = [
+        SpeakerText(start_time=0.0, end_time=1.0, speaker_name="SPEAKER_00", text="")
+    ]
+    assert SpeechIntegrator().integrate(texts) == []
@@ -0,0 +1,114 @@
+"""JobQueueのリースの排他制御を複数のプロセスで確認する."""
+
+import multiprocessing
+import time
+from dataclasses import replace
+from pathlib import Path
+
+from internal.job_queue import Job, JobQueue
+
+_LEASE_DURATION = 0.5
+
+
+def _claim_all(
+    root_dir: Path, start: multiprocessing.Event, results: multiprocessing.Queue
+) -> None:
+    """ジョブを取得できなくなるまで取得し、取得したジョブの識別子を返す."""
+    job_queue = JobQueue(root_dir, lease_duration=60.0)
+    start.wait()
+    claimed: list[str] = []
+    while (lease := job_queue.claim()) is not None:
+        claimed.append(lease.job.job_id)
+    results.put(claimed)
+
+
+def _claim_and_exit(root_dir: Path, results: multiprocessing.Queue) -> None:
+    """ジョブを取得し、解放せずに終了する. ワーカーの異常終了を模擬する."""
+    job_queue = JobQueue(root_dir, lease_duration=_LEASE_DURATION)
+    lease = job_queue.claim()
+    results.put(None if lease is None else lease.generation)
+
+
+def test_claim_is_exclusive(tmp_path: Path) -> None:
+    """同時に取得しても、各ジョブを1つのプロセスだけが取得すること."""
+    job_queue = JobQueue(tmp_path)
+    job_ids = [f"job-{i}" for i in range(16)]
+    for job_id in job_ids:
+        job_queue.submit(Job(job_id=job_id, kind="test"))
+
+    context = multiprocessing.get_context()
+    start = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=_claim_all, args=(tmp_path, start, results))
+        for _ in range(8)
+    ]
+    for process in processes:
+        process.start()
+    start.set()
+    claimed = [v for _ in processes for v in results.get(timeout=30.0)]
+    for process in processes:
+        process.join()
+
+    assert sorted(claimed) == sorted(job_ids)
+
+
+def test_expired_lease_is_reclaimed(tmp_path: Path) -> None:
+    """終了したワーカーのリースは期限切れ後に次の世代で再取得できること."""
+    job_queue = JobQueue(tmp_path, lease_duration=_LEASE_DURATION, worker_id="b")
+    job_queue.submit(Job(job_id="job", kind="test"))
+
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    process = context.Process(target=_claim_and_exit, args=(tmp_path, results))
+    process.start()
+    process.join()
+    assert results.get(timeout=30.0) == 0
+
+    # 期限内は取得できない
+    assert job_queue.claim() is None
+    assert job_queue.status() == {"job": "running"}
+
+    time.sleep(_LEASE_DURATION * 2)
+    lease = job_queue.claim()
+    assert lease is not None
+    assert lease.generation == 1
+    assert job_queue.heartbeat(lease)
+
+
+def test_release_then_reclaim_keeps_identity(tmp_path: Path) -> None:
+    """解放後に再取得されたリースを、以前の保持者が更新、解放できないこと."""
+    queues = {
+        name: JobQueue(tmp_path, lease_duration=_LEASE_DURATION, worker_id=name)
+        for name in ("a", "b", "c", "d")
+    }
+    queues["a"].submit(Job(job_id="job", kind="test"))
+
+    # aのリースが期限切れになり、bが再取得して解放し、cが取得する
+    lease_a = queues["a"].claim()
+    assert lease_a is not None
+    time.sleep(_LEASE_DURATION * 2)
+    lease_b = queues["b"].claim()
+    assert lease_b is not None
+    stale_lease_b = replace(lease_b)
+    queues["b"].release(lease_b)
+    lease_c = queues["c"].claim()
+    assert lease_c is not None
+    assert [lease_a.generation, lease_b.generation, lease_c.generation] == [0, 1, 2]
+
+    # 以前の保持者の更新と解放は、cのリースに影響しない
+    assert not queues["a"].heartbeat(lease_a)
+    assert not queues["a"].complete(lease_a, {})
+    queues["a"].release(lease_a)
+    assert not queues["b"].heartbeat(stale_lease_b)
+    queues["b"].release(replace(lease_b, lost=False))
+
+    assert queues["c"].heartbeat(lease_c)
+    assert queues["d"].claim() is None
+    assert not queues["a"].is_done("job")
+
+    # cの解放後は次の世代で取得できる
+    queues["c"].release(lease_c)
+    lease_d = queues["d"].claim()
+    assert lease_d is not None
+    assert lease_d.generation == 3
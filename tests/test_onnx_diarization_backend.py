@@ -0,0 +1,86 @@
+"""PyTorchとONNX Runtimeの話者分離モデルの出力が一致することを確認する."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("pyannote.audio")
+
+from internal import OnnxDiarizationBackend  # noqa: E402
+from internal.onnx_model_exporter import (  # noqa: E402
+    EMBEDDING_MODEL_NAME,
+    SEGMENTATION_MODEL_NAME,
+    onnx_model_filepath,
+)
+from pyannote.audio import Pipeline  # noqa: E402
+
+_CONFIG_PATH = Path("data/raw/config.yaml")
+_ONNX_DIR = Path("data/raw/onnx")
+_ATOL = 1e-3  # segmentationの出力の許容誤差
+_MIN_COSINE = 0.99  # embeddingの出力の許容コサイン類似度
+
+
+@pytest.fixture(scope="module")
+def pipelines() -> tuple[Pipeline, Pipeline]:
+    """PyTorchとONNX Runtimeのパイプライン. モデルがない場合はスキップする."""
+    model_filepaths = [
+        _CONFIG_PATH,
+        *[
+            onnx_model_filepath(_ONNX_DIR, name, quantized=False)
+            for name in [SEGMENTATION_MODEL_NAME, EMBEDDING_MODEL_NAME]
+        ],
+    ]
+    missing = [v for v in model_filepaths if not v.exists()]
+    if len(missing) > 0:
+        pytest.skip(f"models not found: {', '.join(str(v) for v in missing)}")
+
+    torch_pipeline = Pipeline.from_pretrained(_CONFIG_PATH)
+    torch_pipeline.to(torch.device("cpu"))
+    onnx_pipeline = OnnxDiarizationBackend(model_dir=_ONNX_DIR).attach(
+        Pipeline.from_pretrained(_CONFIG_PATH)
+    )
+
+    return torch_pipeline, onnx_pipeline
+
+
+@pytest.fixture(scope="module")
+def chunks(pipelines: tuple[Pipeline, Pipeline]) -> "torch.Tensor":
+    """segmentationモデルの入力長の音声チャンク."""
+    segmentation_model = pipelines[0]._segmentation.model  # noqa: SLF001
+    sample_rate = segmentation_model.hparams.sample_rate
+    num_samples = int(segmentation_model.specifications.duration * sample_rate)
+    generator = torch.Generator().manual_seed(0)
+
+    return 0.1 * torch.randn(4, 1, num_samples, generator=generator)
+
+
+def test_segmentation_matches(
+    pipelines: tuple[Pipeline, Pipeline], chunks: "torch.Tensor"
+) -> None:
+    """segmentationの出力の差が許容誤差内であること."""
+    torch_pipeline, onnx_pipeline = pipelines
+    with torch.inference_mode():
+        torch_scores = torch_pipeline._segmentation.model(chunks)  # noqa: SLF001
+        onnx_scores = onnx_pipeline._segmentation.model(chunks)  # noqa: SLF001
+
+    assert float(torch.max(torch.abs(torch_scores - onnx_scores))) <= _ATOL
+
+
+def test_embedding_matches(
+    pipelines: tuple[Pipeline, Pipeline], chunks: "torch.Tensor"
+) -> None:
+    """embeddingの出力のコサイン類似度が許容範囲内であること."""
+    torch_pipeline, onnx_pipeline = pipelines
+    with torch.inference_mode():
+        scores = torch_pipeline._segmentation.model(chunks)  # noqa: SLF001
+    masks = scores[:, :, 0]
+    torch_vectors = torch_pipeline._embedding(chunks, masks=masks)  # noqa: SLF001
+    onnx_vectors = onnx_pipeline._embedding(chunks, masks=masks)  # noqa: SLF001
+    cosine = np.sum(torch_vectors * onnx_vectors, axis=1) / (
+        np.linalg.norm(torch_vectors, axis=1) * np.linalg.norm(onnx_vectors, axis=1)
+    )
+
+    assert float(np.nanmin(cosine)) >= _MIN_COSINE
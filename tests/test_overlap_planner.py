@@ -0,0 +1,81 @@
+"""OverlapPlannerの区間の分割を確認する."""
+
+import pytest
+from internal.overlap_planner import OverlapPlanner
+from internal.speaker_segment import SpeakerSegment
+
+
+def _segments(values: list[tuple[float, float, str]]) -> list[SpeakerSegment]:
+    """(開始時刻, 終了時刻, 話者名)から話者区間を作成する."""
+    return [
+        SpeakerSegment(start_time=start, end_time=end, speaker_name=name)
+        for start, end, name in values
+    ]
+
+
+def _values(segments: list[SpeakerSegment]) -> list[tuple[float, float, str]]:
+    """話者区間を比較しやすい形式にする."""
+    return [
+        (
+            pytest.approx(v.start_time),
+            pytest.approx(v.end_time),
+            v.speaker_name,
+        )
+        for v in segments
+    ]
+
+
+_CHAIN = [(0.0, 40.0, "A"), (39.8, 80.0, "B"), (79.9, 110.0, "A"), (109.5, 150.0, "C")]
+
+
+def test_short_overlaps_keep_speaker_segments() -> None:
+    """話者の切り替わりの短い重なりは、元の話者区間のまま残すこと."""
+    planner = OverlapPlanner(max_segment_duration=120.0, min_overlap_duration=1.0)
+
+    assert _values(planner.plan(_segments(_CHAIN))) == _values(_segments(_CHAIN))
+    assert planner.saved_duration == pytest.approx(0.0)
+
+
+def test_chain_splits_only_overlapped_intervals() -> None:
+    """重なった部分のみを連結した話者名の区間とし、連鎖させないこと."""
+    planner = OverlapPlanner(max_segment_duration=120.0, min_overlap_duration=0.05)
+
+    assert _values(planner.plan(_segments(_CHAIN))) == [
+        (0.0, 39.8, "A"),
+        (39.8, 40.0, "A & B"),
+        (40.0, 79.9, "B"),
+        (79.9, 80.0, "A & B"),
+        (80.0, 109.5, "A"),
+        (109.5, 110.0, "A & C"),
+        (110.0, 150.0, "C"),
+    ]
+    assert planner.saved_duration == pytest.approx(0.2 + 0.1 + 0.5)
+
+
+def test_long_overlap_is_transcribed_once() -> None:
+    """長い重なりは一度だけ文字起こしし、発話時間の長い順に話者名を連結すること."""
+    planner = OverlapPlanner()
+    segments = _segments([(0.0, 10.0, "A"), (4.0, 20.0, "B"), (6.0, 8.0, "C")])
+
+    assert _values(planner.plan(segments)) == [
+        (0.0, 4.0, "A"),
+        (4.0, 10.0, "A & B & C"),
+        (10.0, 20.0, "B"),
+    ]
+    assert planner.saved_duration == pytest.approx(8.0)
+
+
+def test_contiguous_segments_respect_max_duration() -> None:
+    """同じ話者の連続した区間は最大時間を超えない範囲でのみ結合すること."""
+    planner = OverlapPlanner(max_segment_duration=50.0)
+    segments = _segments([(0.0, 30.0, "A"), (30.0, 45.0, "A"), (45.0, 70.0, "A")])
+
+    assert _values(planner.plan(segments)) == [(0.0, 45.0, "A"), (45.0, 70.0, "A")]
+
+
+def test_empty_and_invalid_segments() -> None:
+    """空の入力や長さのない区間を無視すること."""
+    planner = OverlapPlanner()
+
+    assert planner.plan([]) == []
+    assert planner.plan(_segments([(5.0, 5.0, "A")])) == []
@@ -0,0 +1,85 @@
+"""progressのテスト."""
+
+import pytest
+from internal.progress import ProgressEvent, ProgressReporter
+
+_WEIGHTS = {"convert": 0.1, "diarization": 0.3, "speech_to_text": 0.6}
+
+
+def _pipeline_events(events: list[ProgressEvent]) -> list[ProgressEvent]:
+    """処理全体の途中経過のイベントのみを取り出す."""
+    return [
+        event
+        for event in events
+        if event.stage == "pipeline" and event.kind == "progress"
+    ]
+
+
+def test_pipeline_reports_overall_eta() -> None:
+    """各処理の進捗を合算し、処理全体の割合と残り時間を通知すること."""
+    events: list[ProgressEvent] = []
+    progress = ProgressReporter([events.append], min_interval=0.0)
+    with progress.stage("pipeline", audio_total=100.0, stage_weights=_WEIGHTS):
+        with progress.stage("convert"):
+            pass
+        with progress.stage("diarization", total=1.0, audio_total=100.0) as stage:
+            stage.update(0.5)
+            pipeline = _pipeline_events(events)[-1]
+            assert pipeline.extra["current_stage"] == "diarization"
+            assert pipeline.total == 1.0
+            assert pipeline.completed == pytest.approx(0.1 + 0.3 * 0.5)
+            assert pipeline.audio_total == 100.0
+            assert pipeline.audio_seconds == pytest.approx(100.0 * 0.25)
+            assert pipeline.eta is not None
+        assert _pipeline_events(events)[-1].completed == pytest.approx(0.4)
+
+    end = events[-1]
+    assert end.stage == "pipeline"
+    assert end.kind == "stage_end"
+    assert end.completed == end.total
+    assert end.eta == 0.0
+
+
+def test_pipeline_skipped_stage_counts_as_done() -> None:
+    """省略された処理は、後の処理の開始時に完了したとみなすこと."""
+    events: list[ProgressEvent] = []
+    progress = ProgressReporter([events.append], min_interval=0.0)
+    with progress.stage("pipeline", audio_total=100.0, stage_weights=_WEIGHTS):
+        with progress.stage("convert"):
+            pass
+        with progress.stage("speech_to_text", total=4) as stage:
+            stage.segment_done(audio_seconds=25.0)
+        pipeline = _pipeline_events(events)
+        assert pipeline[-1].completed == pytest.approx(1.0)
+        assert [event.completed for event in pipeline] == sorted(
+            event.completed for event in pipeline
+        )
+
+
+def test_close_sinks() -> None:
+    """終了時に`close`を持つ通知先を閉じ、以降は通知しないこと."""
+
+    class _Sink:
+        def __init__(self: "_Sink") -> None:
+            self.events: list[ProgressEvent] = []
+            self.closed = False
+
+        def __call__(self: "_Sink", event: ProgressEvent) -> None:
+            self.events.append(event)
+
+        def close(self: "_Sink") -> None:
+            self.closed = True
+
+    sink = _Sink()
+    others: list[ProgressEvent] = []
+    with (
+        ProgressReporter([sink, others.append]) as progress,
+        progress.stage("pipeline"),
+    ):
+        pass
+    assert sink.closed
+    assert [event.kind for event in sink.events] == ["stage_start", "stage_end"]
+
+    with progress.stage("pipeline"):
+        pass
+    assert len(sink.events) == 2
@@ -0,0 +1,73 @@
+"""ThreadGovernorのスレッド数の再配分を確認する."""
+
+import threading
+
+import pytest
+from internal import thread_governor
+from internal.thread_governor import ThreadGovernor
+
+
+def test_resize_is_applied_on_owner_thread(monkeypatch: pytest.MonkeyPatch) -> None:
+    """他のスレッドでの再配分は、リースを取得したスレッドでのみ反映されること."""
+    monkeypatch.setattr(thread_governor, "_available_cpus", lambda: {0, 1, 2, 3})
+    governor = ThreadGovernor(total_threads=4)
+    applied: list[tuple[int, int]] = []
+
+    def on_change(num_threads: int) -> None:
+        applied.append((threading.get_ident(), num_threads))
+
+    lease = governor.acquire("diarization", on_change=on_change)
+    assert applied == [(threading.get_ident(), 4)]
+
+    # 他のスレッドが取得すると縮小されるが、on_changeはそのスレッドでは呼ばれない
+    other: list = []
+    thread = threading.Thread(target=lambda: other.append(governor.acquire("ffmpeg")))
+    thread.start()
+    thread.join()
+    assert lease.num_threads == 2
+    assert applied == [(threading.get_ident(), 4)]
+
+    # 取得したスレッドで反映する
+    lease.apply_pending()
+    assert applied[-1] == (threading.get_ident(), 2)
+
+    # 他のスレッドでの返却による拡大も、取得したスレッドで反映する
+    thread = threading.Thread(target=lambda: governor.release(other[0]))
+    thread.start()
+    thread.join()
+    assert lease.num_threads == 4
+    assert applied[-1] == (threading.get_ident(), 2)
+    lease.apply_pending()
+    assert applied[-1] == (threading.get_ident(), 4)
+    assert len(applied) == 3
+
+
+@pytest.mark.parametrize(
+    "stages",
+    [["ffmpeg", "whisper", "diarization"], ["diarization", "ffmpeg", "whisper"]],
+)
+def test_fixed_leases_do_not_starve_adjustable(
+    monkeypatch: pytest.MonkeyPatch, stages: list[str]
+) -> None:
+    """変更できない2つの処理と変更できる処理を同時に実行しても、いずれも待ち続けないこと."""
+    monkeypatch.setattr(thread_governor, "_available_cpus", lambda: {0, 1, 2, 3})
+    governor = ThreadGovernor(total_threads=4)
+    leases: list = []
+
+    def acquire(stage: str) -> None:
+        on_change = (lambda _: None) if stage == "diarization" else None
+        leases.append(governor.acquire(stage, on_change=on_change))
+
+    # 先に取得したリースを保持したまま、順に別スレッドで取得する
+    for stage in stages:
+        thread = threading.Thread(target=acquire, args=(stage,), daemon=True)
+        thread.start()
+        thread.join(timeout=2.0)
+        assert not thread.is_alive(), f"{stage} is not granted"
+
+    assert all(v.num_threads >= 1 for v in leases)
+    assert sum(v.num_threads for v in leases) <= governor.total_threads
+    cpus = [cpu for v in leases for cpu in v.cpus]
+    assert len(cpus) == len(set(cpus))
+    for lease in leases:
+        governor.release(lease)
@@ -0,0 +1,55 @@
+"""WhisperExecutorの失敗した区間の扱いを確認する."""
+
+import stat
+import sys
+from pathlib import Path
+
+import pytest
+from internal.whisper_executor import WhisperExecutor, WhisperResult, WhisperTask
+
+_OUTPUT = "[00:00:00.000 --> 00:00:01.000]   こんにちは"
+
+
+@pytest.fixture()
+def whisper_cpp_path(tmp_path: Path) -> Path:
+    """固定の文字起こし結果を出力するwhisper.cppの代わりを作成する."""
+    (tmp_path / "models").mkdir()
+    (tmp_path / "models" / "ggml-test.bin").touch()
+    main_filepath = tmp_path / "main"
+    main_filepath.write_text(
+        f"#!{sys.executable}\nimport sys\nsys.stdin.read()\nprint({_OUTPUT!r})\n"
+    )
+    main_filepath.chmod(main_filepath.stat().st_mode | stat.S_IEXEC)
+
+    return tmp_path
+
+
+def _empty_segment() -> bytes:
+    """長さが0の区間の音声の取得を模擬する."""
+    message = "empty audio segment. [1.0s - 1.0s]"
+    raise ValueError(message)
+
+
+def test_load_error_is_recorded_as_failed_result(whisper_cpp_path: Path) -> None:
+    """音声を取得できない区間は失敗とし、他の区間の文字起こしを続けること."""
+    executor = WhisperExecutor(
+        whisper_cpp_path, ["test"], num_workers=2, poll_interval=0.1
+    )
+    tasks = [
+        WhisperTask(key=0, duration=1.0, load=lambda: b"RIFF"),
+        WhisperTask(key=1, duration=0.0, load=_empty_segment),
+        WhisperTask(key=2, duration=1.0, load=lambda: b"RIFF"),
+    ]
+    notified: list[int] = []
+
+    def on_done(task: WhisperTask, result: WhisperResult) -> None:
+        notified.append(task.key)
+        assert result.key == task.key
+
+    results = executor.run(tasks, on_done=on_done)
+
+    assert [v.text for v in results] == ["こんにちは", None, "こんにちは"]
+    assert results[1].model_name is None
+    assert "empty audio segment" in results[1].errors[0]
+    assert sorted(notified) == [0, 1, 2]
+    assert executor.metrics.to_dict()["counters"]["whisper_failed"] == 1